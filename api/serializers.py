@@ -16,7 +16,7 @@ class AncestorSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ancestor
-        fields = ['ancestor', 'url']
+        fields = ['ancestor', 'url', 'descendant_count', 'descendant_depth']
 
     @property
     def request(self):
@@ -50,3 +50,53 @@ class AncestorSearchTextSerializer(AncestorSerializer):
             get_search_vector_search_fields(Ancestor),
             ['bio', 'marriages']
         ]))
+
+
+class CommonAncestorSerializer(serializers.Serializer):
+
+    ancestor = serializers.SerializerMethodField()
+
+    depth_a = serializers.IntegerField()
+
+    depth_b = serializers.IntegerField()
+
+    def get_ancestor(self, obj):
+        return AncestorSerializer(obj.ancestor, context=self.context).data
+
+
+class RelationshipSerializer(serializers.Serializer):
+
+    ancestor_a = AncestorSerializer()
+
+    ancestor_b = AncestorSerializer()
+
+    common_ancestors = CommonAncestorSerializer(many=True)
+
+    label = serializers.CharField(allow_null=True)
+
+
+class PedigreeEntrySerializer(serializers.Serializer):
+
+    number = serializers.IntegerField()
+
+    generation = serializers.IntegerField()
+
+    ancestor = serializers.SerializerMethodField()
+
+    def get_ancestor(self, obj):
+        return AncestorSerializer(obj.ancestor, context=self.context).data
+
+
+class CacheStatsEntrySerializer(serializers.Serializer):
+
+    namespace = serializers.CharField()
+
+    hits = serializers.IntegerField()
+
+    misses = serializers.IntegerField()
+
+    hit_ratio = serializers.FloatField(allow_null=True)
+
+    recompute_ms = serializers.IntegerField()
+
+    bytes = serializers.IntegerField()
@@ -1,3 +1,5 @@
+from django.contrib.auth.models import User
+
 from tree.tests.testcases import TreeViewTest
 
 
@@ -37,3 +39,70 @@ class TestSearchTextView(TreeViewTest):
         response = self.app.get('/api/v1/search/text?search=Newtown')
         self.assertEqual(response.status_code, 200)
         response.mustcontain('John Glass', 'Martin Glass')
+
+
+class TestRelationshipView(TreeViewTest):
+
+    with_persistent_names = True
+
+    def test_get(self):
+        response = self.app.get(
+            '/api/v1/relationship/{}/{}'.format(
+                self.top_male.slug, self.generation_2[0].slug
+            ),
+            headers={'Accept': 'application/json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['label'], 'kleinzoon')
+        self.assertEqual(response.json['ancestor_a']['descendant_count'], 6)
+        self.assertEqual(response.json['ancestor_a']['descendant_depth'], 2)
+        self.assertEqual(
+            response.json['common_ancestors'][0]['ancestor']['ancestor'],
+            'John Glass 1812 - 1874'
+        )
+
+    def test_get_not_found(self):
+        response = self.app.get(
+            '/api/v1/relationship/{}/unknown'.format(self.top_male.slug),
+            status=404
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestPedigreeView(TreeViewTest):
+
+    with_persistent_names = True
+
+    def test_get(self):
+        response = self.app.get(
+            '/api/v1/pedigree/{}'.format(self.generation_2[0].slug),
+            headers={'Accept': 'application/json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry['number'] for entry in response.json], [1, 2, 3, 4, 5]
+        )
+        self.assertEqual(response.json[3]['generation'], 2)
+        self.assertEqual(
+            response.json[3]['ancestor']['ancestor'], 'John Glass 1812 - 1874'
+        )
+
+    def test_get_not_found(self):
+        response = self.app.get('/api/v1/pedigree/unknown', status=404)
+        self.assertEqual(response.status_code, 404)
+
+
+class TestCacheStatsView(TreeViewTest):
+
+    def test_get(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        response = self.app.get(
+            '/api/v1/cache-stats', user='admin',
+            headers={'Accept': 'application/json'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, [])
+
+    def test_get_anonymous(self):
+        response = self.app.get('/api/v1/cache-stats', status=403)
+        self.assertEqual(response.status_code, 403)
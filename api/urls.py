@@ -1,8 +1,13 @@
 from django.urls import re_path
 
-from api.views import SearchNamesView, SearchTextView
+from api.views import CacheStatsView, PedigreeView, RelationshipView, \
+    SearchNamesView, SearchTextView
 
 urlpatterns = [
     re_path(r'^search/names', SearchNamesView.as_view()),
     re_path(r'^search/text', SearchTextView.as_view()),
+    re_path(r'^pedigree/(?P<slug>[^/]+)$', PedigreeView.as_view()),
+    re_path(r'^relationship/(?P<slug_a>[^/]+)/(?P<slug_b>[^/]+)$',
+            RelationshipView.as_view()),
+    re_path(r'^cache-stats$', CacheStatsView.as_view()),
 ]
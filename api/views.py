@@ -1,10 +1,17 @@
+from django.shortcuts import get_object_or_404
 from rest_framework.generics import GenericAPIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 
 from api.filters import SearchNameFilter, SearchTextFilter
 from api.renderers import HighlightBrowsableAPIRenderer, HighlightJsonRenderer
-from api.serializers import AncestorSerializer, AncestorSearchTextSerializer
+from api.serializers import AncestorSerializer, \
+    AncestorSearchTextSerializer, CacheStatsEntrySerializer, \
+    PedigreeEntrySerializer, RelationshipSerializer
+from lib.cache.stats import get_cache_stats
+from services.relationship.service import get_relationship
+from tree.helpers import get_pedigree
 from tree.models import Ancestor
 
 
@@ -46,3 +53,57 @@ class SearchTextView(SearchView):
             self.request
         )
         return context
+
+
+class RelationshipView(GenericAPIView):
+
+    queryset = Ancestor.objects.all()
+
+    renderer_classes = [BrowsableAPIRenderer, JSONRenderer]
+
+    serializer_class = RelationshipSerializer
+
+    def get(self, request, *args, **kwargs):
+        relationship = get_relationship(
+            get_object_or_404(self.get_queryset(), slug=kwargs['slug_a']),
+            get_object_or_404(self.get_queryset(), slug=kwargs['slug_b'])
+        )
+        serializer = self.get_serializer(relationship)
+        return Response(serializer.data)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['request'] = self.request
+        return context
+
+
+class PedigreeView(GenericAPIView):
+
+    queryset = Ancestor.objects.all()
+
+    renderer_classes = [BrowsableAPIRenderer, JSONRenderer]
+
+    serializer_class = PedigreeEntrySerializer
+
+    def get(self, request, *args, **kwargs):
+        ancestor = get_object_or_404(self.get_queryset(), slug=kwargs['slug'])
+        serializer = self.get_serializer(get_pedigree(ancestor), many=True)
+        return Response(serializer.data)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['request'] = self.request
+        return context
+
+
+class CacheStatsView(GenericAPIView):
+
+    permission_classes = [IsAdminUser]
+
+    renderer_classes = [BrowsableAPIRenderer, JSONRenderer]
+
+    serializer_class = CacheStatsEntrySerializer
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(get_cache_stats(), many=True)
+        return Response(serializer.data)
@@ -62,6 +62,7 @@ class Deployment(object):
         self.extract_archive(remote_repo_archive, destination)
 
         self.update_repo(destination)
+        self.schedule_graph_snapshot()
 
         # Extract static files
         remote_static_archive = os.path.join(
@@ -163,12 +164,28 @@ class Deployment(object):
                 )
             )
 
+        self.connection.run(self.manage(repo_dir, 'migrate'))
+        self.connection.run(self.manage(repo_dir, 'write_graph_snapshot'))
+
+    def schedule_graph_snapshot(self):
+        # Replace the snapshot every few minutes once the family graph
+        # changed, so workers don't fall back to the database for long
+        entry = '*/5 * * * * {}'.format(self.manage(
+            self.settings['APP_DIR'], 'write_graph_snapshot --if-stale'
+        ))
         self.connection.run(
+            '(crontab -l 2>/dev/null | grep -v write_graph_snapshot; '
+            "echo '{}') | crontab -".format(entry)
+        )
+
+    def manage(self, repo_dir, command):
+        return (
             'bash -c "source {REMOTE_PYTHONPATH}/bin/activate && '
-            'source {REMOTE_PYTHONPATH}/bin/postactivate &&'
-            '{repo_dir}/manage.py migrate"'.format(
+            'source {REMOTE_PYTHONPATH}/bin/postactivate && '
+            '{repo_dir}/manage.py {command}"'.format(
                 REMOTE_PYTHONPATH=self.settings['REMOTE_PYTHONPATH'],
-                repo_dir=repo_dir
+                repo_dir=repo_dir,
+                command=command
             )
         )
 
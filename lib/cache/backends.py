@@ -0,0 +1,267 @@
+"""
+Contains cache backends that keep hot entries in process memory and count
+the hits and misses of template fragments.
+
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from lib.cache.stats import get_namespace, measure, record_hit, \
+    record_miss
+
+
+# The key that is incremented to make all processes drop their local entries
+EPOCH_KEY = 'cache-epoch'
+
+_missing = object()
+
+# Local tiers by location, shared by the threads of a process
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def bump_epoch(cache):
+    """Make every process drop its local entries; returns the new epoch."""
+    if cache.add(EPOCH_KEY, 1, timeout=None):
+        return 1
+    try:
+        return cache.incr(EPOCH_KEY)
+    except ValueError:
+        # The epoch was evicted meanwhile
+        cache.set(EPOCH_KEY, 1, timeout=None)
+        return 1
+
+
+class _LocalTier(object):
+    """A bounded LRU of entries in process memory."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.epoch = None
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+
+            value, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._delete(key)
+                return _missing
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at, size, max_entries, max_bytes):
+        with self.lock:
+            self._delete(key)
+            if size > max_bytes or max_entries < 1:
+                return
+
+            self.entries[key] = (value, expires_at, size)
+            self.size += size
+            while len(self.entries) > max_entries or self.size > max_bytes:
+                self._delete(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def sync(self, epoch):
+        with self.lock:
+            if epoch != self.epoch:
+                self.entries.clear()
+                self.size = 0
+                self.epoch = epoch
+
+    def _delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+
+class TwoTierCache(BaseCache):
+    """Keeps entries in process memory in front of another cache backend.
+
+    Reads are served from a bounded LRU in the process when possible, and
+    from the shared backend otherwise. Writes go to both. Deleting an entry
+    increments an epoch key in the shared backend, and every process drops
+    all of its local entries when it sees that the epoch changed, which it
+    checks on every read. Local entries also expire after LOCAL_TIMEOUT.
+
+    Values are returned as stored instead of as copies, so they must not be
+    changed by the caller.
+
+    Options:
+        BACKEND: the alias of the shared backend, 'default' by default
+        MAX_ENTRIES: the number of local entries, 300 by default
+        MAX_BYTES: the pickled size of the local entries, 16 MB by default
+        LOCAL_TIMEOUT: the seconds a local entry may be used, 300 by default
+
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._backend = options.get('BACKEND', 'default')
+        self._max_bytes = int(options.get('MAX_BYTES', 16 * 1024 * 1024))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location, _LocalTier())
+
+    @property
+    def shared(self):
+        return caches[self._backend]
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._tier.sync(self.shared.get(EPOCH_KEY))
+        result = {}
+        missing = []
+        for key in keys:
+            value = self._tier.get(self.make_key(key, version))
+            if value is _missing:
+                missing.append(key)
+            else:
+                result[key] = value
+
+        if missing:
+            values = self.shared.get_many(missing, version=version)
+            for key, value in values.items():
+                self._store(key, value, DEFAULT_TIMEOUT, version)
+            result.update(values)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._store(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._store(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._store(key, value, timeout, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        self._tier.delete(self.make_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._tier.delete(self.make_key(key, version))
+        return self.shared.decr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._tier.delete(self.make_key(key, version))
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        self._tier.sync(bump_epoch(self.shared))
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self._tier.sync(bump_epoch(self.shared))
+
+    def clear(self):
+        self.shared.clear()
+        self._tier.sync(bump_epoch(self.shared))
+
+    def _store(self, key, value, timeout, version):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        timeouts = [
+            timeout for timeout in (timeout, self._local_timeout)
+            if timeout is not None
+        ]
+        if timeouts and min(timeouts) <= 0:
+            return
+
+        self._tier.set(
+            self.make_key(key, version),
+            value,
+            time.time() + min(timeouts) if timeouts else float('inf'),
+            len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+            self._max_entries,
+            self._max_bytes
+        )
+
+
+class InstrumentedCache(BaseCache):
+    """Counts the hits and misses of another cache backend.
+
+    Meant for the cache template tag, which looks a fragment up and sets it
+    after rendering it on a miss. The time between the two is counted as
+    the time it took to render the fragment.
+
+    Options:
+        BACKEND: the alias of the counted backend, 'default' by default
+
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._backend = options.get('BACKEND', 'default')
+        self._misses = threading.local()
+
+    @property
+    def shared(self):
+        return caches[self._backend]
+
+    def get(self, key, default=None, version=None):
+        value = self.shared.get(key, _missing, version=version)
+        if value is _missing:
+            self._get_misses()[key] = time.monotonic()
+            return default
+        record_hit(get_namespace(key))
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        missed_at = self._get_misses().pop(key, None)
+        if missed_at is not None:
+            namespace = get_namespace(key)
+            record_miss(
+                namespace, time.monotonic() - missed_at,
+                measure(namespace, value)
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.add(key, value, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.shared.incr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self.shared.delete(key, version=version)
+
+    def clear(self):
+        self.shared.clear()
+
+    def _get_misses(self):
+        # Fragments that were never set aren't kept around forever
+        misses = getattr(self._misses, 'keys', None)
+        if misses is None or len(misses) > 100:
+            misses = self._misses.keys = {}
+        return misses
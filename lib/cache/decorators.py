@@ -1,33 +1,85 @@
+import time
+from collections import namedtuple
 from functools import partial, wraps
 
 from django.core.cache import caches
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 
+from lib.cache.dependencies import get_generation, register_dependencies, \
+    register_namespace
 from lib.cache.helpers import make_cache_key
+from lib.cache.stats import measure, record_hit, record_miss
 
 
-def cache_result(key, timeout=DEFAULT_TIMEOUT, backend='default'):
+# How long a process may take to refresh a result with a soft timeout
+LOCK_TIMEOUT = 30
+
+# How long to wait between looking for a result that another process is
+# computing.
+LOCK_POLL_INTERVAL = 0.05
+
+
+class CachedNone(object):
+    """Stands in for None, which the cache can't tell from a miss."""
+
+
+# A result that is refreshed after refresh_at, before it expires
+SoftEntry = namedtuple('SoftEntry', ['value', 'refresh_at'])
+
+_missing = object()
+
+
+def cache_result(key, timeout=DEFAULT_TIMEOUT, backend='default',
+                 dependencies=None, lock_timeout=None, soft_timeout=None):
+    """Cache the result of the function.
+
+    The dependencies are the models and model instances the result is
+    derived from, or a function that returns them when it is called with the
+    result and the arguments. The result is deleted from the cache when one
+    of them is saved or deleted. A fixed list applies to every result, so it
+    is tracked through the generation of the key instead of per result.
+
+    With a lock timeout only one process computes a missing result, while the
+    others wait for it up to that many seconds. With a soft timeout the first
+    process that reads the result after that many seconds computes it again,
+    while the others keep getting the old result until it's replaced.
+
+    The wrapped function gets a `many` method that returns the results for
+    several first arguments, with the other arguments shared. It reads and
+    writes the cache once for all of them and computes only the misses,
+    without taking locks.
+
+    """
+    options = _Options(
+        key, timeout, backend, dependencies, lock_timeout, soft_timeout
+    )
 
     def decorator(func):
 
         @wraps(func)
         def wrapped_func(*args, **kwargs):
-            cache = caches[backend]
-            return _get_func_result(key, timeout, cache, func, args, kwargs)
+            return _get_func_result(key, options, func, args, kwargs)
+
+        def many(items, *args, **kwargs):
+            return _get_func_results(key, options, func, items, args, kwargs)
 
+        wrapped_func.many = many
         return wrapped_func
 
     return decorator
 
 
 def cache_method_result(key, key_attrs=None, timeout=DEFAULT_TIMEOUT,
-                        backend='default'):
+                        backend='default', dependencies=None,
+                        lock_timeout=None, soft_timeout=None):
+    options = _Options(
+        key, timeout, backend, dependencies, lock_timeout, soft_timeout
+    )
 
     def decorator(func):
 
         @wraps(func)
         def wrapped_func(instance, *args, **kwargs):
-            cache = caches[backend]
             cache_key = make_cache_key(
                 key,
                 kwargs=dict(
@@ -41,7 +93,7 @@ def cache_method_result(key, key_attrs=None, timeout=DEFAULT_TIMEOUT,
                 )
             )
             return _get_func_result(
-                cache_key, timeout, cache, func, args, kwargs, instance
+                cache_key, options, func, args, kwargs, instance
             )
 
         return wrapped_func
@@ -49,11 +101,165 @@ def cache_method_result(key, key_attrs=None, timeout=DEFAULT_TIMEOUT,
     return decorator
 
 
-def _get_func_result(key, timeout, cache, func, args, kwargs, instance=None):
-    cache_key = make_cache_key(key, args, kwargs)
-    result = cache.get(cache_key)
-    if result is None:
+class _Options(object):
+
+    def __init__(self, namespace, timeout, backend, dependencies,
+                 lock_timeout, soft_timeout):
+        if soft_timeout is not None and timeout not in (None, DEFAULT_TIMEOUT):
+            if soft_timeout >= timeout:
+                raise ValueError('The soft timeout must be below the timeout')
+
+        self.namespace = namespace
+        self.timeout = timeout
+        self.backend = backend
+        self.dependencies = dependencies
+        self.generational = dependencies is not None and \
+            not callable(dependencies)
+        if self.generational:
+            register_namespace(namespace, dependencies)
+        self.lock_timeout = lock_timeout
+        self.soft_timeout = soft_timeout
+        if soft_timeout is not None and lock_timeout is None:
+            # Someone has to win the refresh, or everybody would do it
+            self.lock_timeout = LOCK_TIMEOUT
+
+
+def _get_func_result(key, options, func, args, kwargs, instance=None):
+    cache = caches[options.backend]
+    cache_key = _add_generation(
+        make_cache_key(key, args, kwargs), _get_generation(options)
+    )
+    lock_key = '{}:lock'.format(cache_key)
+
+    entry = cache.get(cache_key, _missing)
+    if entry is not _missing and not isinstance(entry, SoftEntry):
+        record_hit(options.namespace)
+        return _unpack(entry)
+    if entry is not _missing and entry.refresh_at > time.time():
+        record_hit(options.namespace)
+        return _unpack(entry.value)
+
+    # Locks live in the shared backend of a two-tier cache, as releasing a
+    # lock through the two-tier cache would drop every local entry.
+    lock_cache = getattr(cache, 'shared', cache)
+    locked = options.lock_timeout is not None and \
+        lock_cache.add(lock_key, True, options.lock_timeout)
+    if options.lock_timeout is not None and not locked:
+        if entry is _missing:
+            entry = _wait_for_entry(
+                cache, lock_cache, cache_key, lock_key, options
+            )
+        if entry is not _missing:
+            record_hit(options.namespace)
+            return _unpack(
+                entry.value if isinstance(entry, SoftEntry) else entry
+            )
+
+    try:
+        started_at = time.monotonic()
         f = partial(func, instance) if instance else func
         result = f(*args, **kwargs)
-        cache.set(cache_key, result, timeout=timeout)
+        args = (instance, ) + args if instance else args
+        entry = _make_entry(cache_key, result, options, args, kwargs)
+        cache.set(cache_key, entry, timeout=options.timeout)
+        _record_miss(options, started_at, entry)
+    finally:
+        if locked:
+            lock_cache.delete(lock_key)
     return result
+
+
+def _get_func_results(key, options, func, items, args, kwargs):
+    cache = caches[options.backend]
+    items = list(items)
+    generation = _get_generation(options)
+    cache_keys = [
+        _add_generation(
+            make_cache_key(key, (item, ) + args, kwargs), generation
+        )
+        for item in items
+    ]
+    entries = cache.get_many(list(dict.fromkeys(cache_keys)))
+
+    now = time.time()
+    results = {}
+    computed = {}
+    for item, cache_key in zip(items, cache_keys):
+        if cache_key in results:
+            continue
+
+        entry = entries.get(cache_key, _missing)
+        if isinstance(entry, SoftEntry) and entry.refresh_at <= now:
+            entry = _missing
+        if entry is not _missing:
+            record_hit(options.namespace)
+            results[cache_key] = _unpack(
+                entry.value if isinstance(entry, SoftEntry) else entry
+            )
+            continue
+
+        started_at = time.monotonic()
+        result = func(item, *args, **kwargs)
+        results[cache_key] = result
+        computed[cache_key] = _make_entry(
+            cache_key, result, options, (item, ) + args, kwargs
+        )
+        _record_miss(options, started_at, computed[cache_key])
+
+    if computed:
+        cache.set_many(computed, timeout=options.timeout)
+    return [results[cache_key] for cache_key in cache_keys]
+
+
+def _get_generation(options):
+    if options.generational:
+        return get_generation(options.namespace, options.backend)
+    return None
+
+
+def _add_generation(cache_key, generation):
+    if generation is None:
+        return cache_key
+    return '{}:{}'.format(cache_key, generation)
+
+
+def _make_entry(cache_key, result, options, args, kwargs):
+    """Register the dependencies of the result and wrap it for the cache."""
+    if options.dependencies is not None and not options.generational:
+        entities = options.dependencies(result, *args, **kwargs)
+        register_dependencies(cache_key, entities, options.backend)
+
+    entry = CachedNone() if result is None else result
+    if options.soft_timeout is not None:
+        entry = SoftEntry(entry, time.time() + options.soft_timeout)
+    return entry
+
+
+def _wait_for_entry(cache, lock_cache, cache_key, lock_key, options):
+    """Wait for the process that holds the lock to store the result.
+
+    Gives up when the lock is released or expires without a result, after
+    which the caller computes the result itself.
+
+    """
+    deadline = time.time() + options.lock_timeout
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(cache_key, _missing)
+        if entry is not _missing:
+            return entry
+        if lock_cache.get(lock_key) is None:
+            break
+    return _missing
+
+
+def _record_miss(options, started_at, entry):
+    record_miss(
+        options.namespace,
+        time.monotonic() - started_at,
+        measure(options.namespace, entry)
+    )
+
+
+def _unpack(entry):
+    return None if isinstance(entry, CachedNone) else entry
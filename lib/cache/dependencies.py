@@ -0,0 +1,157 @@
+"""
+Keeps track of the entities that cached entries were derived from.
+
+An entity is a model, which stands for all of its rows, or a model instance.
+Every entity has a list of the cache keys that depend on it, which is kept
+in the cache itself so that all processes share it. The list is built from
+numbered slots that are appended with an atomic increment, so concurrent
+registrations don't overwrite each other.
+
+Entries that depend on every row of a model would make those lists grow
+with every key, so their namespace is registered instead. Its keys contain a
+generation that is replaced when one of the models changes, which orphans
+all of its entries at once.
+
+"""
+import hashlib
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Model
+
+from lib.cache.backends import bump_epoch
+
+
+# The namespaces whose entries all depend on an entity, by the tag of it
+_namespaces = {}
+
+
+def get_tag(entity):
+    if isinstance(entity, Model):
+        return '{}:{}'.format(entity._meta.label_lower, entity.pk)
+    return entity._meta.label_lower
+
+
+def register_dependencies(key, entities, backend='default'):
+    """Record that the cache key has to go when one of the entities changes.
+
+    Keys that are registered already are skipped after a single lookup, so
+    this is cheap enough to call whenever the entry might have been cached.
+
+    """
+    cache = caches[backend]
+    markers = {
+        _make_marker_key(tag, key): tag
+        for tag in {get_tag(entity) for entity in entities}
+    }
+    registered = cache.get_many(list(markers))
+    for marker, tag in markers.items():
+        if marker in registered or not cache.add(marker, True, timeout=None):
+            continue
+
+        count_key = 'dependencies:{}'.format(tag)
+        if cache.add(count_key, 1, timeout=None):
+            slot = 1
+        else:
+            slot = cache.incr(count_key)
+        cache.set(_make_slot_key(tag, slot), key, timeout=None)
+
+
+def register_namespace(namespace, entities):
+    """Record that every entry in the namespace depends on the entities."""
+    for entity in entities:
+        _namespaces.setdefault(get_tag(entity), set()).add(namespace)
+
+
+def get_generation(namespace, backend='default'):
+    """Return the current generation of the namespace."""
+    cache = caches[backend]
+    key = _make_generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid4().hex
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def invalidate_dependents(entity, backend='default'):
+    """Delete the cache entries that were derived from the entity.
+
+    Changing an instance also invalidates the entries that depend on every
+    row of its model.
+
+    """
+    _invalidate_tags(_get_tags(entity), backend)
+
+
+def invalidate_dependents_on_commit(entity, backend='default'):
+    """Invalidate the dependents once the current transaction is committed.
+
+    Invalidating earlier would let other processes cache the old rows again
+    before they can see the change.
+
+    """
+    # A deleted instance loses its primary key before the commit
+    transaction.on_commit(
+        partial(_invalidate_tags, _get_tags(entity), backend)
+    )
+
+
+def _get_tags(entity):
+    tags = [get_tag(type(entity) if isinstance(entity, Model) else entity)]
+    if isinstance(entity, Model):
+        tags.append(get_tag(entity))
+    return tags
+
+
+def _invalidate_tags(tags, backend):
+    cache = caches[backend]
+    namespaces = set().union(*(_namespaces.get(tag, ()) for tag in tags))
+    if namespaces:
+        cache.set_many(
+            {
+                _make_generation_key(namespace): uuid4().hex
+                for namespace in namespaces
+            },
+            timeout=None
+        )
+        bump_epoch(cache)
+
+    for tag in tags:
+        count_key = 'dependencies:{}'.format(tag)
+        first_key = 'dependencies:{}:first'.format(tag)
+        bounds = cache.get_many([count_key, first_key])
+        if count_key not in bounds:
+            continue
+
+        # Slots that are appended meanwhile stay for the next invalidation
+        first, count = bounds.get(first_key, 1), bounds[count_key]
+        if first > count:
+            # The counter was evicted and started over
+            first = 1
+        slots = [_make_slot_key(tag, slot) for slot in range(first, count + 1)]
+        keys = list(cache.get_many(slots).values())
+        cache.delete_many(
+            keys + slots + [_make_marker_key(tag, key) for key in keys]
+        )
+        cache.set(first_key, count + 1, timeout=None)
+        if keys:
+            # Local copies of the entries are kept by the two-tier cache
+            bump_epoch(cache)
+
+
+def _make_generation_key(namespace):
+    return 'generation:{}'.format(namespace)
+
+
+def _make_slot_key(tag, slot):
+    return 'dependencies:{}:{}'.format(tag, slot)
+
+
+def _make_marker_key(tag, key):
+    return 'dependencies:{}:key:{}'.format(
+        tag, hashlib.md5(key.encode('utf-8')).hexdigest()
+    )
@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+class ProcessLocalValue(object):
+    """A value that every process keeps in memory.
+
+    Invalidating the value drops the local copy and changes a version key in
+    the cache, so the other processes reload it on their next access.
+
+    """
+
+    def __init__(self, version_key, loader, backend='default'):
+        self.version_key = version_key
+        self.loader = loader
+        self.backend = backend
+        self._value = None
+        self._version = None
+
+    @property
+    def version(self):
+        return caches[self.backend].get(self.version_key)
+
+    def get(self):
+        version = self.version
+        if self._value is None or self._version != version:
+            self._value = self.loader()
+            self._version = version
+        return self._value
+
+    def invalidate(self):
+        self._value = None
+        transaction.on_commit(self._set_version)
+
+    def _set_version(self):
+        caches[self.backend].set(self.version_key, uuid4().hex, timeout=None)
@@ -0,0 +1,181 @@
+"""
+Contains counters of the cache performance per key namespace.
+
+Every process counts in memory and adds its counts to shared counters in
+the cache now and then, so counting costs no round trips.
+
+"""
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+FIELDS = ['hits', 'misses', 'recompute_ms', 'bytes']
+
+NAMESPACES_KEY = 'cache-stats:namespaces'
+
+# Pickling a value to count its bytes costs about as much as storing it, so
+# only every so many misses of a namespace are measured. The misses in
+# between count the size that was measured last.
+SIZE_SAMPLE_INTERVAL = 10
+
+
+def get_namespace(key):
+    """Return the namespace of a cache key.
+
+    That's the part before the first colon, or the fragment name of a key of
+    the template cache tag.
+
+    """
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    return key.split(':', 1)[0]
+
+
+class CacheStatsEntry(
+        namedtuple('CacheStatsEntry', ['namespace'] + FIELDS)):
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    @property
+    def average_recompute_ms(self):
+        return self.recompute_ms / self.misses if self.misses else None
+
+    @property
+    def average_bytes(self):
+        return self.bytes / self.misses if self.misses else None
+
+
+def _make_stats_key(namespace, field):
+    return 'cache-stats:{}:{}'.format(namespace, field)
+
+
+class CacheStats(object):
+    """Counts hits and misses in memory until the counts are flushed."""
+
+    def __init__(self, backend='default'):
+        self.backend = backend
+        self.counts = {}
+        self.sizes = {}
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record_hit(self, namespace):
+        self._add(namespace, hits=1)
+
+    def record_miss(self, namespace, seconds, size):
+        self._add(
+            namespace,
+            misses=1, recompute_ms=round(seconds * 1000), bytes=size
+        )
+
+    def measure(self, namespace, value):
+        """Return the pickled size of a value that was missed."""
+        with self.lock:
+            count, size = self.sizes.get(namespace, (0, 0))
+            self.sizes[namespace] = (count + 1, size)
+        if count % SIZE_SAMPLE_INTERVAL == 0:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            with self.lock:
+                count, _ = self.sizes[namespace]
+                self.sizes[namespace] = (count, size)
+        return size
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            self.flushed_at = time.monotonic()
+        if not counts:
+            return
+
+        cache = caches[self.backend]
+        namespaces = cache.get(NAMESPACES_KEY) or set()
+        if not namespaces.issuperset(counts):
+            cache.set(NAMESPACES_KEY, namespaces | set(counts), timeout=None)
+
+        for namespace, fields in counts.items():
+            for field, value in fields.items():
+                if not value:
+                    continue
+
+                key = _make_stats_key(namespace, field)
+                if not cache.add(key, value, timeout=None):
+                    try:
+                        cache.incr(key, value)
+                    except ValueError:
+                        # The counter was evicted meanwhile
+                        cache.set(key, value, timeout=None)
+
+    def get(self):
+        """Return the counts of all processes, ordered by namespace."""
+        self.flush()
+        cache = caches[self.backend]
+        namespaces = sorted(cache.get(NAMESPACES_KEY) or [])
+        values = cache.get_many([
+            _make_stats_key(namespace, field)
+            for namespace in namespaces
+            for field in FIELDS
+        ])
+        return [
+            CacheStatsEntry(namespace, *(
+                values.get(_make_stats_key(namespace, field), 0)
+                for field in FIELDS
+            ))
+            for namespace in namespaces
+        ]
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+        cache = caches[self.backend]
+        namespaces = cache.get(NAMESPACES_KEY) or set()
+        cache.delete_many([NAMESPACES_KEY] + [
+            _make_stats_key(namespace, field)
+            for namespace in namespaces
+            for field in FIELDS
+        ])
+
+    def _add(self, namespace, **values):
+        with self.lock:
+            fields = self.counts.setdefault(
+                namespace, dict.fromkeys(FIELDS, 0)
+            )
+            for field, value in values.items():
+                fields[field] += value
+            elapsed = time.monotonic() - self.flushed_at
+        if elapsed >= settings.CACHE_STATS_FLUSH_INTERVAL:
+            self.flush()
+
+
+_stats = CacheStats()
+
+
+def record_hit(namespace):
+    _stats.record_hit(namespace)
+
+
+def record_miss(namespace, seconds, size):
+    _stats.record_miss(namespace, seconds, size)
+
+
+def measure(namespace, value):
+    return _stats.measure(namespace, value)
+
+
+def flush_cache_stats():
+    _stats.flush()
+
+
+def get_cache_stats():
+    return _stats.get()
+
+
+def reset_cache_stats():
+    _stats.reset()
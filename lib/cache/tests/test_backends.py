@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import override_settings
+from django.test.testcases import SimpleTestCase
+
+from lib.cache.backends import EPOCH_KEY, bump_epoch
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    },
+    'local': {
+        'BACKEND': 'lib.cache.backends.TwoTierCache',
+        'LOCATION': 'test-two-tier-cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 2,
+            'MAX_BYTES': 1024,
+            'LOCAL_TIMEOUT': 60
+        }
+    }
+})
+class TestTwoTierCache(SimpleTestCase):
+
+    def setUp(self):
+        self.shared = caches['default']
+        self.cache = caches['local']
+        self.cache.clear()
+
+    def test_get_local(self):
+        self.cache.set('key', 'value')
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_get_shared(self):
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertIsNone(self.cache.get('other'))
+
+    def test_epoch_changed(self):
+        self.cache.set('key', 'value')
+        self.shared.delete('key')
+        bump_epoch(self.shared)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_delete(self):
+        self.cache.set_many({'key': 'value', 'other': 'value'})
+        epoch = self.shared.get(EPOCH_KEY)
+
+        self.cache.delete('key')
+        self.assertEqual(self.shared.get(EPOCH_KEY), epoch + 1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache._tier.entries, {})
+
+    def test_max_entries(self):
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get('first')
+        self.cache.set('third', 3)
+        self.assertEqual(
+            list(self.cache._tier.entries),
+            [self.cache.make_key('first'), self.cache.make_key('third')]
+        )
+
+    def test_max_bytes(self):
+        self.cache.set('key', 'x' * 2048)
+        self.assertEqual(self.cache._tier.size, 0)
+        self.assertEqual(self.cache.get('key'), 'x' * 2048)
+
+    def test_local_timeout(self):
+        with mock.patch('lib.cache.backends.time.time', return_value=0):
+            self.cache.set('key', 'value', timeout=None)
+        self.shared.delete('key')
+
+        with mock.patch('lib.cache.backends.time.time', return_value=59):
+            self.assertEqual(self.cache.get('key'), 'value')
+        with mock.patch('lib.cache.backends.time.time', return_value=60):
+            self.assertIsNone(self.cache.get('key'))
+
+    def test_incr(self):
+        self.cache.set('key', 1)
+        self.assertEqual(self.cache.incr('key'), 2)
+        self.assertEqual(self.cache.get('key'), 2)
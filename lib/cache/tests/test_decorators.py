@@ -1,8 +1,12 @@
+from unittest import mock
+
 from django.contrib.auth.models import User
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.test import override_settings
 from django.test.testcases import SimpleTestCase
 
-from lib.cache.decorators import cache_method_result, cache_result
+from lib.cache.decorators import CachedNone, SoftEntry, \
+    cache_method_result, cache_result
 
 
 @cache_result('test-result')
@@ -10,6 +14,20 @@ def test_func(arg1, arg2):
     return arg1 + arg2
 
 
+@cache_result('test-none-result')
+def none_func(arg1):
+    return None
+
+
+calls = []
+
+
+@cache_result('test-counted-result', lock_timeout=1, soft_timeout=60)
+def counted_func(arg1):
+    calls.append(arg1)
+    return arg1 or None
+
+
 class TestClass:
 
     foo = 'bar'
@@ -77,3 +95,91 @@ class TestDecorators(SimpleTestCase):
         result = cache.get_entry('test-result:1:arg2=1')
         expected = 2
         self.assertEqual(result, expected)
+
+    def test_cache_none(self):
+        self.assertIsNone(none_func(1))
+        result = cache.get_entry('test-none-result:1')
+        self.assertIsInstance(result, CachedNone)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+})
+class TestStampedeProtection(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+
+    def test_cache_none(self):
+        self.assertIsNone(counted_func(0))
+        self.assertIsNone(counted_func(0))
+        self.assertEqual(calls, [0])
+
+    def test_wait_for_lock(self):
+        cache.add('test-counted-result:1:lock', True)
+
+        def store_result(seconds):
+            cache.set('test-counted-result:1', SoftEntry(2, 0))
+
+        with mock.patch('lib.cache.decorators.time.sleep', store_result):
+            self.assertEqual(counted_func(1), 2)
+        self.assertEqual(calls, [])
+
+    def test_lock_released_without_result(self):
+        cache.add('test-counted-result:1:lock', True)
+
+        def release_lock(seconds):
+            cache.delete('test-counted-result:1:lock')
+
+        with mock.patch('lib.cache.decorators.time.sleep', release_lock):
+            self.assertEqual(counted_func(1), 1)
+        self.assertEqual(calls, [1])
+
+    def test_soft_timeout(self):
+        with mock.patch('lib.cache.decorators.time.time', return_value=0):
+            counted_func(1)
+        with mock.patch('lib.cache.decorators.time.time', return_value=59):
+            counted_func(1)
+        self.assertEqual(calls, [1])
+
+        with mock.patch('lib.cache.decorators.time.time', return_value=60):
+            counted_func(1)
+        self.assertEqual(calls, [1, 1])
+        self.assertIsNone(cache.get('test-counted-result:1:lock'))
+
+    def test_soft_timeout_refresh_in_progress(self):
+        cache.set('test-counted-result:1', SoftEntry(2, 0))
+        cache.add('test-counted-result:1:lock', True)
+        self.assertEqual(counted_func(1), 2)
+        self.assertEqual(calls, [])
+
+    def test_soft_timeout_above_timeout(self):
+        with self.assertRaises(ValueError):
+            cache_result('test', timeout=60, soft_timeout=60)
+
+    def test_many(self):
+        counted_func(1)
+        calls.clear()
+
+        backend = caches['default']
+        with mock.patch.object(
+                backend, 'get_many', wraps=backend.get_many) as get_many, \
+                mock.patch.object(
+                    backend, 'set_many', wraps=backend.set_many) as set_many:
+            result = counted_func.many([1, 2, 0, 2])
+        get_many.assert_called_once()
+        set_many.assert_called_once()
+        self.assertEqual(result, [1, 2, None, 2])
+        self.assertEqual(calls, [2, 0])
+
+        self.assertEqual(
+            cache.get('test-counted-result:2'), SoftEntry(2, mock.ANY)
+        )
+        self.assertIsInstance(
+            cache.get('test-counted-result:0').value, CachedNone
+        )
+        self.assertEqual(counted_func.many([0, 2]), [None, 2])
+        self.assertEqual(calls, [2, 0])
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import override_settings
+from django.test.testcases import SimpleTestCase
+
+from lib.cache.decorators import cache_result
+from lib.cache.dependencies import get_generation, invalidate_dependents, \
+    invalidate_dependents_on_commit, register_dependencies
+
+
+@cache_result('test-user-name', dependencies=lambda result, user: [user])
+def get_user_name(user):
+    return user.username
+
+
+@cache_result('test-group-name', dependencies=[Group])
+def get_group_name(group):
+    return group.name
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+})
+class TestDependencies(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidate_instance(self):
+        user = User(pk=1)
+        register_dependencies('first', [user])
+        register_dependencies('second', [User(pk=2)])
+        cache.set_many({'first': 1, 'second': 2})
+
+        invalidate_dependents(user)
+        self.assertIsNone(cache.get('first'))
+        self.assertEqual(cache.get('second'), 2)
+
+    def test_invalidate_model(self):
+        register_dependencies('first', [User])
+        register_dependencies('second', [Group])
+        cache.set_many({'first': 1, 'second': 2})
+
+        invalidate_dependents(User(pk=1))
+        self.assertIsNone(cache.get('first'))
+        self.assertEqual(cache.get('second'), 2)
+
+    def test_register_once(self):
+        register_dependencies('first', [User])
+        register_dependencies('first', [User])
+        self.assertEqual(cache.get('dependencies:auth.user'), 1)
+
+    def test_register_after_invalidation(self):
+        register_dependencies('first', [User])
+        invalidate_dependents(User)
+
+        register_dependencies('first', [User])
+        cache.set('first', 1)
+        invalidate_dependents(User)
+        self.assertIsNone(cache.get('first'))
+
+    def test_cache_result(self):
+        user = User(pk=1, username='johndoe')
+        self.assertEqual(get_user_name(user), 'johndoe')
+        self.assertEqual(cache.get('test-user-name:1'), 'johndoe')
+
+        invalidate_dependents(user)
+        self.assertIsNone(cache.get('test-user-name:1'))
+
+    def test_invalidate_on_commit(self):
+        user = User(pk=1)
+        register_dependencies('first', [user])
+        cache.set('first', 1)
+
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            invalidate_dependents_on_commit(user)
+        user.pk = None
+        self.assertEqual(cache.get('first'), 1)
+
+        on_commit.call_args[0][0]()
+        self.assertIsNone(cache.get('first'))
+
+    def test_cache_result_namespace(self):
+        group = Group(pk=1, name='staff')
+        self.assertEqual(get_group_name(group), 'staff')
+        key = 'test-group-name:1:{}'.format(get_generation('test-group-name'))
+        self.assertEqual(cache.get(key), 'staff')
+        self.assertIsNone(cache.get('dependencies:auth.group'))
+
+        invalidate_dependents(Group(pk=2))
+        self.assertNotEqual(
+            get_generation('test-group-name'), key.rsplit(':', 1)[1]
+        )
+        group.name = 'admins'
+        self.assertEqual(get_group_name(group), 'admins')
+        self.assertEqual(get_group_name.many([group]), ['admins'])
@@ -0,0 +1,122 @@
+from django.core.cache import caches
+from django.test import override_settings
+from django.test.testcases import SimpleTestCase
+
+from lib.cache.decorators import cache_result
+from lib.cache.stats import SIZE_SAMPLE_INTERVAL, CacheStats, \
+    CacheStatsEntry, get_cache_stats, get_namespace, record_hit, \
+    record_miss, reset_cache_stats
+
+
+@cache_result('test-stats-result')
+def double(arg):
+    return arg * 2
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-cache-stats'
+    },
+    'template_fragments': {
+        'BACKEND': 'lib.cache.backends.InstrumentedCache'
+    }
+}, CACHE_STATS_FLUSH_INTERVAL=60)
+class TestCacheStats(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        reset_cache_stats()
+
+    def test_get_namespace(self):
+        self.assertEqual(get_namespace('lineage-roots:1:2'), 'lineage-roots')
+        self.assertEqual(get_namespace('lineages'), 'lineages')
+        self.assertEqual(
+            get_namespace('template.cache.tree.0123abcd'),
+            'template.cache.tree'
+        )
+
+    def test_get(self):
+        record_hit('namespace')
+        record_hit('namespace')
+        record_miss('namespace', 0.25, 100)
+        record_miss('other', 0.5, 10)
+
+        self.assertEqual(get_cache_stats(), [
+            CacheStatsEntry('namespace', 2, 1, 250, 100),
+            CacheStatsEntry('other', 0, 1, 500, 10)
+        ])
+
+    def test_get_processes(self):
+        first, second = CacheStats(), CacheStats()
+        first.record_hit('namespace')
+        second.record_hit('namespace')
+        second.record_miss('namespace', 0.1, 50)
+        first.flush()
+
+        self.assertEqual(
+            second.get(), [CacheStatsEntry('namespace', 2, 1, 100, 50)]
+        )
+
+    def test_flush_interval(self):
+        stats = CacheStats()
+        with self.settings(CACHE_STATS_FLUSH_INTERVAL=0):
+            stats.record_hit('namespace')
+
+        self.assertEqual(stats.counts, {})
+        self.assertEqual(
+            caches['default'].get('cache-stats:namespace:hits'), 1
+        )
+
+    def test_measure(self):
+        stats = CacheStats()
+        size = stats.measure('namespace', 'a' * 100)
+        self.assertGreater(size, 100)
+        for _ in range(SIZE_SAMPLE_INTERVAL - 1):
+            self.assertEqual(stats.measure('namespace', ''), size)
+        self.assertLess(stats.measure('namespace', ''), 100)
+        self.assertLess(stats.measure('other', ''), 100)
+
+    def test_reset(self):
+        record_hit('namespace')
+        self.assertEqual(len(get_cache_stats()), 1)
+
+        reset_cache_stats()
+        self.assertEqual(get_cache_stats(), [])
+
+    def test_entry(self):
+        entry = CacheStatsEntry('namespace', 3, 1, 20, 400)
+        self.assertEqual(entry.hit_ratio, 0.75)
+        self.assertEqual(entry.average_recompute_ms, 20)
+        self.assertEqual(entry.average_bytes, 400)
+
+        entry = CacheStatsEntry('namespace', 0, 0, 0, 0)
+        self.assertIsNone(entry.hit_ratio)
+        self.assertIsNone(entry.average_recompute_ms)
+
+    def test_cache_result(self):
+        self.assertEqual(double(1), 2)
+        self.assertEqual(double(1), 2)
+        self.assertEqual(double.many([1, 2]), [2, 4])
+
+        [entry] = get_cache_stats()
+        self.assertEqual(entry.namespace, 'test-stats-result')
+        self.assertEqual((entry.hits, entry.misses), (2, 2))
+        self.assertGreater(entry.bytes, 0)
+
+    def test_template_fragments(self):
+        cache = caches['template_fragments']
+        key = 'template.cache.tree.0123abcd'
+        self.assertIsNone(cache.get(key))
+        cache.set(key, '<ul></ul>')
+        self.assertEqual(cache.get(key), '<ul></ul>')
+        self.assertEqual(caches['default'].get(key), '<ul></ul>')
+
+        [entry] = get_cache_stats()
+        self.assertEqual(entry.namespace, 'template.cache.tree')
+        self.assertEqual((entry.hits, entry.misses), (1, 1))
+        self.assertGreater(entry.bytes, 0)
+
+    def test_template_fragments_set_without_miss(self):
+        caches['template_fragments'].set('template.cache.tree.0123', 'html')
+        self.assertEqual(get_cache_stats(), [])
@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.text import slugify
+from ngram import NGram
+
+from tree.models import Ancestor
+
+
+@dataclass
+class Person:
+    pk: int
+    firstname: str
+    lastname: str
+    birthyear: Optional[int]
+    birthplace: str
+
+    @property
+    def block(self) -> Tuple[str, Optional[int]]:
+        # Surnames are compared without spaces, dashes or accents
+        surname = slugify(self.lastname).replace('-', '')
+        decade = self.birthyear // 10 if self.birthyear else None
+        return surname, decade
+
+
+@dataclass
+class Duplicate:
+    ancestor_id: int
+    duplicate_id: int
+    score: int
+
+
+class DuplicateFinder:
+    """Proposes pairs of ancestors that may be the same person.
+
+    People are only compared within a block of the same normalized surname
+    and birth decade, and with the next decade, so someone born in 1849 is
+    still compared with someone born in 1850. The number of comparisons
+    grows with the size of the blocks, not with the square of the total.
+
+    """
+
+    weights = [
+        ('firstname', 40),
+        ('lastname', 30),
+        ('birthyear', 20),
+        ('birthplace', 10),
+    ]
+
+    def __init__(self, people: Iterable[Person]):
+        self.blocks: Dict[Tuple[str, Optional[int]], List[Person]] = {}
+        for person in people:
+            if person.block[0]:
+                self.blocks.setdefault(person.block, []).append(person)
+
+    @classmethod
+    def load(cls) -> 'DuplicateFinder':
+        return cls(
+            Person(
+                pk=pk,
+                firstname=(female_name if gender == 'f' else male_name) or '',
+                lastname=' '.join(filter(None, [middlename, lastname])),
+                birthyear=birthyear,
+                birthplace=birthplace
+            )
+            for (
+                pk, gender, male_name, female_name, middlename, lastname,
+                birthyear, birthplace
+            ) in Ancestor.objects.order_by('pk').values_list(
+                'pk', 'gender', 'christian_name__male_name',
+                'christian_name__female_name', 'middlename', 'lastname',
+                'birthyear', 'birthplace'
+            )
+        )
+
+    def find(self, min_score: int = None) -> List[Duplicate]:
+        if min_score is None:
+            min_score = settings.DUPLICATE_MIN_SCORE
+
+        duplicates = []
+        for (surname, decade), people in self.blocks.items():
+            for index, person in enumerate(people):
+                others = people[index + 1:]
+                if decade is not None:
+                    others += self.blocks.get((surname, decade + 1), [])
+                for other in others:
+                    score = self.compare(person, other)
+                    if score >= min_score:
+                        duplicates.append(Duplicate(
+                            ancestor_id=min(person.pk, other.pk),
+                            duplicate_id=max(person.pk, other.pk),
+                            score=score
+                        ))
+
+        return duplicates
+
+    def compare(self, person: Person, other: Person) -> int:
+        scores = {
+            'firstname': self._compare_text(person.firstname, other.firstname),
+            'lastname': self._compare_text(person.lastname, other.lastname),
+            'birthyear': self._compare_years(
+                person.birthyear, other.birthyear
+            ),
+            'birthplace': self._compare_text(
+                person.birthplace, other.birthplace
+            )
+        }
+        return int(sum(
+            scores[field] * weight for field, weight in self.weights
+        ))
+
+    @staticmethod
+    def _compare_text(value: str, other: str) -> float:
+        if not value or not other:
+            # Missing data neither counts for nor against a match
+            return 0.5
+        return NGram.compare(value.lower(), other.lower(), N=3)
+
+    @staticmethod
+    def _compare_years(year: Optional[int], other: Optional[int]) -> float:
+        if year is None or other is None:
+            return 0.5
+        return max(0.0, 1 - abs(year - other) / 5)
+
+
+def find_duplicates(min_score: int = None) -> List[Duplicate]:
+    return DuplicateFinder.load().find(min_score)
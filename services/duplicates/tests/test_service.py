@@ -0,0 +1,76 @@
+from django.test import SimpleTestCase
+
+from services.duplicates.service import DuplicateFinder, Person, \
+    find_duplicates
+from tree.tests.factories import AncestorFactory
+from tree.tests.testcases import TreeTestCase
+
+
+class CountingFinder(DuplicateFinder):
+
+    comparisons = 0
+
+    def compare(self, person, other):
+        self.comparisons += 1
+        return super().compare(person, other)
+
+
+class TestDuplicateFinder(SimpleTestCase):
+
+    def test_find(self):
+        finder = DuplicateFinder([
+            Person(1, 'Pieter', 'van Dijk', 1849, 'Utrecht'),
+            Person(2, 'Piet', 'van Dijk', 1850, 'Utrecht'),
+            Person(3, 'Klaas', 'van Dijk', 1850, 'Utrecht'),
+        ])
+        result = [
+            (duplicate.ancestor_id, duplicate.duplicate_id)
+            for duplicate in finder.find(min_score=70)
+        ]
+        expected = [(1, 2)]
+        self.assertEqual(result, expected)
+
+    def test_find_compares_within_blocks(self):
+        finder = CountingFinder([
+            Person(1, 'Pieter', 'van Dijk', 1849, 'Utrecht'),
+            Person(2, 'Pieter', 'Van-Dijk', 1850, 'Utrecht'),
+            Person(3, 'Pieter', 'van Dijk', 1870, 'Utrecht'),
+            Person(4, 'Pieter', 'Jansen', 1849, 'Utrecht'),
+            Person(5, 'Pieter', '', 1849, 'Utrecht'),
+        ])
+        finder.find()
+        self.assertEqual(finder.comparisons, 1)
+
+    def test_compare(self):
+        finder = DuplicateFinder([])
+        self.assertEqual(
+            finder.compare(
+                Person(1, 'Pieter', 'van Dijk', 1849, 'Utrecht'),
+                Person(2, 'Pieter', 'van Dijk', 1849, 'Utrecht')
+            ),
+            100
+        )
+        self.assertEqual(
+            finder.compare(
+                Person(1, 'Pieter', 'van Dijk', None, ''),
+                Person(2, 'Pieter', 'van Dijk', 1849, 'Utrecht')
+            ),
+            85
+        )
+
+
+class TestFindDuplicates(TreeTestCase):
+
+    def test_find_duplicates(self):
+        ancestors = [
+            AncestorFactory(
+                gender='m', firstname='Pieter', middlename='van',
+                lastname='Dijk', birthyear=birthyear, birthplace='Utrecht'
+            )
+            for birthyear in (1849, 1850)
+        ]
+        result = [
+            (duplicate.ancestor_id, duplicate.duplicate_id)
+            for duplicate in find_duplicates()
+        ]
+        self.assertIn((ancestors[0].pk, ancestors[1].pk), result)
@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from tree.graph import ParentGraph
+from tree.models import Ancestor
+
+
+@dataclass
+class DiscoveredLineage:
+    ancestor_id: int
+    descendant_id: int
+
+
+class LineageDiscovery:
+    """Finds the founders of the family and their longest direct lines.
+
+    A founder is someone without parents who has children, unless every
+    child has another parent with parents of their own: then the founder
+    married into a family that is covered already. Of a founding couple only
+    the husband gets a lineage. The line runs to the founder's deepest
+    descendant, or to the eldest of them in case of a tie.
+
+    """
+
+    def __init__(self, graph: ParentGraph, ranks: Dict[int, int]):
+        self.graph = graph
+        self.ranks = ranks
+        self.children: Dict[int, List[int]] = {}
+        for position in range(len(graph.ids)):
+            for parent in (graph.fathers[position], graph.mothers[position]):
+                if parent != -1:
+                    self.children.setdefault(parent, []).append(position)
+
+    @classmethod
+    def load(cls) -> 'LineageDiscovery':
+        ranks = {
+            pk: rank
+            for rank, pk in enumerate(
+                Ancestor.objects
+                .with_age()
+                .order_by('age', 'pk')
+                .values_list('pk', flat=True)
+            )
+        }
+        return cls(ParentGraph.load(), ranks)
+
+    def discover(self) -> List[DiscoveredLineage]:
+        founders = [
+            position for position in range(len(self.graph.ids))
+            if self._is_founder(position)
+        ]
+        deepest = self._deepest_descendants(founders)
+        return [
+            DiscoveredLineage(
+                ancestor_id=self.graph.ids[position],
+                descendant_id=self.graph.ids[deepest[position][1]]
+            )
+            for position in founders
+        ]
+
+    def _has_parents(self, position: int) -> bool:
+        parents = (self.graph.fathers[position], self.graph.mothers[position])
+        return parents != (-1, -1)
+
+    def _is_founder(self, position: int) -> bool:
+        if self._has_parents(position):
+            return False
+
+        for child in self.children.get(position, []):
+            father = self.graph.fathers[child]
+            mother = self.graph.mothers[child]
+            other = mother if father == position else father
+            if other == -1:
+                return True
+            if not self._has_parents(other) and father == position:
+                return True
+
+        return False
+
+    def _deepest_descendants(
+            self, positions: List[int]) -> Dict[int, Tuple[int, int]]:
+        """Map positions to the (depth, position) of their deepest descendant.
+
+        People without children are their own deepest descendant, at depth 0.
+        The traversal is iterative and ignores links that loop back.
+
+        """
+        deepest = {}
+        visiting = set()
+        stack = list(positions)
+        while stack:
+            position = stack[-1]
+            if position in deepest:
+                stack.pop()
+                continue
+
+            children = self.children.get(position, [])
+            if position not in visiting:
+                visiting.add(position)
+                stack.extend(
+                    child for child in children
+                    if child not in deepest and child not in visiting
+                )
+                continue
+
+            stack.pop()
+            visiting.discard(position)
+            candidates = [(0, position)] + [
+                (deepest[child][0] + 1, deepest[child][1])
+                for child in children
+                if child in deepest
+            ]
+            deepest[position] = min(
+                candidates,
+                key=lambda candidate: (
+                    -candidate[0],
+                    self.ranks.get(self.graph.ids[candidate[1]], 0)
+                )
+            )
+
+        return deepest
+
+
+def discover_lineages() -> List[DiscoveredLineage]:
+    return LineageDiscovery.load().discover()
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from lib.cache.local import ProcessLocalValue
+from tree.models import Ancestor, Generation, Lineage, Marriage
+from tree.snapshot import get_parent_graph
+
+
+@dataclass
+class RootIndex:
+    roots: Dict[int, int]
+    slugs: Dict[int, str]
+
+    def find_root_slug(self, ancestor: Ancestor) -> Optional[str]:
+        root_id = self.roots.get(ancestor.pk)
+        return self.slugs[root_id] if root_id is not None else None
+
+    def has_lineage(self, ancestor: Ancestor) -> bool:
+        return ancestor.pk in self.slugs
+
+
+class RootIndexBuilder:
+    """Finds the root ancestor of every ancestor in one pass.
+
+    An ancestor that is part of a lineage belongs to the lineage in which it
+    comes first, otherwise we look at the spouses, the father and the
+    mother, in that order. Every ancestor is resolved once, from bulk-loaded
+    ids.
+
+    """
+
+    def __init__(self):
+        self.graph = get_parent_graph()
+        self.lineage_roots = self._get_lineage_roots()
+        self.spouses = self._get_spouses()
+        self._roots = {}
+        self._resolving = set()
+
+    def build(self) -> RootIndex:
+        roots = {}
+        for pk in self.graph.ids:
+            if (root_id := self._find_root(pk)) is not None:
+                roots[pk] = root_id
+
+        slugs = dict(
+            Ancestor.objects
+            .filter(pk__in=set(self.lineage_roots.values()))
+            .values_list('pk', 'slug')
+        )
+        return RootIndex(roots=roots, slugs=slugs)
+
+    def _find_root(self, pk: int, check_spouses: bool = True) -> Optional[int]:
+        key = (pk, check_spouses)
+        if key in self._roots:
+            return self._roots[key]
+
+        # Guard against parent links that loop back
+        if key in self._resolving:
+            return None
+
+        self._resolving.add(key)
+        self._roots[key] = self._resolve(pk, check_spouses)
+        self._resolving.discard(key)
+        return self._roots[key]
+
+    def _resolve(self, pk: int, check_spouses: bool) -> Optional[int]:
+        if pk in self.lineage_roots:
+            return self.lineage_roots[pk]
+
+        if check_spouses:
+            for spouse_id in self.spouses.get(pk, []):
+                if (result := self._find_root(spouse_id, False)) is not None:
+                    return result
+
+        position = self.graph.positions[pk]
+        for parents in (self.graph.fathers, self.graph.mothers):
+            if parents[position] == -1:
+                continue
+            result = self._find_root(self.graph.ids[parents[position]])
+            if result is not None:
+                return result
+
+    @staticmethod
+    def _get_lineage_roots() -> Dict[int, int]:
+        members = {}
+        for pk, ancestor_id, descendant_id in (
+                Lineage.objects.order_by('pk')
+                .values_list('pk', 'ancestor_id', 'descendant_id')):
+            members[pk] = [ancestor_id, descendant_id]
+
+        for lineage_id, ancestor_id in (
+                Generation.objects.order_by('-generation')
+                .values_list('lineage_id', 'ancestor_id')):
+            members[lineage_id].insert(1, ancestor_id)
+
+        # Keep the lineage in which the ancestor comes first
+        positions = {}
+        for pk, generations in members.items():
+            for index, ancestor_id in enumerate(generations):
+                if index < positions.get(ancestor_id, (index + 1, ))[0]:
+                    positions[ancestor_id] = (index, generations[0])
+
+        return {
+            ancestor_id: root_id
+            for ancestor_id, (_, root_id) in positions.items()
+        }
+
+    @staticmethod
+    def _get_spouses() -> Dict[int, List[int]]:
+        spouses = {}
+        for husband_id, wife_id in Marriage.objects.values_list(
+                'husband_id', 'wife_id'):
+            spouses.setdefault(husband_id, []).append(wife_id)
+            spouses.setdefault(wife_id, []).append(husband_id)
+        return spouses
+
+
+def build_root_index() -> RootIndex:
+    return RootIndexBuilder().build()
+
+
+# The index covers every ancestor, which is too large for a single cache
+# entry, so every process keeps its own copy.
+_root_index = ProcessLocalValue('lineage-roots-version', build_root_index)
+
+
+def get_root_index() -> RootIndex:
+    return _root_index.get()
+
+
+def invalidate_root_index():
+    _root_index.invalidate()
@@ -0,0 +1,47 @@
+from services.lineage.discovery import LineageDiscovery
+from tree.tests.factories import AncestorFactory, MarriageFactory
+from tree.tests.testcases import TreeTestCase
+
+
+class TestLineageDiscovery(TreeTestCase):
+
+    def test_discover(self):
+        child = AncestorFactory(
+            gender='m', father=self.generation_extra[0], firstname='Dick'
+        )
+        result = [
+            (lineage.ancestor_id, lineage.descendant_id)
+            for lineage in LineageDiscovery.load().discover()
+        ]
+        expected = [(self.top_male.pk, child.pk)]
+        self.assertEqual(result, expected)
+
+    def test_discover_single_parent(self):
+        founder = AncestorFactory(gender='f', firstname='Mary')
+        child = AncestorFactory(gender='m', mother=founder, firstname='Dick')
+        result = [
+            (lineage.ancestor_id, lineage.descendant_id)
+            for lineage in LineageDiscovery.load().discover()
+            if lineage.ancestor_id != self.top_male.pk
+        ]
+        expected = [(founder.pk, child.pk)]
+        self.assertEqual(result, expected)
+
+    def test_discover_eldest_descendant(self):
+        founder = AncestorFactory(gender='m', firstname='Paul')
+        wife = AncestorFactory(gender='f', firstname='Mary')
+        MarriageFactory(husband=founder, wife=wife)
+        children = [
+            AncestorFactory(
+                gender='m', father=founder, mother=wife, birthyear=birthyear,
+                year_of_death=None
+            )
+            for birthyear in (1902, 1900)
+        ]
+        result = [
+            (lineage.ancestor_id, lineage.descendant_id)
+            for lineage in LineageDiscovery.load().discover()
+            if lineage.ancestor_id != self.top_male.pk
+        ]
+        expected = [(founder.pk, children[1].pk)]
+        self.assertEqual(result, expected)
@@ -0,0 +1,73 @@
+from services.lineage.roots import build_root_index, get_root_index, \
+    invalidate_root_index
+from tree.tests.factories import AncestorFactory, LineageFactory, \
+    MarriageFactory
+from tree.tests.testcases import TreeTestCase
+
+
+class TestRootIndex(TreeTestCase):
+
+    def test_build(self):
+        with self.assertNumQueries(5):
+            root_index = build_root_index()
+        self.assertEqual(
+            root_index.find_root_slug(self.spouse_1), self.top_male.slug
+        )
+
+    def test_build_in_lineage(self):
+        root_index = build_root_index()
+        self.assertEqual(root_index.roots[self.top_male.pk], self.top_male.pk)
+        self.assertEqual(
+            root_index.roots[self.generation_1[0].pk], self.top_male.pk
+        )
+
+    def test_build_for_parents(self):
+        daughter = AncestorFactory(
+            gender='f', mother=self.generation_1[1], father=None
+        )
+        son = AncestorFactory(
+            gender='m', mother=None, father=self.generation_2[0]
+        )
+        root_index = build_root_index()
+        self.assertEqual(root_index.roots[daughter.pk], self.top_male.pk)
+        self.assertEqual(root_index.roots[son.pk], self.top_male.pk)
+
+    def test_build_multiple_lineages(self):
+        spouse = AncestorFactory(gender='f')
+        generation_3 = AncestorFactory(
+            gender='m', father=self.generation_2[0], mother=spouse
+        )
+        MarriageFactory(husband=self.generation_2[0], wife=spouse)
+        generation_4 = AncestorFactory(gender='m', father=generation_3)
+        LineageFactory(
+            ancestor=self.generation_1[1], descendant=self.generation_extra[0]
+        )
+        LineageFactory(ancestor=self.top_female, descendant=generation_4)
+
+        root_index = build_root_index()
+        self.assertEqual(
+            root_index.roots[generation_3.pk], self.top_female.pk
+        )
+        self.assertEqual(
+            root_index.roots[self.spouse_2.pk], self.generation_1[1].pk
+        )
+
+    def test_has_lineage(self):
+        root_index = build_root_index()
+        self.assertTrue(root_index.has_lineage(self.top_male))
+        self.assertFalse(root_index.has_lineage(self.generation_1[0]))
+
+    def test_get_root_index(self):
+        root_index = get_root_index()
+        self.assertIs(get_root_index(), root_index)
+
+        invalidate_root_index()
+        self.assertIsNot(get_root_index(), root_index)
+
+    def test_root_index_is_invalidated(self):
+        root_index = get_root_index()
+        LineageFactory(
+            ancestor=self.top_female, descendant=self.generation_extra[0]
+        )
+        self.assertIsNot(get_root_index(), root_index)
+        self.assertTrue(get_root_index().has_lineage(self.top_female))
@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from tree.models import Ancestor
+
+
+@dataclass
+class CommonAncestor:
+    ancestor: Ancestor
+    depth_a: int
+    depth_b: int
+
+
+@dataclass
+class Relationship:
+    ancestor_a: Ancestor
+    ancestor_b: Ancestor
+    common_ancestors: List[CommonAncestor]
+    label: Optional[str]
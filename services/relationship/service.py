@@ -0,0 +1,150 @@
+from typing import Dict, List, Optional
+
+from .models import CommonAncestor, Relationship
+from tree.models import Ancestor, AncestorClosure
+
+
+# Forms for a male and a female relative
+ANCESTORS = [
+    ('vader', 'moeder'),
+    ('grootvader', 'grootmoeder'),
+    ('overgrootvader', 'overgrootmoeder'),
+    ('betovergrootvader', 'betovergrootmoeder'),
+    ('oudvader', 'oudmoeder'),
+    ('oudgrootvader', 'oudgrootmoeder'),
+    ('oudovergrootvader', 'oudovergrootmoeder'),
+    ('oudbetovergrootvader', 'oudbetovergrootmoeder'),
+]
+
+FOREFATHERS = ('voorvader', 'voormoeder')
+
+DESCENDANTS = [
+    ('zoon', 'dochter'),
+    ('kleinzoon', 'kleindochter'),
+]
+
+SIBLINGS = ('broer', 'zus')
+
+HALF_SIBLINGS = ('halfbroer', 'halfzus')
+
+PARENTS_SIBLINGS = [
+    ('oom', 'tante'),
+    ('oudoom', 'oudtante'),
+    ('overoudoom', 'overoudtante'),
+]
+
+NEPHEWS = ('neef', 'nicht')
+
+SECOND_NEPHEWS = ('achterneef', 'achternicht')
+
+DISTANT = ('verre verwant', 'verre verwant')
+
+
+class RelationshipService:
+    """Finds how two ancestors are related, using the closure table.
+
+    The lowest common ancestors are the ones closest to both, and the label
+    says what the second ancestor is to the first.
+
+    """
+
+    def get_relationship(self, ancestor_a: Ancestor,
+                         ancestor_b: Ancestor) -> Relationship:
+        depths = self._get_depths(ancestor_a, ancestor_b)
+        common = set(depths[ancestor_a.pk]) & set(depths[ancestor_b.pk])
+        if not common:
+            return Relationship(ancestor_a, ancestor_b, [], None)
+
+        distances = {
+            pk: depths[ancestor_a.pk][pk] + depths[ancestor_b.pk][pk]
+            for pk in common
+        }
+        distance = min(distances.values())
+        lowest = sorted(pk for pk in common if distances[pk] == distance)
+        ancestors = {ancestor_a.pk: ancestor_a, ancestor_b.pk: ancestor_b}
+        ancestors.update(Ancestor.objects.in_bulk(
+            [pk for pk in lowest if pk not in ancestors]
+        ))
+        common_ancestors = [
+            CommonAncestor(
+                ancestor=ancestors[pk],
+                depth_a=depths[ancestor_a.pk][pk],
+                depth_b=depths[ancestor_b.pk][pk]
+            )
+            for pk in lowest
+        ]
+        return Relationship(
+            ancestor_a,
+            ancestor_b,
+            common_ancestors,
+            self.get_label(
+                common_ancestors[0].depth_a,
+                common_ancestors[0].depth_b,
+                ancestor_b.gender,
+                half=self._is_half_sibling(ancestor_a, ancestor_b)
+            )
+        )
+
+    def get_label(self, depth_a: int, depth_b: int, gender: str,
+                  half: bool = False) -> Optional[str]:
+        """Return what someone of the given gender is to the first person.
+
+        depth_a and depth_b are the number of generations from the first and
+        the second person up to their common ancestor.
+
+        """
+        if depth_a == depth_b == 0:
+            return None
+
+        if depth_b == 0:
+            forms = self._get_form(ANCESTORS, depth_a - 1, FOREFATHERS)
+        elif depth_a == 0:
+            # Every generation after the grandchildren adds an 'achter'
+            forms = self._get_form(DESCENDANTS, depth_b - 1, tuple(
+                'achter' * (depth_b - 2) + form for form in DESCENDANTS[-1]
+            ))
+        elif depth_a == depth_b == 1:
+            forms = HALF_SIBLINGS if half else SIBLINGS
+        elif depth_b == 1:
+            forms = self._get_form(PARENTS_SIBLINGS, depth_a - 2, DISTANT)
+        elif depth_a == depth_b == 2 or (depth_a, depth_b) == (1, 2):
+            forms = NEPHEWS
+        elif max(depth_a, depth_b) == 3:
+            forms = SECOND_NEPHEWS
+        else:
+            forms = DISTANT
+
+        return forms[1] if gender == 'f' else forms[0]
+
+    @staticmethod
+    def _is_half_sibling(ancestor_a: Ancestor, ancestor_b: Ancestor) -> bool:
+        # Siblings with a parent that isn't recorded may share it anyway
+        parents_a = (ancestor_a.father_id, ancestor_a.mother_id)
+        parents_b = (ancestor_b.father_id, ancestor_b.mother_id)
+        if None in parents_a + parents_b:
+            return False
+        return sum(a == b for a, b in zip(parents_a, parents_b)) == 1
+
+    @staticmethod
+    def _get_form(forms, index, default):
+        return forms[index] if index < len(forms) else default
+
+    @staticmethod
+    def _get_depths(ancestor_a: Ancestor,
+                    ancestor_b: Ancestor) -> Dict[int, Dict[int, int]]:
+        # Everyone is their own ancestor at depth 0
+        depths = {
+            ancestor_a.pk: {ancestor_a.pk: 0},
+            ancestor_b.pk: {ancestor_b.pk: 0}
+        }
+        for descendant_id, ancestor_id, depth in (
+                AncestorClosure.objects
+                .filter(descendant__in=[ancestor_a, ancestor_b])
+                .values_list('descendant_id', 'ancestor_id', 'depth')):
+            depths[descendant_id][ancestor_id] = depth
+        return depths
+
+
+def get_relationship(ancestor_a: Ancestor,
+                     ancestor_b: Ancestor) -> Relationship:
+    return RelationshipService().get_relationship(ancestor_a, ancestor_b)
@@ -0,0 +1,108 @@
+from services.relationship.service import RelationshipService
+from tree.tests.factories import AncestorFactory
+from tree.tests.testcases import TreeTestCase
+
+
+class TestRelationshipService(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service = RelationshipService()
+
+    def test_get_relationship_descendant(self):
+        result = self.service.get_relationship(
+            self.top_male, self.generation_2[0]
+        )
+        self.assertEqual(result.label, 'kleinzoon')
+        self.assertEqual(len(result.common_ancestors), 1)
+        common_ancestor = result.common_ancestors[0]
+        self.assertEqual(common_ancestor.ancestor, self.top_male)
+        self.assertEqual(common_ancestor.depth_a, 0)
+        self.assertEqual(common_ancestor.depth_b, 2)
+
+    def test_get_relationship_ancestor(self):
+        result = self.service.get_relationship(
+            self.generation_2[0], self.top_female
+        )
+        self.assertEqual(result.label, 'grootmoeder')
+
+    def test_get_relationship_siblings(self):
+        result = self.service.get_relationship(
+            self.generation_2[1], self.generation_2[0]
+        )
+        self.assertEqual(result.label, 'broer')
+        self.assertCountEqual(
+            [
+                common_ancestor.ancestor
+                for common_ancestor in result.common_ancestors
+            ],
+            [self.generation_1[0], self.spouse_1]
+        )
+
+    def test_get_relationship_half_siblings(self):
+        ancestor = AncestorFactory(
+            gender='f', father=self.generation_1[0],
+            mother=AncestorFactory(gender='f')
+        )
+        result = self.service.get_relationship(
+            self.generation_2[0], ancestor
+        )
+        self.assertEqual(result.label, 'halfzus')
+
+    def test_get_relationship_siblings_unknown_parent(self):
+        ancestor = AncestorFactory(
+            gender='f', father=self.generation_1[0], mother=None
+        )
+        result = self.service.get_relationship(
+            self.generation_2[0], ancestor
+        )
+        self.assertEqual(result.label, 'zus')
+
+    def test_get_relationship_cousins(self):
+        result = self.service.get_relationship(
+            self.generation_2[0], self.generation_extra[1]
+        )
+        self.assertEqual(result.label, 'nicht')
+        self.assertCountEqual(
+            [
+                (
+                    common_ancestor.ancestor,
+                    common_ancestor.depth_a,
+                    common_ancestor.depth_b
+                )
+                for common_ancestor in result.common_ancestors
+            ],
+            [(self.top_male, 2, 2), (self.top_female, 2, 2)]
+        )
+
+    def test_get_relationship_uncle(self):
+        result = self.service.get_relationship(
+            self.generation_2[0], self.generation_1[1]
+        )
+        self.assertEqual(result.label, 'tante')
+
+    def test_get_relationship_unrelated(self):
+        result = self.service.get_relationship(self.top_male, self.spouse_1)
+        self.assertEqual(result.common_ancestors, [])
+        self.assertIsNone(result.label)
+
+    def test_get_relationship_num_queries(self):
+        with self.assertNumQueries(2):
+            self.service.get_relationship(
+                self.generation_2[0], self.generation_extra[1]
+            )
+
+    def test_get_label(self):
+        self.assertEqual(
+            self.service.get_label(0, 3, 'm'), 'achterkleinzoon'
+        )
+        self.assertEqual(
+            self.service.get_label(0, 4, 'f'), 'achterachterkleindochter'
+        )
+        self.assertEqual(
+            self.service.get_label(4, 0, 'm'), 'betovergrootvader'
+        )
+        self.assertEqual(self.service.get_label(5, 0, 'm'), 'oudvader')
+        self.assertEqual(self.service.get_label(3, 1, 'm'), 'oudoom')
+        self.assertEqual(self.service.get_label(1, 2, 'm'), 'neef')
+        self.assertEqual(self.service.get_label(3, 3, 'f'), 'achternicht')
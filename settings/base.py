@@ -33,9 +33,28 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
         'LOCATION': '127.0.0.1:11211',
+    },
+    'local': {
+        'BACKEND': 'lib.cache.backends.TwoTierCache',
+        'OPTIONS': {
+            'BACKEND': 'default',
+            'MAX_ENTRIES': 1000,
+            'MAX_BYTES': 32 * 1024 * 1024
+        }
+    },
+    # Used by the cache template tag
+    'template_fragments': {
+        'BACKEND': 'lib.cache.backends.InstrumentedCache',
+        'OPTIONS': {
+            'BACKEND': 'default'
+        }
     }
 }
 
+# How many seconds a process counts cache hits and misses before it adds
+# them to the shared counters
+CACHE_STATS_FLUSH_INTERVAL = 60
+
 
 # Application definition
 
@@ -153,6 +172,17 @@ REST_FRAMEWORK = {
 
 NAME_NGRAM_MIN_SCORE = 30
 
+DUPLICATE_MIN_SCORE = 80
+
+PEDIGREE_DEPTH = 5
+
+# The binary snapshot of the family graph that workers share, which the
+# write_graph_snapshot command writes. Schedule the command with --if-stale,
+# as the deployment does, to replace the snapshot after the data changed.
+# Without it every worker keeps its own graph of the whole family to render
+# trees from.
+GRAPH_SNAPSHOT_PATH = None
+
 SEARCH_ORDER_BY_AGE = 'age'
 SEARCH_ORDER_BY_SCORE = '-score'
 SEARCH_ORDER_BY_RANK = '-rank'
@@ -2,3 +2,7 @@ from settings.base import *
 
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Written by the deployment after migrating, and by a cron entry it installs
+# that runs write_graph_snapshot --if-stale every five minutes
+GRAPH_SNAPSHOT_PATH = BASE_DIR / 'var' / 'family-graph.snapshot'
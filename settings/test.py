@@ -4,5 +4,12 @@ from settings.base import *
 CACHES = {
     'default': {
         'BACKEND': 'tree.tests.cache.TestCache'
+    },
+    # Without local entries every read still goes to the test cache
+    'local': {
+        'BACKEND': 'lib.cache.backends.TwoTierCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 0
+        }
     }
 }
@@ -6,9 +6,15 @@ from django import forms
 from django.contrib import admin
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
 from nested_inline.admin import NestedStackedInline, NestedModelAdmin
 
+from lib.cache.backends import bump_epoch
+from lib.cache.dependencies import get_generation
 from tree import models
+from tree.components import ComponentReport
 
 
 class AncestorField(forms.ModelChoiceField):
@@ -172,6 +178,48 @@ class AncestorAdmin(NestedModelAdmin):
 
     form = AncestorForm
 
+    # Large databases can have many disconnected people; only the first
+    # ones are listed by name.
+    max_listed_ancestors = 1000
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'components/',
+                self.admin_site.admin_view(self.components_view),
+                name='{}_{}_components'.format(*info)
+            )
+        ] + super().get_urls()
+
+    def components_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        report = ComponentReport.load()
+        disconnected = report.disconnected
+        disconnected_ids = report.disconnected_ids
+        listed = disconnected_ids[:self.max_listed_ancestors]
+        ancestors = models.Ancestor.objects.in_bulk(listed)
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='Samenhang van de stamboom',
+            root_size=len(report.root_component),
+            sizes=report.sizes,
+            disconnected_count=len(disconnected_ids),
+            components=[
+                (
+                    len(component),
+                    [ancestors[pk] for pk in component if pk in ancestors]
+                )
+                for component in disconnected
+            ]
+        )
+        return TemplateResponse(
+            request, 'admin/tree/ancestor/components.html', context
+        )
+
 
 admin.site.register(models.Ancestor, AncestorAdmin)
 
@@ -181,13 +229,18 @@ class LineageAdmin(admin.ModelAdmin):
     form = LineageForm
 
     def clear_caches(self, request, queryset):
+        generations = {
+            namespace: get_generation(namespace)
+            for namespace in ['lineages', 'lineage-objects', 'tree']
+        }
         for lineage in queryset:
-            cache.delete('lineages:{}'.format(lineage.ancestor_id))
-            cache.delete('lineage-objects:ancestor={}'.format(
-                lineage.ancestor_id))
-            cache.delete(
-                make_template_fragment_key('tree', [lineage.ancestor_id])
-            )
+            cache.delete('lineages:{}:{}'.format(
+                lineage.ancestor_id, generations['lineages']))
+            cache.delete('lineage-objects:ancestor={}:{}'.format(
+                lineage.ancestor_id, generations['lineage-objects']))
+            cache.delete(make_template_fragment_key(
+                'tree', [lineage.ancestor_id, generations['tree']]))
+        bump_epoch(cache)
 
     actions = [clear_caches]
 
@@ -203,3 +256,21 @@ class ChristianNameAdmin(admin.ModelAdmin):
 
 
 admin.site.register(models.ChristianName, ChristianNameAdmin)
+
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+
+    list_display = ['ancestor', 'duplicate', 'score', 'status']
+
+    list_editable = ['status']
+
+    list_filter = ['status']
+
+    list_select_related = [
+        'ancestor__christian_name', 'duplicate__christian_name'
+    ]
+
+    readonly_fields = ['ancestor', 'duplicate', 'score']
+
+
+admin.site.register(models.DuplicateCandidate, DuplicateCandidateAdmin)
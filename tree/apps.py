@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class TreeConfig(AppConfig):
+
+    name = 'tree'
+
+    def ready(self):
+        from tree import signals
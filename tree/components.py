@@ -0,0 +1,103 @@
+"""
+Contains a report of the connected components of the family.
+
+"""
+from array import array
+
+from tree import models
+
+
+class UnionFind(object):
+    """Disjoint sets over the positions 0..size - 1."""
+
+    def __init__(self, size):
+        self.parents = array('l', range(size))
+        self.sizes = array('l', [1]) * size
+
+    def find(self, position):
+        parents = self.parents
+        while parents[position] != position:
+            # Path halving keeps the trees flat without recursion
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+
+        if self.sizes[first] < self.sizes[second]:
+            first, second = second, first
+        self.parents[second] = first
+        self.sizes[first] += self.sizes[second]
+
+
+class ComponentReport(object):
+    """Groups everyone into families connected by parents and marriages.
+
+    Everyone outside the component of the root ancestor is disconnected:
+    they can't be reached from the tree pages.
+
+    """
+
+    def __init__(self, rows, marriages, root_id=None):
+        rows = list(rows)
+        self.ids = array('l', [pk for pk, _, _ in rows])
+        positions = {pk: position for position, pk in enumerate(self.ids)}
+
+        sets = UnionFind(len(self.ids))
+        for position, (_, father_id, mother_id) in enumerate(rows):
+            for parent_id in (father_id, mother_id):
+                if parent_id in positions:
+                    sets.union(position, positions[parent_id])
+        for husband_id, wife_id in marriages:
+            if husband_id in positions and wife_id in positions:
+                sets.union(positions[husband_id], positions[wife_id])
+
+        self.components = {}
+        for position, pk in enumerate(self.ids):
+            self.components.setdefault(sets.find(position), []).append(pk)
+
+        root = positions.get(root_id)
+        self.root_component = (
+            self.components[sets.find(root)] if root is not None else []
+        )
+
+    @classmethod
+    def load(cls):
+        rows = (
+            models.Ancestor.objects
+            .order_by('pk')
+            .values_list('pk', 'father_id', 'mother_id')
+        )
+        marriages = (
+            models.Marriage.objects.values_list('husband_id', 'wife_id')
+        )
+        root_id = (
+            models.Ancestor.objects
+            .filter(is_root=True)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        return cls(rows, marriages, root_id)
+
+    @property
+    def sizes(self):
+        """Return the sizes of the components, largest first."""
+        return sorted(map(len, self.components.values()), reverse=True)
+
+    @property
+    def disconnected(self):
+        """Return the other components, largest first."""
+        return sorted(
+            (
+                component for component in self.components.values()
+                if component is not self.root_component
+            ),
+            key=lambda component: (-len(component), component[0])
+        )
+
+    @property
+    def disconnected_ids(self):
+        return [pk for component in self.disconnected for pk in component]
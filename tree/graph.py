@@ -0,0 +1,221 @@
+"""
+Contains an in-memory index of the family graph.
+
+"""
+from array import array
+from collections import deque
+
+from lib.cache.local import ProcessLocalValue
+from tree import models
+
+
+class ParentGraph(object):
+    """An array-backed index of the father and mother of every ancestor."""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.ids = array('l', [pk for pk, _, _ in rows])
+        self.positions = {pk: position for position, pk in enumerate(self.ids)}
+        self.fathers = array('l', [
+            self.positions.get(father_id, -1) for _, father_id, _ in rows
+        ])
+        self.mothers = array('l', [
+            self.positions.get(mother_id, -1) for _, _, mother_id in rows
+        ])
+
+    @classmethod
+    def load(cls, pks=None):
+        """Load the parents of everyone, or of the ancestors with the ids."""
+        ancestors = models.Ancestor.objects.order_by()
+        if pks is not None:
+            ancestors = ancestors.filter(pk__in=pks)
+        return cls(ancestors.values_list('pk', 'father_id', 'mother_id'))
+
+    def path(self, ancestor_id, descendant_id):
+        """Return the ids of the generations between ancestor and descendant.
+
+        Walks upward from the descendant, breadth first, until the ancestor
+        is reached. The result is ordered from the ancestor's child down to
+        the descendant's parent, and is empty if there is no such line.
+
+        """
+        start = self.positions.get(descendant_id)
+        target = self.positions.get(ancestor_id)
+        if start is None or target is None or start == target:
+            return []
+
+        previous = {start: -1}
+        queue = deque([start])
+        while queue:
+            position = queue.popleft()
+            for parent in (self.fathers[position], self.mothers[position]):
+                if parent == -1 or parent in previous:
+                    continue
+                previous[parent] = position
+                if parent == target:
+                    return self._unwind(previous, target)
+                queue.append(parent)
+
+        return []
+
+    def ancestor_depths(self, positions):
+        """Map the given positions to the depths of all their ancestors.
+
+        The depth is the length of the shortest line to the ancestor. Results
+        for intermediate ancestors are shared, and the traversal is iterative,
+        so deep lines don't hit the recursion limit. Parent links that loop
+        back onto the line being traversed are ignored.
+
+        """
+        depths = {}
+        visiting = set()
+        stack = list(positions)
+        while stack:
+            position = stack[-1]
+            if position in depths:
+                stack.pop()
+                continue
+
+            parents = [
+                parent
+                for parent in (self.fathers[position], self.mothers[position])
+                if parent != -1
+            ]
+            if position not in visiting:
+                visiting.add(position)
+                stack.extend(
+                    parent for parent in parents
+                    if parent not in depths and parent not in visiting
+                )
+                continue
+
+            stack.pop()
+            visiting.discard(position)
+            result = {}
+            for parent in parents:
+                result[parent] = 1
+                for ancestor, depth in depths.get(parent, {}).items():
+                    if depth + 1 < result.get(ancestor, depth + 2):
+                        result[ancestor] = depth + 1
+            depths[position] = result
+
+        return depths
+
+    def _unwind(self, previous, target):
+        path = []
+        position = previous[target]
+        while previous[position] != -1:
+            path.append(self.ids[position])
+            position = previous[position]
+        return path
+
+
+class FamilyGraph(ParentGraph):
+    """An in-memory index of parents, children and spouses.
+
+    The index is loaded with a fixed number of bulk queries, after which the
+    lookups needed to render the tree don't touch the database.
+
+    """
+
+    def __init__(self, ancestors, lineage_ids):
+        # Ancestors are stored in order of age, so every list of positions
+        # built in that order is sorted by age as well.
+        self.ancestors = list(ancestors)
+        super().__init__([
+            (ancestor.pk, ancestor.father_id, ancestor.mother_id)
+            for ancestor in self.ancestors
+        ])
+        self.lineage_ids = frozenset(lineage_ids)
+
+        self._children = {}
+        for position in range(len(self.ancestors)):
+            parents = (self.fathers[position], self.mothers[position])
+            if parents == (-1, -1):
+                continue
+            self._children.setdefault(parents, array('l')).append(position)
+
+    @classmethod
+    def load(cls, pks=None):
+        """Load the graph of everyone, or of the ancestors with the ids."""
+        ancestors = (
+            models.Ancestor.objects
+            .select_related('christian_name')
+            .prefetch_related('marriages_of_husband', 'marriages_of_wife')
+            .with_age()
+            .order_by('age', 'pk')
+        )
+        lineage_ids = (
+            models.Lineage.objects.values_list('ancestor_id', flat=True)
+        )
+        if pks is not None:
+            ancestors = ancestors.filter(pk__in=pks)
+            lineage_ids = lineage_ids.filter(ancestor_id__in=pks)
+        return cls(ancestors, lineage_ids)
+
+    def get(self, pk):
+        position = self.positions.get(pk)
+        return self.ancestors[position] if position is not None else None
+
+    def father(self, ancestor):
+        return self._get_parent(self.fathers, ancestor)
+
+    def mother(self, ancestor):
+        return self._get_parent(self.mothers, ancestor)
+
+    def children(self, father, mother):
+        positions = self._children.get((
+            self.positions.get(father.pk, -1) if father else -1,
+            self.positions.get(mother.pk, -1) if mother else -1
+        ), [])
+        return [self.ancestors[position] for position in positions]
+
+    def marriages(self, ancestor):
+        """Return (marriage, spouse) tuples for the ancestor.
+
+        The marriages are prefetched when the graph is loaded, so this also
+        keeps the `was_married` property from counting in the database.
+
+        """
+        ancestor = self.get(ancestor.pk)
+        if ancestor is None:
+            return []
+
+        if ancestor.gender == 'm':
+            return [
+                (marriage, self.get(marriage.wife_id))
+                for marriage in ancestor.marriages_of_husband.all()
+            ]
+        elif ancestor.gender == 'f':
+            return [
+                (marriage, self.get(marriage.husband_id))
+                for marriage in ancestor.marriages_of_wife.all()
+            ]
+
+        return []
+
+    def has_lineage(self, ancestor):
+        return ancestor.pk in self.lineage_ids
+
+    def _get_parent(self, parents, ancestor):
+        position = self.positions.get(ancestor.pk)
+        if position is None or parents[position] == -1:
+            return None
+
+        return self.ancestors[parents[position]]
+
+
+_family_graph = ProcessLocalValue('family-graph-version', FamilyGraph.load)
+
+
+def get_family_graph():
+    """Return the process-wide graph, reloading it when it was invalidated."""
+    return _family_graph.get()
+
+
+def get_family_graph_version():
+    return _family_graph.version
+
+
+def invalidate_family_graph():
+    _family_graph.invalidate()
@@ -7,74 +7,85 @@ from dataclasses import dataclass
 from datetime import date
 from typing import List, Optional
 
+from django.conf import settings
 from django.urls import reverse
 from django.utils.html import format_html
 
 from lib.cache.decorators import cache_result
-from services.lineage.service import LineageService
+from lib.cache.dependencies import register_namespace
+from services.lineage.roots import get_root_index, invalidate_root_index
+from tree import models
+from tree.graph import ParentGraph
 from tree.models import Ancestor
-from tree.lineage import Lineages
+from tree.lineage import LINEAGE_DEPENDENCIES, Lineages
 
 
 re_bio_line = re.compile(r'^\*\s?([^:]+)\s?:\s(.*)$')
 
+ROOT_DEPENDENCIES = [
+    models.Ancestor, models.Marriage, models.Lineage, models.Generation
+]
+
+TREE_DEPENDENCIES = [
+    models.Ancestor, models.Bio, models.Marriage, models.Lineage,
+    models.Generation
+]
+
+# The cached tree fragments vary on the generation of this namespace
+register_namespace('tree', TREE_DEPENDENCIES)
+
 
 class LineageBuilder(object):
+    """Finds the generations between the ancestor and the descendant.
+
+    The parents of all ancestors are loaded in a single query, after which
+    the line is found by walking upward from the descendant.
+
+    """
 
-    def __init__(self):
-        self._descendant = None
-        self._generations = []
+    def __init__(self, graph=None):
+        self._graph = graph
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = ParentGraph.load()
+        return self._graph
 
     def build(self, lineage):
-        self._generations = []
-        self._get_generations(lineage.ancestor, lineage.descendant, 1)
-        return self._generations
-
-    def _get_generations(self, ancestor, descendant, generation):
-        children = self._get_children(ancestor)
-        if not children:
-            return
-
-        if descendant not in children:
-            for child in children:
-                if self._is_ancestor(child, descendant):
-                    self._generations.append((child, generation))
-                    self._get_generations(child, descendant, generation + 1)
-                    break
-
-    def _is_ancestor(self, candidate, descendant):
-        self._descendant = None
-        self._get_descendant(candidate, descendant)
-        return self._descendant is not None
-
-    def _get_descendant(self, candidate, descendant):
-        children = self._get_children(candidate)
-        if not children:
-            return
-
-        if descendant not in children:
-            for child in children:
-                self._get_descendant(child, descendant)
-        else:
-            self._descendant = descendant
+        generation_ids = self.build_ids(lineage)
+        ancestors = Ancestor.objects.in_bulk(
+            [pk for pk, _ in generation_ids]
+        )
+        return [
+            (ancestors[pk], generation) for pk, generation in generation_ids
+        ]
 
-    @staticmethod
-    def _get_children(ancestor):
-        return list(ancestor.children.order_by_age())
+    def build_ids(self, lineage):
+        path = self.graph.path(lineage.ancestor_id, lineage.descendant_id)
+        return [(pk, generation) for generation, pk in enumerate(path, 1)]
 
 
 def build_lineage(lineage):
     return LineageBuilder().build(lineage)
 
 
-@cache_result('lineages', timeout=None)
+@cache_result(
+    'lineages', timeout=None, backend='local',
+    dependencies=LINEAGE_DEPENDENCIES
+)
 def get_lineages(ancestor):
     return Lineages(ancestor)
 
 
-def get_parents(descendant, visible_ancestors):
-    father, father_link = _get_parent(descendant.father, visible_ancestors)
-    mother, mother_link = _get_parent(descendant.mother, visible_ancestors)
+def get_parents(descendant, visible_ancestors, graph=None):
+    if graph is not None:
+        father, mother = graph.father(descendant), graph.mother(descendant)
+    else:
+        father, mother = descendant.father, descendant.mother
+
+    father, father_link = _get_parent(father, visible_ancestors, graph)
+    mother, mother_link = _get_parent(mother, visible_ancestors, graph)
     if not father and not mother or (not father_link and not mother_link):
         return None
 
@@ -93,7 +104,10 @@ class Marriage:
     place_of_marriage: Optional[str]
 
 
-def get_marriages(ancestor):
+def get_marriages(ancestor, graph=None):
+    if graph is not None:
+        return _get_marriages_from_graph(ancestor, graph)
+
     marriages = []
     if ancestor.gender == 'm':
         for marriage in ancestor.marriages_of_husband.all():
@@ -128,18 +142,48 @@ def get_marriages(ancestor):
     return marriages
 
 
-@cache_result('ancestor_url', timeout=None)
+@dataclass
+class PedigreeEntry:
+    number: int
+    ancestor: Ancestor
+
+    @property
+    def generation(self):
+        return self.number.bit_length() - 1
+
+
+@cache_result(
+    'pedigree', timeout=3600, soft_timeout=3000,
+    dependencies=lambda pedigree, *args, **kwargs: [
+        entry.ancestor for entry in pedigree
+    ]
+)
+def get_pedigree(ancestor, depth=None):
+    if depth is None:
+        depth = settings.PEDIGREE_DEPTH
+
+    return [
+        PedigreeEntry(number=obj.number, ancestor=obj)
+        for obj in Ancestor.objects.pedigree(ancestor, depth)
+    ]
+
+
+def invalidate_lineage_indexes():
+    invalidate_root_index()
+
+
+@cache_result('ancestor_url', timeout=None, dependencies=ROOT_DEPENDENCIES)
 def ancestor_url(ancestor, root_only=False):
-    lineage_service = LineageService()
+    root_index = get_root_index()
     if not root_only:
-        if root_ancestor := lineage_service.find_root(ancestor):
+        if root_slug := root_index.find_root_slug(ancestor):
             return reverse(
                 'ancestor_tree',
                 kwargs={
-                    'ancestor': root_ancestor.slug
+                    'ancestor': root_slug
                 }
             )
-    elif lineage_service.has_lineage(ancestor):
+    elif root_index.has_lineage(ancestor):
         return reverse(
             'ancestor_tree',
             kwargs={
@@ -148,6 +192,20 @@ def ancestor_url(ancestor, root_only=False):
         )
 
 
+def get_ancestor_urls(ancestors):
+    """Map the ids of the ancestors to their tree URLs.
+
+    All URLs are read from the cache at once, and only the missing ones are
+    computed.
+
+    """
+    ancestors = list(ancestors)
+    return {
+        ancestor.pk: url
+        for ancestor, url in zip(ancestors, ancestor_url.many(ancestors))
+    }
+
+
 def get_bio_details(bio):
     lines = []
     for line in map(lambda ln: ln.strip(), bio.details.split('\n')):
@@ -163,15 +221,38 @@ def get_bio_details(bio):
     return lines
 
 
-def _get_parent(parent, visible_ancestors):
+def _get_marriages_from_graph(ancestor, graph):
+    ancestor = graph.get(ancestor.pk) or ancestor
+    marriages = []
+    for marriage, spouse in graph.marriages(ancestor):
+        if ancestor.gender == 'm':
+            children = graph.children(ancestor, spouse)
+        else:
+            children = graph.children(spouse, ancestor)
+        marriages.append(Marriage(
+            ancestor,
+            spouse,
+            children,
+            marriage.date_of_marriage,
+            marriage.place_of_marriage
+        ))
+    return marriages
+
+
+def _get_parent(parent, visible_ancestors, graph=None):
     if not parent:
         return None, False
 
+    if graph is not None:
+        has_lineage = graph.has_lineage(parent)
+    else:
+        has_lineage = parent.get_lineage() is not None
+
     template_kwargs = {
         'name': parent.get_fullname(),
         'age': parent.get_age()
     }
-    if all([parent not in visible_ancestors, parent.get_lineage()]):
+    if parent not in visible_ancestors and has_lineage:
         template = '<a href="{url}">{name} ({age})</a>'
         template_kwargs['url'] = reverse('ancestor_tree', kwargs={
             'ancestor': parent.slug
@@ -0,0 +1,216 @@
+"""
+Contains integrity checks of the parent links in the family graph.
+
+"""
+from array import array
+from collections import deque, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from tree import models
+
+
+CYCLE = 'cycle'
+
+GENDER = 'gender'
+
+BIRTHYEAR = 'birthyear'
+
+
+Problem = namedtuple('Problem', ['kind', 'ancestor_id', 'message'])
+
+
+class IntegrityChecker(object):
+    """Checks every parent link of the family graph in linear time.
+
+    The graph is bulk-loaded into arrays, cycles are found with Kahn's
+    algorithm and the other checks look at one link at a time, so nothing
+    recurses.
+
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.ids = array('l', [row[0] for row in rows])
+        positions = {pk: position for position, pk in enumerate(self.ids)}
+        self.fathers = array('l', [
+            positions.get(row[1], -1) for row in rows
+        ])
+        self.mothers = array('l', [
+            positions.get(row[2], -1) for row in rows
+        ])
+        self.genders = [row[3] for row in rows]
+        self.birthyears = [row[4] for row in rows]
+
+    @classmethod
+    def load(cls):
+        return cls(
+            models.Ancestor.objects
+            .order_by('pk')
+            .values_list(
+                'pk', 'father_id', 'mother_id', 'gender', 'birthyear'
+            )
+        )
+
+    def check(self):
+        return self.check_cycles() + self.check_links()
+
+    def check_cycles(self):
+        """Report everyone who is their own ancestor.
+
+        Kahn's algorithm first removes everyone without children, upward,
+        and then everyone without parents, downward. Only the people on a
+        cycle (or between two cycles) remain.
+
+        """
+        size = len(self.ids)
+        children = [0] * size
+        for parents in (self.fathers, self.mothers):
+            for parent in parents:
+                if parent != -1:
+                    children[parent] += 1
+
+        remaining = set(range(size))
+        queue = deque(
+            position for position in range(size) if not children[position]
+        )
+        while queue:
+            position = queue.popleft()
+            remaining.discard(position)
+            for parent in self._parents(position):
+                children[parent] -= 1
+                if not children[parent]:
+                    queue.append(parent)
+
+        # Remove the ancestors of the cycles, which have no parents left
+        parents = {
+            position: [
+                parent for parent in self._parents(position)
+                if parent in remaining
+            ]
+            for position in remaining
+        }
+        down = {position: [] for position in remaining}
+        for position, position_parents in parents.items():
+            for parent in position_parents:
+                down[parent].append(position)
+        counts = {
+            position: len(position_parents)
+            for position, position_parents in parents.items()
+        }
+        queue = deque(
+            position for position, count in counts.items() if not count
+        )
+        while queue:
+            position = queue.popleft()
+            remaining.discard(position)
+            for child in down[position]:
+                counts[child] -= 1
+                if not counts[child]:
+                    queue.append(child)
+
+        return [
+            Problem(
+                CYCLE, self.ids[position],
+                '{} is their own ancestor'.format(self.ids[position])
+            )
+            for position in sorted(remaining)
+        ]
+
+    def check_links(self):
+        problems = []
+        for position, pk in enumerate(self.ids):
+            for parents, gender, role in (
+                    (self.fathers, 'm', 'father'),
+                    (self.mothers, 'f', 'mother')):
+                parent = parents[position]
+                if parent == -1:
+                    continue
+
+                if self.genders[parent] != gender:
+                    problems.append(Problem(
+                        GENDER, pk, 'The {} of {} ({}) is not {}'.format(
+                            role, pk, self.ids[parent],
+                            'male' if gender == 'm' else 'female'
+                        )
+                    ))
+
+                birthyear = self.birthyears[position]
+                parent_birthyear = self.birthyears[parent]
+                if None not in (birthyear, parent_birthyear) and \
+                        parent_birthyear >= birthyear:
+                    problems.append(Problem(
+                        BIRTHYEAR, pk,
+                        'The {} of {} ({}) was born after them'.format(
+                            role, pk, self.ids[parent]
+                        )
+                    ))
+
+        return problems
+
+    def _parents(self, position):
+        return [
+            parent
+            for parent in (self.fathers[position], self.mothers[position])
+            if parent != -1
+        ]
+
+
+def _is_own_ancestor(parent, ancestor):
+    if parent.pk == ancestor.pk:
+        return True
+    return models.AncestorClosure.objects.is_descendant(parent, ancestor)
+
+
+def validate_parents(ancestor):
+    """Validate the parents and children of an ancestor before it is saved.
+
+    Only the links of the ancestor itself are checked: a new parent can only
+    close a cycle if it is the ancestor or one of its descendants, which the
+    closure table tells with a single lookup.
+
+    """
+    errors = {}
+    for field, gender, label in (
+            ('father', 'm', 'De vader moet een man zijn'),
+            ('mother', 'f', 'De moeder moet een vrouw zijn')):
+        parent = getattr(ancestor, field)
+        if parent is None:
+            continue
+
+        if parent.gender != gender:
+            errors.setdefault(field, []).append(label)
+        if ancestor.pk is not None and _is_own_ancestor(parent, ancestor):
+            errors.setdefault(field, []).append(
+                'Een voorouder kan niet van zichzelf afstammen'
+            )
+        if None not in (parent.birthyear, ancestor.birthyear) and \
+                parent.birthyear >= ancestor.birthyear:
+            errors.setdefault(field, []).append(
+                'Een ouder moet eerder geboren zijn dan het kind'
+            )
+
+    if ancestor.pk is not None:
+        children = (
+            models.Ancestor.objects
+            .filter(Q(father=ancestor) | Q(mother=ancestor))
+            .values_list('father_id', 'birthyear')
+        )
+        for father_id, birthyear in children:
+            role = 'm' if father_id == ancestor.pk else 'f'
+            if ancestor.gender != role:
+                errors.setdefault('gender', []).append(
+                    'Het geslacht past niet bij de rol als ouder'
+                )
+            if None not in (birthyear, ancestor.birthyear) and \
+                    ancestor.birthyear >= birthyear:
+                errors.setdefault('birthyear', []).append(
+                    'Een ouder moet eerder geboren zijn dan het kind'
+                )
+
+    if errors:
+        raise ValidationError({
+            field: list(dict.fromkeys(messages))
+            for field, messages in errors.items()
+        })
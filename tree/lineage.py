@@ -2,19 +2,70 @@
 Contains a wrapper to hold lineage data.
 
 """
+from array import array
+
 from lib.cache.decorators import cache_method_result
 from tree import models
 
 
+# The lineages of a tree are found through the lineages and their
+# generations, the siblings of the generations and the marriages of both
+LINEAGE_DEPENDENCIES = [
+    models.Ancestor, models.Marriage, models.Lineage, models.Generation
+]
+
+
 class Lineage(object):
+    """The ids of a lineage's generations.
 
-    def __init__(self, ancestor, descendant, generations):
-        self.ancestor = ancestor
-        self.descendant = descendant
-        self.generations = generations
+    Membership is tested against a set of ids, so the ancestor or its id can
+    be given. The ancestors themselves are only loaded when displayed, all
+    of them with a single query.
+
+    """
+
+    __slots__ = (
+        'ancestor_id', 'descendant_id', 'generation_ids', '_members',
+        '_ancestors'
+    )
+
+    def __init__(self, ancestor_id, descendant_id, generation_ids):
+        self.ancestor_id = ancestor_id
+        self.descendant_id = descendant_id
+        self.generation_ids = array('l', generation_ids)
+        self._members = frozenset(self.generation_ids)
+        self._ancestors = None
 
     def __contains__(self, item):
-        return item in self.generations
+        return getattr(item, 'pk', item) in self._members
+
+    def __getstate__(self):
+        # Loaded ancestors are not part of the cached payload
+        return self.ancestor_id, self.descendant_id, self.generation_ids
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @property
+    def ancestor(self):
+        return self.ancestors[self.ancestor_id]
+
+    @property
+    def descendant(self):
+        return self.ancestors[self.descendant_id]
+
+    @property
+    def generations(self):
+        return [self.ancestors[pk] for pk in self.generation_ids]
+
+    @property
+    def ancestors(self):
+        """Map the ids of everyone in the lineage to the ancestors."""
+        if self._ancestors is None:
+            ids = [self.ancestor_id, self.descendant_id]
+            ids.extend(self.generation_ids)
+            self._ancestors = models.Ancestor.objects.in_bulk(ids)
+        return self._ancestors
 
 
 class Lineages(object):
@@ -44,28 +95,28 @@ class Lineages(object):
         return self._objects
 
     @cache_method_result('lineage-objects', key_attrs=['ancestor'],
-                         timeout=None)
+                         timeout=None, backend='local', lock_timeout=30,
+                         dependencies=LINEAGE_DEPENDENCIES)
     def _get_objects(self):
-        objects = list(
+        rows = (
             models.Lineage.objects
-            .select_related(
-                'ancestor',
-                'descendant'
-            )
-            .prefetch_related(
-                'generations'
-            )
             .for_ancestor(self.ancestor)
+            .order_by('pk', 'generations__generation')
+            .values_list(
+                'ancestor_id', 'descendant_id', 'generations__ancestor_id'
+            )
         )
 
-        return {
-            lineage.ancestor.pk: Lineage(
-                lineage.ancestor,
-                lineage.descendant,
-                [
-                    generation.ancestor
-                    for generation in lineage.generations.all()
-                ]
+        lineages = {}
+        for ancestor_id, descendant_id, generation_id in rows:
+            _, generation_ids = lineages.setdefault(
+                ancestor_id, (descendant_id, [])
             )
-            for lineage in objects
+            if generation_id is not None:
+                generation_ids.append(generation_id)
+
+        return {
+            ancestor_id: Lineage(ancestor_id, descendant_id, generation_ids)
+            for ancestor_id, (descendant_id, generation_ids)
+            in lineages.items()
         }
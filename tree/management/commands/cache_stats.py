@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from lib.cache.stats import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Report the cache hits and misses of every key namespace'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Start counting over after the report'
+        )
+
+    def handle(self, *args, **options):
+        entries = get_cache_stats()
+        if not entries:
+            self.stdout.write('Nothing was counted yet')
+
+        for entry in entries:
+            self.stdout.write(entry.namespace)
+            self.stdout.write('  {} hits, {} misses{}'.format(
+                entry.hits, entry.misses,
+                ', {:.0%} hit ratio'.format(entry.hit_ratio)
+                if entry.hit_ratio is not None else ''
+            ))
+            if entry.misses:
+                self.stdout.write(
+                    '  {:.1f} ms and {:.0f} bytes per recompute'.format(
+                        entry.average_recompute_ms, entry.average_bytes
+                    )
+                )
+
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write('Reset the counts')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tree.integrity import IntegrityChecker
+
+
+class Command(BaseCommand):
+    help = 'Check the parent links of all ancestors'
+
+    def handle(self, *args, **options):
+        problems = IntegrityChecker.load().check()
+        for problem in problems:
+            self.stdout.write('{}: {}'.format(
+                problem.kind.capitalize(), problem.message
+            ))
+
+        if problems:
+            raise CommandError('Found {} problems'.format(len(problems)))
+
+        self.stdout.write('No problems found')
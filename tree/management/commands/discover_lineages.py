@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from lib.cache.dependencies import invalidate_dependents_on_commit
+from services.lineage.discovery import LineageDiscovery
+from tree.graph import invalidate_family_graph
+from tree.helpers import invalidate_lineage_indexes
+from tree.models import Ancestor, Generation, Lineage
+
+
+class Command(BaseCommand):
+    help = 'Create a lineage for every founder of the family'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Also move existing lineages to the deepest descendant'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only show the lineages that would be created or updated'
+        )
+
+    def handle(self, *args, **options):
+        discovery = LineageDiscovery.load()
+        existing = {
+            ancestor_id: (pk, descendant_id)
+            for pk, ancestor_id, descendant_id in Lineage.objects.values_list(
+                'pk', 'ancestor_id', 'descendant_id'
+            )
+        }
+
+        created, updated = [], []
+        for discovered in discovery.discover():
+            if discovered.ancestor_id not in existing:
+                created.append(Lineage(
+                    ancestor_id=discovered.ancestor_id,
+                    descendant_id=discovered.descendant_id
+                ))
+                continue
+
+            pk, descendant_id = existing[discovered.ancestor_id]
+            if options['update'] and descendant_id != discovered.descendant_id:
+                updated.append(Lineage(
+                    pk=pk,
+                    ancestor_id=discovered.ancestor_id,
+                    descendant_id=discovered.descendant_id
+                ))
+
+        if options['dry_run']:
+            self._show(created, 'Create')
+            self._show(updated, 'Update')
+            return
+
+        with transaction.atomic():
+            Lineage.objects.bulk_create(created, batch_size=1000)
+            Lineage.objects.bulk_update(
+                updated, ['descendant'], batch_size=1000
+            )
+            Generation.objects.replace_generations({
+                lineage.pk: discovery.graph.path(
+                    lineage.ancestor_id, lineage.descendant_id
+                )
+                for lineage in created + updated
+            })
+
+        if created or updated:
+            invalidate_family_graph()
+            invalidate_lineage_indexes()
+            invalidate_dependents_on_commit(Lineage)
+        self.stdout.write('Created {} and updated {} lineages'.format(
+            len(created), len(updated)
+        ))
+
+    def _show(self, lineages, action):
+        ancestors = Ancestor.objects.in_bulk({
+            pk
+            for lineage in lineages
+            for pk in (lineage.ancestor_id, lineage.descendant_id)
+        })
+        for lineage in lineages:
+            self.stdout.write('{}: {} > {}'.format(
+                action,
+                ancestors[lineage.ancestor_id],
+                ancestors[lineage.descendant_id]
+            ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from services.duplicates.service import find_duplicates
+from tree.models import DuplicateCandidate
+
+
+class Command(BaseCommand):
+    help = 'Propose ancestors that may be the same person for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-score', type=int, default=None,
+            help='Minimum score of a candidate (default: '
+                 'settings.DUPLICATE_MIN_SCORE)'
+        )
+
+    @transaction.atomic()
+    def handle(self, *args, **options):
+        duplicates = find_duplicates(options['min_score'])
+
+        # Reviewed candidates are kept, and are not proposed again
+        DuplicateCandidate.objects.filter(
+            status=DuplicateCandidate.STATUS_OPEN
+        ).delete()
+        DuplicateCandidate.objects.bulk_create(
+            [
+                DuplicateCandidate(
+                    ancestor_id=duplicate.ancestor_id,
+                    duplicate_id=duplicate.duplicate_id,
+                    score=duplicate.score
+                )
+                for duplicate in duplicates
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+        self.stdout.write('Found {} possible duplicates'.format(
+            DuplicateCandidate.objects.filter(
+                status=DuplicateCandidate.STATUS_OPEN
+            ).count()
+        ))
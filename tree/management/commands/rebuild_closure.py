@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lib.cache.dependencies import invalidate_dependents_on_commit
+from tree.graph import invalidate_family_graph
+from tree.models import Ancestor, AncestorClosure
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the ancestor closure table and descendant counts from the '
+        'parent links'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the table with the parent links'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            AncestorClosure.objects.rebuild()
+            Ancestor.objects.update_descendant_counts()
+            # The counts are updated without signals, so the rendered trees
+            # are reset by hand
+            invalidate_family_graph()
+            invalidate_dependents_on_commit(Ancestor)
+            self.stdout.write('Rebuilt {} rows'.format(
+                AncestorClosure.objects.count()
+            ))
+            return
+
+        missing, extra, wrong = AncestorClosure.objects.compare()
+        for label, rows in [
+                ('Missing', missing), ('Extra', extra),
+                ('Wrong depth', wrong)]:
+            for ancestor_id, descendant_id, depth in rows:
+                self.stdout.write('{}: {} > {} ({})'.format(
+                    label, ancestor_id, descendant_id, depth
+                ))
+
+        if missing or extra or wrong:
+            raise CommandError(
+                'Closure table differs from the parent links: {} missing, '
+                '{} extra, {} with the wrong depth'.format(
+                    len(missing), len(extra), len(wrong)
+                )
+            )
+        self.stdout.write('Closure table is up to date')
@@ -0,0 +1,73 @@
+import os
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from tree.graph import ParentGraph
+from tree.helpers import invalidate_lineage_indexes
+from tree.models import Generation, Lineage
+
+
+graph = None
+
+
+def init_worker(parent_graph):
+    global graph
+    graph = parent_graph
+
+
+def find_generations(lineages):
+    return [
+        (lineage_id, graph.path(ancestor_id, descendant_id))
+        for lineage_id, ancestor_id, descendant_id in lineages
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the generations of all lineages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Number of worker processes (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Number of lineages per worker task and transaction'
+        )
+
+    def handle(self, *args, **options):
+        parent_graph = ParentGraph.load()
+        lineages = list(
+            Lineage.objects
+            .order_by('pk')
+            .values_list('pk', 'ancestor_id', 'descendant_id')
+        )
+        chunk_size = options['chunk_size']
+        chunks = [
+            lineages[i:i + chunk_size]
+            for i in range(0, len(lineages), chunk_size)
+        ]
+
+        if options['processes'] > 1:
+            # The workers don't use the database, but shouldn't share the
+            # connection either.
+            connections.close_all()
+            with Pool(options['processes'], init_worker, (parent_graph, )) \
+                    as pool:
+                for result in pool.imap_unordered(find_generations, chunks):
+                    self._write_generations(result)
+        else:
+            init_worker(parent_graph)
+            for chunk in chunks:
+                self._write_generations(find_generations(chunk))
+
+        invalidate_lineage_indexes()
+        self.stdout.write('Rebuilt the generations of {} lineages'.format(
+            len(lineages)
+        ))
+
+    @transaction.atomic()
+    def _write_generations(self, result):
+        Generation.objects.replace_generations(dict(result))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from lib.cache.dependencies import invalidate_dependents_on_commit
+from tree.graph import invalidate_family_graph
+from tree.models import Ancestor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the generation of every ancestor relative to the root'
+
+    def handle(self, *args, **options):
+        Ancestor.objects.update_root_generations()
+        # The generations are updated without signals, so the rendered trees
+        # are reset by hand
+        invalidate_family_graph()
+        invalidate_dependents_on_commit(Ancestor)
+        self.stdout.write('Rebuilt the generations of {} ancestors'.format(
+            Ancestor.objects.filter(root_generation__isnull=False).count()
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from tree.components import ComponentReport
+from tree.models import Ancestor
+
+
+class Command(BaseCommand):
+    help = 'Report the people that are not connected to the root ancestor'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--list', action='store_true',
+            help='List the people in every disconnected component'
+        )
+
+    def handle(self, *args, **options):
+        report = ComponentReport.load()
+        disconnected = report.disconnected
+        self.stdout.write('Root component: {} people'.format(
+            len(report.root_component)
+        ))
+        self.stdout.write('Disconnected: {} people in {} components'.format(
+            sum(map(len, disconnected)), len(disconnected)
+        ))
+
+        ancestors = {}
+        if options['list']:
+            ancestors = Ancestor.objects.in_bulk(report.disconnected_ids)
+
+        for component in disconnected:
+            self.stdout.write('Component of {} people'.format(len(component)))
+            if options['list']:
+                for pk in component:
+                    self.stdout.write('  {} ({})'.format(ancestors[pk], pk))
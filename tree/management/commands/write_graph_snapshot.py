@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tree.graph import get_family_graph_version
+from tree.snapshot import SharedSnapshot, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the binary snapshot of the family graph that workers share'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.GRAPH_SNAPSHOT_PATH,
+            help='Write the snapshot here instead of GRAPH_SNAPSHOT_PATH'
+        )
+        parser.add_argument(
+            '--if-stale', action='store_true',
+            help='Only write the snapshot when the family graph changed'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError('GRAPH_SNAPSHOT_PATH is not set')
+
+        if options['if_stale'] and SharedSnapshot(path).get() is not None:
+            self.stdout.write('The snapshot is up to date')
+            return
+
+        write_snapshot(path, version=get_family_graph_version())
+        self.stdout.write('Wrote the snapshot to {}'.format(path))
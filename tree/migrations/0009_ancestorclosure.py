@@ -0,0 +1,35 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0008_auto_20210205_2232'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AncestorClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='Aantal generaties')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='tree.ancestor', verbose_name='Voorouder')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='tree.ancestor', verbose_name='Nakomeling')),
+            ],
+            options={
+                'verbose_name': 'Afstammingsrelatie',
+                'verbose_name_plural': 'Afstammingsrelaties',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ancestorclosure',
+            index=models.Index(fields=['descendant', 'depth'], name='tree_ancest_descend_71e2db_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ancestorclosure',
+            unique_together={('ancestor', 'descendant')},
+        ),
+    ]
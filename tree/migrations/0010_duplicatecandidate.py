@@ -0,0 +1,30 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0009_ancestorclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(verbose_name='Score')),
+                ('status', models.CharField(choices=[('open', 'Te beoordelen'), ('duplicate', 'Dezelfde persoon'), ('distinct', 'Verschillende personen')], default='open', max_length=10, verbose_name='Status')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='tree.ancestor', verbose_name='Voorouder')),
+                ('duplicate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tree.ancestor', verbose_name='Mogelijk dezelfde persoon')),
+            ],
+            options={
+                'verbose_name': 'Mogelijk dubbele voorouder',
+                'verbose_name_plural': 'Mogelijk dubbele voorouders',
+                'ordering': ['-score'],
+                'unique_together': {('ancestor', 'duplicate')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0010_duplicatecandidate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ancestor',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Aantal nakomelingen'),
+        ),
+        migrations.AddField(
+            model_name='ancestor',
+            name='descendant_depth',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Aantal generaties nakomelingen'),
+        ),
+    ]
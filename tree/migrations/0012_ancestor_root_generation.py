@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0011_ancestor_descendant_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ancestor',
+            name='root_generation',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Generatie'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Every line upward is followed as distinct (id, depth) pairs, bounded by the
+# number of ancestors so that a loop in the parent links ends, and the
+# shortest depth is kept for every pair.
+FILL_CLOSURE_SQL = """
+    WITH RECURSIVE walk (descendant_id, ancestor_id, depth) AS (
+        SELECT a.id, p.id, 1
+        FROM "{ancestor}" a
+        JOIN "{ancestor}" p ON p.id IN (a.father_id, a.mother_id)
+        UNION
+        SELECT w.descendant_id, p.id, w.depth + 1
+        FROM walk w
+        JOIN "{ancestor}" a ON a.id = w.ancestor_id
+        JOIN "{ancestor}" p ON p.id IN (a.father_id, a.mother_id)
+        WHERE w.depth < (SELECT COUNT(*) FROM "{ancestor}")
+    )
+    INSERT INTO "{closure}" (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, descendant_id, MIN(depth)
+    FROM walk
+    WHERE ancestor_id <> descendant_id
+    GROUP BY ancestor_id, descendant_id
+"""
+
+
+def fill_closure(apps, schema_editor):
+    Ancestor = apps.get_model('tree', 'Ancestor')
+    AncestorClosure = apps.get_model('tree', 'AncestorClosure')
+    AncestorClosure.objects.all().delete()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FILL_CLOSURE_SQL.format(
+            ancestor=Ancestor._meta.db_table,
+            closure=AncestorClosure._meta.db_table
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0012_ancestor_root_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_closure, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_descendant_counts(apps, schema_editor):
+    Ancestor = apps.get_model('tree', 'Ancestor')
+    AncestorClosure = apps.get_model('tree', 'AncestorClosure')
+    links = (
+        AncestorClosure.objects
+        .filter(ancestor=OuterRef('pk'))
+        .order_by()
+        .values('ancestor')
+    )
+    Ancestor.objects.update(
+        descendant_count=Coalesce(
+            Subquery(links.annotate(count=Count('pk')).values('count')), 0
+        ),
+        descendant_depth=Coalesce(
+            Subquery(links.annotate(depth=Max('depth')).values('depth')), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0013_fill_ancestorclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_descendant_counts, migrations.RunPython.noop)
+    ]
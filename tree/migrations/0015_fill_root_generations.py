@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q, Subquery, Value as V, \
+    When
+from django.db.models.functions import Coalesce
+
+
+def fill_root_generations(apps, schema_editor):
+    Ancestor = apps.get_model('tree', 'Ancestor')
+    AncestorClosure = apps.get_model('tree', 'AncestorClosure')
+    Marriage = apps.get_model('tree', 'Marriage')
+    root_id = (
+        Ancestor.objects
+        .filter(is_root=True)
+        .values_list('pk', flat=True)
+        .first()
+    )
+    if root_id is None:
+        return
+
+    root_links = AncestorClosure.objects.filter(ancestor_id=root_id)
+    depth = root_links.filter(descendant=OuterRef('pk')).values('depth')
+    spouse_depth = (
+        root_links
+        .filter(
+            Q(
+                descendant__marriages_of_husband__wife=OuterRef('pk')
+            ) | Q(
+                descendant__marriages_of_wife__husband=OuterRef('pk')
+            )
+        )
+        .order_by('depth')
+        .values('depth')[:1]
+    )
+    root_spouse = Exists(Marriage.objects.filter(
+        Q(
+            husband_id=root_id, wife=OuterRef('pk')
+        ) | Q(
+            wife_id=root_id, husband=OuterRef('pk')
+        )
+    ))
+    Ancestor.objects.update(root_generation=models.Case(
+        When(pk=root_id, then=V(0)),
+        When(root_spouse, then=V(0)),
+        default=Coalesce(Subquery(depth), Subquery(spouse_depth)),
+        output_field=models.PositiveIntegerField()
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0014_fill_descendant_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_root_generations, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.1 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tree', '0015_fill_root_generations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ancestor',
+            name='root_generation',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Generatie'),
+        ),
+    ]
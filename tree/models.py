@@ -3,13 +3,15 @@ Models for the tree app.
 
 """
 from django.contrib.postgres.search import SearchVectorField
-from django.db import models, transaction
-from django.db.models import CharField, Exists, OuterRef, Prefetch, Q, \
-    Value as V, When
-from django.db.models.functions import Cast, Concat
+from django.db import connections, models, transaction
+from django.db.models import CharField, Count, Exists, F, Max, OuterRef, \
+    Prefetch, Q, Subquery, Value as V, When, prefetch_related_objects
+from django.db.models.expressions import Expression, RawSQL
+from django.db.models.functions import Cast, Coalesce, Concat
 from django.db.models.signals import post_save
 from django.utils.text import slugify
 
+from lib.cache.dependencies import invalidate_dependents_on_commit
 from lib.search.search_vectors import register_search_vector
 
 
@@ -21,6 +23,97 @@ class SearchVectorModel(models.Model):
         abstract = True
 
 
+# Relatives are recursed over as distinct (id, depth) pairs, so someone who
+# is reached along several lines is only followed once for every depth. The
+# depth is bounded by the number of ancestors when no maximum is given, which
+# ends the recursion even when parent links loop back.
+RELATIVES_DESCENDANTS_SQL = """
+    WITH RECURSIVE relatives(id, depth) AS (
+        SELECT c.id, 1
+        FROM "{table}" c
+        WHERE %s IN (c.father_id, c.mother_id)
+        UNION
+        SELECT c.id, r.depth + 1
+        FROM relatives r
+        JOIN "{table}" c ON r.id IN (c.father_id, c.mother_id)
+        WHERE r.depth < {max_depth}
+    )
+    SELECT id, MIN(depth) AS depth
+    FROM relatives
+    GROUP BY id
+"""
+
+
+RELATIVES_ANCESTORS_SQL = """
+    WITH RECURSIVE relatives(id, depth) AS (
+        SELECT p.id, 1
+        FROM "{table}" c
+        JOIN "{table}" p ON p.id IN (c.father_id, c.mother_id)
+        WHERE c.id = %s
+        UNION
+        SELECT p.id, r.depth + 1
+        FROM relatives r
+        JOIN "{table}" c ON c.id = r.id
+        JOIN "{table}" p ON p.id IN (c.father_id, c.mother_id)
+        WHERE r.depth < {max_depth}
+    )
+    SELECT id, MIN(depth) AS depth
+    FROM relatives
+    GROUP BY id
+"""
+
+
+class _RelativeDepth(Expression):
+    """The depth of an ancestor among the relatives found by a recursive query.
+
+    The ancestor is given as an expression, so the reference to it is
+    relabeled with the rest of the query when the query is used as a
+    subquery.
+
+    """
+
+    def __init__(self, sql, params, expression):
+        super().__init__(output_field=models.IntegerField())
+        self.sql = sql
+        self.params = params
+        self.expression = expression
+
+    def get_source_expressions(self):
+        return [self.expression]
+
+    def set_source_expressions(self, exprs):
+        self.expression, = exprs
+
+    def as_sql(self, compiler, connection):
+        sql, params = compiler.compile(self.expression)
+        return '(SELECT r.depth FROM ({}) r WHERE r.id = {})'.format(
+            self.sql, sql
+        ), list(self.params) + params
+
+
+PEDIGREE_SQL = """
+    WITH RECURSIVE pedigree(id, number, depth) AS (
+        SELECT a.id, 1::bigint, 0
+        FROM "{table}" a
+        WHERE a.id = %s
+        UNION ALL
+        SELECT
+            p.id,
+            CASE WHEN p.id = c.father_id
+                THEN 2 * r.number ELSE 2 * r.number + 1 END,
+            r.depth + 1
+        FROM pedigree r
+        JOIN "{table}" c ON c.id = r.id
+        JOIN "{table}" p ON p.id IN (c.father_id, c.mother_id)
+        WHERE r.depth < %s
+    )
+    SELECT a.*, r.number
+    FROM pedigree r
+    JOIN "{table}" a ON a.id = r.id
+    ORDER BY r.number
+"""
+
+
 class AncestorQuerySet(models.QuerySet):
     """Custom QuerySet for the Ancestor model."""
 
@@ -137,6 +230,123 @@ class AncestorQuerySet(models.QuerySet):
         queryset = self._clone()
         return queryset.with_age().order_by('age')
 
+    def descendants_of(self, ancestor, max_depth=None):
+        """Filter on the descendants of the ancestor, annotated with depth.
+
+        The descendants are found with a single recursive query, so a line
+        of any length costs one round trip.
+
+        """
+        return self._with_relatives(
+            ancestor, max_depth, RELATIVES_DESCENDANTS_SQL
+        )
+
+    def ancestors_of(self, descendant, max_depth=None):
+        """Filter on the ancestors of the descendant, annotated with depth."""
+        return self._with_relatives(
+            descendant, max_depth, RELATIVES_ANCESTORS_SQL
+        )
+
+    def pedigree(self, ancestor, depth):
+        """Return the ancestor and its forebears up to the given depth.
+
+        Everyone gets an ahnentafel `number`: 1 for the ancestor, 2n for the
+        father and 2n + 1 for the mother of number n. Someone who appears in
+        several lines is returned once for every number. The forebears are
+        found with a single recursive query.
+
+        """
+        ancestors = list(self.model.objects.raw(
+            PEDIGREE_SQL.format(table=self.model._meta.db_table),
+            [ancestor.pk, depth]
+        ))
+        prefetch_related_objects(ancestors, 'christian_name')
+        return ancestors
+
+    def update_root_generations(self):
+        """Recompute the generation of the ancestors relative to the root.
+
+        Descendants of the root take their depth from the closure table,
+        spouses who married into the family take the generation of their
+        partner and everyone else gets none. This is a single update.
+
+        """
+        root_id = (
+            Ancestor.objects
+            .filter(is_root=True)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if root_id is None:
+            return self.update(root_generation=None)
+
+        root_links = AncestorClosure.objects.filter(ancestor_id=root_id)
+        depth = root_links.filter(descendant=OuterRef('pk')).values('depth')
+        spouse_depth = (
+            root_links
+            .filter(
+                Q(
+                    descendant__marriages_of_husband__wife=OuterRef('pk')
+                ) | Q(
+                    descendant__marriages_of_wife__husband=OuterRef('pk')
+                )
+            )
+            .order_by('depth')
+            .values('depth')[:1]
+        )
+        root_spouse = Exists(Marriage.objects.filter(
+            Q(
+                husband_id=root_id, wife=OuterRef('pk')
+            ) | Q(
+                wife_id=root_id, husband=OuterRef('pk')
+            )
+        ))
+        return self.update(root_generation=models.Case(
+            When(pk=root_id, then=V(0)),
+            When(root_spouse, then=V(0)),
+            default=Coalesce(Subquery(depth), Subquery(spouse_depth)),
+            output_field=models.PositiveIntegerField()
+        ))
+
+    def update_descendant_counts(self):
+        """Recompute the descendant count and depth from the closure table.
+
+        This is a single update, whether it is done for a few ancestors or
+        for all of them.
+
+        """
+        links = (
+            AncestorClosure.objects
+            .filter(ancestor=OuterRef('pk'))
+            .order_by()
+            .values('ancestor')
+        )
+        return self.update(
+            descendant_count=Coalesce(
+                Subquery(links.annotate(count=Count('pk')).values('count')),
+                0
+            ),
+            descendant_depth=Coalesce(
+                Subquery(links.annotate(depth=Max('depth')).values('depth')),
+                0
+            )
+        )
+
+    def _with_relatives(self, ancestor, max_depth, relatives_sql):
+        if max_depth is not None and max_depth < 1:
+            return self.none()
+
+        table = self.model._meta.db_table
+        if max_depth is None:
+            bound, params = '(SELECT COUNT(*) FROM "{}")'.format(table), []
+        else:
+            bound, params = '%s', [max_depth]
+        sql = relatives_sql.format(table=table, max_depth=bound)
+        params = tuple([ancestor.pk] + params)
+        return self.filter(
+            pk__in=RawSQL('SELECT id FROM ({}) r'.format(sql), params)
+        ).annotate(depth=_RelativeDepth(sql, params, F('pk')))
+
 
 class ChristianName(SearchVectorModel):
     """Model for first (christian) names."""
@@ -261,6 +471,18 @@ class Ancestor(SearchVectorModel):
 
     date_of_death = models.DateField('Overlijdensdatum', null=True, blank=True)
 
+    descendant_count = models.PositiveIntegerField(
+        'Aantal nakomelingen', default=0, editable=False
+    )
+
+    descendant_depth = models.PositiveIntegerField(
+        'Aantal generaties nakomelingen', default=0, editable=False
+    )
+
+    root_generation = models.PositiveIntegerField(
+        'Generatie', null=True, blank=True, editable=False
+    )
+
     father = models.ForeignKey(
         'self', related_name='children_of_father', on_delete=models.CASCADE,
         verbose_name='Vader', null=True, blank=True,
@@ -294,6 +516,12 @@ class Ancestor(SearchVectorModel):
 
     objects = AncestorQuerySet.as_manager()
 
+    # These are kept up to date with queryset updates, so they are read again
+    # before an instance that was loaded earlier overwrites them.
+    maintained_fields = [
+        'descendant_count', 'descendant_depth', 'root_generation'
+    ]
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -308,7 +536,24 @@ class Ancestor(SearchVectorModel):
     def __str__(self):
         return ' '.join(filter(None, [self.get_fullname(), self.get_age()]))
 
+    def save(self, *args, **kwargs):
+        if all([
+                not self._state.adding,
+                self.pk is not None,
+                kwargs.get('update_fields') is None,
+                not kwargs.get('force_insert')]):
+            try:
+                self.refresh_from_db(fields=self.maintained_fields)
+            except Ancestor.DoesNotExist:
+                # Deleted meanwhile, so the save inserts it again
+                pass
+        super().save(*args, **kwargs)
+
     def clean(self):
+        from tree.integrity import validate_parents
+
+        validate_parents(self)
+
         if self.year_of_death:
             self.has_expired = True
 
@@ -528,44 +773,65 @@ register_search_vector(
 )
 
 
+LINEAGE_CANDIDATES_SQL = """
+    WITH persons AS (
+        SELECT %s AS id
+        UNION
+        SELECT s.id
+        FROM "{lineage}" l
+        JOIN "{generation}" g ON g.lineage_id = l.id
+        JOIN "{ancestor}" a ON a.id = g.ancestor_id
+        JOIN "{ancestor}" s ON s.father_id = a.father_id
+        WHERE l.ancestor_id = %s
+    )
+    SELECT id FROM persons
+    UNION
+    SELECT m.wife_id FROM "{marriage}" m JOIN persons p ON p.id = m.husband_id
+    UNION
+    SELECT m.husband_id FROM "{marriage}" m JOIN persons p ON p.id = m.wife_id
+"""
+
+
 class LineageQuerySet(models.QuerySet):
     """Custom QuerySet for the Lineage model."""
 
-    def for_ancestor(self, ancestor):
+    def through_ancestor(self, ancestor):
+        """Filter on the lineages that run through the ancestor.
+
+        These are the lineages that end with the ancestor or any of its
+        descendants, so the lineage path may include the ancestor.
+
+        """
         queryset = self._clone()
 
-        generations = (
-            Generation.objects
-            .filter(lineage__ancestor=ancestor)
-            .select_related(
-                'ancestor__father'
-            )
-            .prefetch_related(
-                'ancestor__father__children_of_father__marriages_of_husband',
-                'ancestor__father__children_of_father__marriages_of_wife',
-            )
+        descendants = (
+            AncestorClosure.objects
+            .descendants_of(ancestor)
+            .values('descendant')
         )
+        return queryset.filter(
+            Q(descendant=ancestor) | Q(descendant__in=descendants)
+        )
+
+    def for_ancestor(self, ancestor):
+        """Filter on the lineages that can be reached from the ancestor's tree.
 
-        candidates = [ancestor.pk]
-        if ancestor.gender == 'm':
-            for marriage in ancestor.marriages_of_husband.all():
-                candidates.append(marriage.wife_id)
-        elif ancestor.gender == 'f':
-            for marriage in ancestor.marriages_of_wife.all():
-                candidates.append(marriage.husband_id)
+        These are the lineages of the ancestor, its spouses, the siblings of
+        every generation in its lineage and their spouses. The candidates
+        are selected by a single subquery.
 
-        for generation in generations:
-            siblings = generation.ancestor.father.children.all()
-            for child in siblings:
-                candidates.append(child.pk)
-                if child.gender == 'm':
-                    for marriage in child.marriages_of_husband.all():
-                        candidates.append(marriage.wife_id)
-                elif child.gender == 'f':
-                    for marriage in child.marriages_of_wife.all():
-                        candidates.append(marriage.husband_id)
+        """
+        queryset = self._clone()
 
-        return queryset.filter(ancestor__in=candidates)
+        sql = LINEAGE_CANDIDATES_SQL.format(
+            ancestor=Ancestor._meta.db_table,
+            generation=Generation._meta.db_table,
+            lineage=self.model._meta.db_table,
+            marriage=Marriage._meta.db_table
+        )
+        return queryset.filter(
+            ancestor__in=RawSQL(sql, [ancestor.pk, ancestor.pk])
+        )
 
 
 class Lineage(models.Model):
@@ -599,20 +865,83 @@ class Lineage(models.Model):
 class GenerationManager(models.Manager):
     """Custom manager for the Generation model."""
 
-    @transaction.atomic()
     def build_generations(self, sender, **kwargs):
-        from tree.helpers import build_lineage
-
         lineage = kwargs.get('instance')
-        lineage.generations.all().delete()
-        generations = build_lineage(lineage)
-        generation_objects = [
+        lineage._generations_changed = self.update_generations(lineage)
+
+    @transaction.atomic()
+    def update_generations(self, lineage, graph=None):
+        """Bring the generations of the lineage in line with its path.
+
+        Only the rows that differ are inserted, updated or deleted. Returns
+        whether anything changed.
+
+        """
+        from tree.helpers import LineageBuilder
+
+        generations = dict(LineageBuilder(graph).build_ids(lineage))
+        existing = {
+            ancestor_id: (pk, generation)
+            for pk, ancestor_id, generation in lineage.generations.values_list(
+                'pk', 'ancestor_id', 'generation'
+            )
+        }
+
+        deleted = [
+            pk for ancestor_id, (pk, _) in existing.items()
+            if ancestor_id not in generations
+        ]
+        updated = [
+            self.model(
+                pk=pk,
+                lineage=lineage,
+                ancestor_id=ancestor_id,
+                generation=generations[ancestor_id]
+            )
+            for ancestor_id, (pk, generation) in existing.items()
+            if generations.get(ancestor_id, generation) != generation
+        ]
+        created = [
             self.model(
-                lineage=lineage, ancestor=ancestor, generation=generation
+                lineage=lineage, ancestor_id=ancestor_id, generation=generation
             )
-            for ancestor, generation in generations
+            for ancestor_id, generation in generations.items()
+            if ancestor_id not in existing
         ]
-        self.bulk_create(generation_objects)
+
+        if deleted:
+            self.filter(pk__in=deleted).delete()
+        if updated:
+            self.bulk_update(updated, ['generation'])
+        if created:
+            self.bulk_create(created)
+
+        changed = bool(deleted or updated or created)
+        if changed:
+            invalidate_dependents_on_commit(self.model)
+        return changed
+
+    def replace_generations(self, paths):
+        """Replace the generations of several lineages at once.
+
+        Takes a dict that maps lineage ids to the ids of their intermediate
+        generations, in the order returned by ParentGraph.path.
+
+        """
+        self.filter(lineage__in=list(paths)).delete()
+        self.bulk_create(
+            [
+                self.model(
+                    lineage_id=lineage_id,
+                    ancestor_id=ancestor_id,
+                    generation=generation
+                )
+                for lineage_id, path in paths.items()
+                for generation, ancestor_id in enumerate(path, 1)
+            ],
+            batch_size=1000
+        )
+        invalidate_dependents_on_commit(self.model)
 
 
 class Generation(models.Model):
@@ -652,3 +981,236 @@ class Generation(models.Model):
 
 
 post_save.connect(Generation.objects.build_generations, sender=Lineage)
+
+
+# Recomputes the closure rows of the affected people, which are someone whose
+# parents changed and all of their descendants. Lines are followed upward
+# through the affected people until they leave the set, after which the rows
+# of the ancestor that was reached are reused, as those didn't change. The
+# walk is bounded by the size of the set, so a loop in the parent links
+# can't keep it going.
+CLOSURE_UPDATE_SQL = """
+    WITH RECURSIVE walk (descendant_id, ancestor_id, depth) AS (
+        SELECT a.id, p.id, 1
+        FROM "{ancestor}" a
+        JOIN "{ancestor}" p ON p.id IN (a.father_id, a.mother_id)
+        WHERE a.id = ANY(%(affected)s)
+        UNION
+        SELECT w.descendant_id, p.id, w.depth + 1
+        FROM walk w
+        JOIN "{ancestor}" a ON a.id = w.ancestor_id
+        JOIN "{ancestor}" p ON p.id IN (a.father_id, a.mother_id)
+        WHERE a.id = ANY(%(affected)s) AND w.depth < %(bound)s
+    ),
+    lines AS (
+        SELECT descendant_id, ancestor_id, depth FROM walk
+        UNION ALL
+        SELECT w.descendant_id, c.ancestor_id, w.depth + c.depth
+        FROM walk w
+        JOIN "{closure}" c ON c.descendant_id = w.ancestor_id
+        WHERE NOT w.ancestor_id = ANY(%(affected)s)
+    )
+    INSERT INTO "{closure}" (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, descendant_id, MIN(depth)
+    FROM lines
+    WHERE ancestor_id <> descendant_id
+    GROUP BY ancestor_id, descendant_id
+"""
+
+
+class AncestorClosureQuerySet(models.QuerySet):
+    """Custom QuerySet for the AncestorClosure model."""
+
+    def ancestors_of(self, descendant):
+        return self.filter(descendant=descendant)
+
+    def descendants_of(self, ancestor):
+        return self.filter(ancestor=ancestor)
+
+    def is_descendant(self, descendant, ancestor):
+        return self.filter(ancestor=ancestor, descendant=descendant).exists()
+
+    def get_depth(self, ancestor, descendant):
+        return (
+            self.filter(ancestor=ancestor, descendant=descendant)
+            .values_list('depth', flat=True)
+            .first()
+        )
+
+
+class AncestorClosureManager(models.Manager.from_queryset(
+        AncestorClosureQuerySet)):
+    """Custom manager for the AncestorClosure model."""
+
+    batch_size = 1000
+
+    @transaction.atomic()
+    def update_ancestor(self, ancestor):
+        """Recompute the rows of the ancestor and everyone descending from it.
+
+        Changing the parents of an ancestor only changes the ancestors of its
+        own line, so the rest of the table is left alone and the new rows are
+        derived from it in SQL. Returns the ids of the ancestors whose
+        descendants changed: the old and new ancestors.
+
+        """
+        descendant_ids = [ancestor.pk] + list(
+            self.descendants_of(ancestor)
+            .values_list('descendant_id', flat=True)
+        )
+        ancestor_ids = set(
+            self.ancestors_of(ancestor).values_list('ancestor_id', flat=True)
+        )
+        self.filter(descendant__in=descendant_ids).delete()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                CLOSURE_UPDATE_SQL.format(
+                    ancestor=Ancestor._meta.db_table,
+                    closure=self.model._meta.db_table
+                ),
+                {'affected': descendant_ids, 'bound': len(descendant_ids)}
+            )
+        return ancestor_ids | set(
+            self.ancestors_of(ancestor).values_list('ancestor_id', flat=True)
+        )
+
+    @transaction.atomic()
+    def rebuild(self, graph=None):
+        from tree.graph import ParentGraph
+
+        graph = graph or ParentGraph.load()
+        self.all().delete()
+        self.bulk_create(
+            self._get_objects(graph, graph.ids), batch_size=self.batch_size
+        )
+
+    def compare(self, graph=None):
+        """Compare the table with the parent links.
+
+        Returns the rows that are missing, the rows that shouldn't be there
+        and the rows with the wrong depth, as (ancestor, descendant, depth)
+        tuples.
+
+        """
+        from tree.graph import ParentGraph
+
+        graph = graph or ParentGraph.load()
+        expected = {
+            (obj.ancestor_id, obj.descendant_id): obj.depth
+            for obj in self._get_objects(graph, graph.ids)
+        }
+        actual = {
+            (ancestor_id, descendant_id): depth
+            for ancestor_id, descendant_id, depth in self.values_list(
+                'ancestor_id', 'descendant_id', 'depth'
+            )
+        }
+        missing = [
+            key + (depth, ) for key, depth in expected.items()
+            if key not in actual
+        ]
+        extra = [
+            key + (depth, ) for key, depth in actual.items()
+            if key not in expected
+        ]
+        wrong = [
+            key + (depth, ) for key, depth in actual.items()
+            if key in expected and expected[key] != depth
+        ]
+        return missing, extra, wrong
+
+    def _get_objects(self, graph, descendant_ids):
+        positions = [
+            graph.positions[pk] for pk in descendant_ids
+            if pk in graph.positions
+        ]
+        depths = graph.ancestor_depths(positions)
+        for position in positions:
+            for ancestor, depth in depths[position].items():
+                yield self.model(
+                    ancestor_id=graph.ids[ancestor],
+                    descendant_id=graph.ids[position],
+                    depth=depth
+                )
+
+
+class AncestorClosure(models.Model):
+    """Contains every ancestor of every ancestor, with the depth between them.
+
+    Note that this is filled by the app.
+
+    """
+
+    ancestor = models.ForeignKey(
+        Ancestor,
+        on_delete=models.CASCADE,
+        related_name='descendant_links',
+        verbose_name='Voorouder'
+    )
+
+    descendant = models.ForeignKey(
+        Ancestor,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links',
+        verbose_name='Nakomeling'
+    )
+
+    depth = models.PositiveIntegerField('Aantal generaties')
+
+    objects = AncestorClosureManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['descendant', 'depth'])]
+        unique_together = ['ancestor', 'descendant']
+        verbose_name = 'Afstammingsrelatie'
+        verbose_name_plural = 'Afstammingsrelaties'
+
+    def __str__(self):
+        return '{} > {} ({})'.format(
+            str(self.ancestor), str(self.descendant), str(self.depth)
+        )
+
+
+class DuplicateCandidate(models.Model):
+    """Contains pairs of ancestors that may be the same person.
+
+    Note that this is filled by the app.
+
+    """
+
+    STATUS_OPEN = 'open'
+    STATUS_DUPLICATE = 'duplicate'
+    STATUS_DISTINCT = 'distinct'
+
+    ancestor = models.ForeignKey(
+        Ancestor,
+        on_delete=models.CASCADE,
+        related_name='duplicate_candidates',
+        verbose_name='Voorouder'
+    )
+
+    duplicate = models.ForeignKey(
+        Ancestor,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Mogelijk dezelfde persoon'
+    )
+
+    score = models.PositiveIntegerField('Score')
+
+    status = models.CharField('Status', max_length=10, choices=[
+        (STATUS_OPEN, 'Te beoordelen'),
+        (STATUS_DUPLICATE, 'Dezelfde persoon'),
+        (STATUS_DISTINCT, 'Verschillende personen')
+    ], default=STATUS_OPEN)
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ['ancestor', 'duplicate']
+        verbose_name = 'Mogelijk dubbele voorouder'
+        verbose_name_plural = 'Mogelijk dubbele voorouders'
+
+    def __str__(self):
+        return '{} = {} ({})'.format(
+            str(self.ancestor), str(self.duplicate), str(self.score)
+        )
@@ -0,0 +1,209 @@
+"""
+Signal handlers for the tree app.
+
+"""
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, \
+    pre_save
+from django.dispatch import Signal
+
+from lib.cache.dependencies import invalidate_dependents_on_commit
+from tree import models
+from tree.graph import ParentGraph, invalidate_family_graph
+from tree.helpers import invalidate_lineage_indexes
+
+
+# Sent when an ancestor is created with parents or when its father or
+# mother changed. Receivers get the instance and the original
+# (father_id, mother_id) tuple, which is None for new ancestors.
+parents_changed = Signal()
+
+
+def store_original_parents(sender, instance, raw=False, **kwargs):
+    instance._was_root = False
+    if raw or instance.pk is None:
+        instance._original_parents = None
+        return
+
+    original = (
+        sender.objects
+        .filter(pk=instance.pk)
+        .values_list('father_id', 'mother_id', 'is_root')
+        .first()
+    )
+    instance._original_parents = original[:2] if original else None
+    instance._was_root = original[2] if original else False
+
+
+def detect_parents_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    original_parents = getattr(instance, '_original_parents', None)
+    parents = (instance.father_id, instance.mother_id)
+    if original_parents is None and parents == (None, None):
+        return
+
+    if parents != original_parents:
+        parents_changed.send(
+            sender=sender,
+            instance=instance,
+            original_parents=original_parents
+        )
+
+
+def detect_root_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    if instance.is_root != getattr(instance, '_was_root', False):
+        models.Ancestor.objects.update_root_generations()
+
+
+def store_original_lineage(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._original_lineage = None
+        return
+
+    instance._original_lineage = (
+        sender.objects
+        .filter(pk=instance.pk)
+        .values_list('ancestor_id', 'descendant_id')
+        .first()
+    )
+
+
+def lineage_saved(sender, instance, created, **kwargs):
+    # The generations are built before this runs; nothing derived from the
+    # lineage needs to be reset if neither the line nor its ends changed.
+    original_lineage = getattr(instance, '_original_lineage', None)
+    lineage = (instance.ancestor_id, instance.descendant_id)
+    if any([
+            created,
+            original_lineage != lineage,
+            getattr(instance, '_generations_changed', True)]):
+        invalidate_family_graph()
+        invalidate_lineage_indexes()
+
+
+def update_closure(sender, instance, **kwargs):
+    ancestor_ids = models.AncestorClosure.objects.update_ancestor(instance)
+    models.Ancestor.objects.filter(
+        pk__in=ancestor_ids
+    ).update_descendant_counts()
+
+
+def update_root_generations(sender, instance, **kwargs):
+    # The generations of the ancestor's line and their spouses follow
+    ancestor_ids = [instance.pk] + list(
+        models.AncestorClosure.objects
+        .descendants_of(instance)
+        .values_list('descendant_id', flat=True)
+    )
+    models.Ancestor.objects.filter(
+        Q(
+            pk__in=ancestor_ids
+        ) | Q(
+            marriages_of_husband__wife__in=ancestor_ids
+        ) | Q(
+            marriages_of_wife__husband__in=ancestor_ids
+        )
+    ).update_root_generations()
+
+
+def update_spouse_generations(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    models.Ancestor.objects.filter(
+        pk__in=[instance.husband_id, instance.wife_id]
+    ).update_root_generations()
+
+
+def store_ancestor_ids(sender, instance, **kwargs):
+    instance._ancestor_ids = list(
+        models.AncestorClosure.objects
+        .ancestors_of(instance)
+        .values_list('ancestor_id', flat=True)
+    )
+
+
+def update_descendant_counts(sender, instance, **kwargs):
+    models.Ancestor.objects.filter(
+        pk__in=getattr(instance, '_ancestor_ids', [])
+    ).update_descendant_counts()
+
+
+def refresh_lineages(sender, instance, **kwargs):
+    lineages = list(models.Lineage.objects.through_ancestor(instance))
+    if not lineages:
+        return
+
+    # The lines are walked upward, so the descendants of the lineages and
+    # their ancestors are all the graph needs, and the closure is up to date.
+    descendant_ids = [lineage.descendant_id for lineage in lineages]
+    graph = ParentGraph.load(descendant_ids + list(
+        models.AncestorClosure.objects
+        .filter(descendant__in=descendant_ids)
+        .values_list('ancestor_id', flat=True)
+        .distinct()
+    ))
+    changed = [
+        models.Generation.objects.update_generations(lineage, graph)
+        for lineage in lineages
+    ]
+    if any(changed):
+        invalidate_lineage_indexes()
+
+
+def invalidate_derived_caches(sender, instance, **kwargs):
+    invalidate_dependents_on_commit(instance)
+
+
+def invalidate_generation_caches(sender, **kwargs):
+    # The generations of a deleted ancestor are deleted in bulk
+    invalidate_dependents_on_commit(models.Generation)
+
+
+def reset_family_graph(sender, **kwargs):
+    invalidate_family_graph()
+
+
+def reset_lineage_indexes(sender, **kwargs):
+    invalidate_lineage_indexes()
+
+
+pre_save.connect(store_original_parents, sender=models.Ancestor)
+post_save.connect(detect_parents_changed, sender=models.Ancestor)
+post_save.connect(detect_root_changed, sender=models.Ancestor)
+parents_changed.connect(update_closure, sender=models.Ancestor)
+parents_changed.connect(update_root_generations, sender=models.Ancestor)
+parents_changed.connect(refresh_lineages, sender=models.Ancestor)
+pre_delete.connect(store_ancestor_ids, sender=models.Ancestor)
+post_delete.connect(update_descendant_counts, sender=models.Ancestor)
+
+post_save.connect(update_spouse_generations, sender=models.Marriage)
+post_delete.connect(update_spouse_generations, sender=models.Marriage)
+
+pre_save.connect(store_original_lineage, sender=models.Lineage)
+post_save.connect(lineage_saved, sender=models.Lineage)
+
+for model in [models.Ancestor, models.Marriage]:
+    post_save.connect(reset_family_graph, sender=model)
+    post_save.connect(reset_lineage_indexes, sender=model)
+
+for model in [models.Ancestor, models.Marriage, models.Lineage]:
+    post_delete.connect(reset_family_graph, sender=model)
+    post_delete.connect(reset_lineage_indexes, sender=model)
+
+# Generations are deleted in bulk when lineages are rebuilt, which resets
+# the indexes themselves, so only edits of single rows are handled here.
+post_save.connect(reset_lineage_indexes, sender=models.Generation)
+
+for model in [models.Ancestor, models.Bio, models.Marriage, models.Lineage]:
+    post_save.connect(invalidate_derived_caches, sender=model)
+    post_delete.connect(invalidate_derived_caches, sender=model)
+
+# As above, bulk changes of generations invalidate the caches themselves
+post_save.connect(invalidate_derived_caches, sender=models.Generation)
+post_delete.connect(invalidate_generation_caches, sender=models.Ancestor)
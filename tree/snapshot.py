@@ -0,0 +1,419 @@
+"""
+Contains a binary snapshot of the family graph that workers share.
+
+The snapshot is a file of int32 arrays and string tables. Every worker maps
+it into memory, so all of them read the same copy from the page cache and
+nothing is copied or parsed when it is opened.
+
+The snapshot is written by the write_graph_snapshot command, outside of
+the requests that change the data. Until it is written again, workers see
+that it is stale and read from the database instead.
+
+"""
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Q
+
+from tree import models
+from tree.graph import FamilyGraph, ParentGraph, get_family_graph, \
+    get_family_graph_version
+
+
+MAGIC = b'FGSN'
+
+FORMAT_VERSION = 1
+
+# Written in native byte order; a reader on another platform sees a
+# different byte order mark and refuses the file.
+BYTE_ORDER_MARK = 0x01020304
+
+# magic, byte order mark, format version, number of ancestors, number of
+# spouse entries, number of child entries and the family graph version
+HEADER = struct.Struct('=4sIIIII32s')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def build_snapshot(ancestors, marriages, version=None):
+    """Return the snapshot of the ancestors and marriages as bytes.
+
+    The ancestors are (pk, father_id, mother_id, slug, name) tuples in order
+    of age, the marriages (husband_id, wife_id) tuples. In the snapshot the
+    ancestors are ordered by id, while the children of everyone stay sorted
+    by age.
+
+    """
+    ancestors = list(ancestors)
+    ranks = {row[0]: rank for rank, row in enumerate(ancestors)}
+    ancestors.sort()
+    positions = {row[0]: position for position, row in enumerate(ancestors)}
+
+    fathers = array('i', [positions.get(row[1], -1) for row in ancestors])
+    mothers = array('i', [positions.get(row[2], -1) for row in ancestors])
+
+    children = [[] for _ in ancestors]
+    for position, row in enumerate(ancestors):
+        for parent_id in (row[1], row[2]):
+            if parent_id in positions:
+                children[positions[parent_id]].append(position)
+    for child_positions in children:
+        child_positions.sort(key=lambda child: ranks[ancestors[child][0]])
+
+    spouses = [[] for _ in ancestors]
+    for husband_id, wife_id in marriages:
+        if husband_id in positions and wife_id in positions:
+            spouses[positions[husband_id]].append(positions[wife_id])
+            spouses[positions[wife_id]].append(positions[husband_id])
+    for spouse_positions in spouses:
+        spouse_positions.sort()
+
+    spouse_offsets, spouse_entries = _flatten(spouses)
+    child_offsets, child_entries = _flatten(children)
+    slug_offsets, slugs = _encode([row[3] for row in ancestors])
+    name_offsets, names = _encode([row[4] for row in ancestors])
+
+    header = HEADER.pack(
+        MAGIC, BYTE_ORDER_MARK, FORMAT_VERSION, len(ancestors),
+        len(spouse_entries), len(child_entries),
+        (version or '').encode('ascii')
+    )
+    sections = [
+        array('i', [row[0] for row in ancestors]), fathers, mothers,
+        spouse_offsets, spouse_entries, child_offsets, child_entries,
+        slug_offsets, name_offsets
+    ]
+    return b''.join(
+        [header] + [section.tobytes() for section in sections] + [slugs, names]
+    )
+
+
+def _flatten(lists):
+    offsets = array('i', [0])
+    entries = array('i')
+    for values in lists:
+        entries.extend(values)
+        offsets.append(len(entries))
+    return offsets, entries
+
+
+def _encode(strings):
+    offsets = array('i', [0])
+    encoded = []
+    for string in strings:
+        encoded.append(string.encode('utf-8'))
+        offsets.append(offsets[-1] + len(encoded[-1]))
+    return offsets, b''.join(encoded)
+
+
+def load_snapshot(version=None):
+    """Build the snapshot of the family graph in two queries."""
+    ancestors = (
+        models.Ancestor.objects
+        .select_related('christian_name')
+        .with_age()
+        .order_by('age', 'pk')
+    )
+    marriages = models.Marriage.objects.values_list('husband_id', 'wife_id')
+    return build_snapshot(
+        (
+            (
+                ancestor.pk, ancestor.father_id, ancestor.mother_id,
+                ancestor.slug, str(ancestor)
+            )
+            for ancestor in ancestors
+        ),
+        marriages,
+        version
+    )
+
+
+def write_snapshot(path, version=None):
+    """Write a new snapshot and swap it in atomically.
+
+    The snapshot is written to a temporary file next to the old one, which
+    is then replaced. Workers that still map the old file keep reading it
+    until they notice the new one.
+
+    """
+    data = load_snapshot(version)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot_file:
+            snapshot_file.write(data)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class _Positions(object):
+    """Finds the positions of ids in the sorted ids of a snapshot."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def get(self, pk, default=None):
+        position = bisect_left(self.ids, pk)
+        if position < len(self.ids) and self.ids[position] == pk:
+            return position
+        return default
+
+    def __getitem__(self, pk):
+        position = self.get(pk)
+        if position is None:
+            raise KeyError(pk)
+        return position
+
+    def __contains__(self, pk):
+        return self.get(pk) is not None
+
+
+class GraphSnapshot(ParentGraph):
+    """A read-only view on a snapshot of the family graph.
+
+    The arrays are memoryviews of the snapshot, so the lookups and the
+    traversals of the parent graph read the mapped file directly.
+
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise SnapshotError('The snapshot is truncated')
+
+        magic, byte_order_mark, format_version, size, spouse_size, \
+            child_size, version = HEADER.unpack_from(view)
+        if magic != MAGIC or byte_order_mark != BYTE_ORDER_MARK:
+            raise SnapshotError('This is not a snapshot of this platform')
+        if format_version != FORMAT_VERSION:
+            raise SnapshotError(
+                'Unsupported snapshot format {}'.format(format_version)
+            )
+        self.version = version.rstrip(b'\0').decode('ascii') or None
+
+        self._views = [view]
+        offset = HEADER.size
+        sections = []
+        for length in (
+                size, size, size, size + 1, spouse_size, size + 1,
+                child_size, size + 1, size + 1):
+            end = offset + 4 * length
+            section = self._view(view, offset, end)
+            sections.append(self._track(section.cast('i')))
+            offset = end
+        self.ids, self.fathers, self.mothers, self._spouse_offsets, \
+            self._spouses, self._child_offsets, self._children, \
+            self._slug_offsets, self._name_offsets = sections
+
+        slugs_end = offset + self._slug_offsets[-1]
+        self._slugs = self._view(view, offset, slugs_end)
+        self._names = self._view(
+            view, slugs_end, slugs_end + self._name_offsets[-1]
+        )
+        if slugs_end + self._name_offsets[-1] != len(view):
+            raise SnapshotError('The snapshot is truncated')
+
+        self.positions = _Positions(self.ids)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as snapshot_file:
+            if not os.fstat(snapshot_file.fileno()).st_size:
+                raise SnapshotError('The snapshot is empty')
+            return cls(mmap.mmap(
+                snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+            ))
+
+    def close(self):
+        # The map can only be closed once nothing points into it anymore
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def father_id(self, pk):
+        return self._get_parent_id(self.fathers, pk)
+
+    def mother_id(self, pk):
+        return self._get_parent_id(self.mothers, pk)
+
+    def children_ids(self, pk):
+        """Return the ids of the children of the ancestor, eldest first."""
+        return self._get_ids(self._child_offsets, self._children, pk)
+
+    def spouse_ids(self, pk):
+        return self._get_ids(self._spouse_offsets, self._spouses, pk)
+
+    def slug(self, pk):
+        return self._get_string(self._slug_offsets, self._slugs, pk)
+
+    def name(self, pk):
+        return self._get_string(self._name_offsets, self._names, pk)
+
+    def tree_ids(self, line_ids):
+        """Return the ids of everyone on the tree along the line.
+
+        That's everyone in the line with their spouses and children, and the
+        parents of all of them.
+
+        """
+        pks = set()
+        for pk in line_ids:
+            pks.add(pk)
+            pks.update(self.spouse_ids(pk))
+            pks.update(self.children_ids(pk))
+        for pk in list(pks):
+            pks.update(
+                parent_id
+                for parent_id in (self.father_id(pk), self.mother_id(pk))
+                if parent_id is not None
+            )
+        return pks
+
+    def _view(self, view, start, end):
+        if end > len(view):
+            raise SnapshotError('The snapshot is truncated')
+        return self._track(view[start:end])
+
+    def _track(self, view):
+        self._views.append(view)
+        return view
+
+    def _get_parent_id(self, parents, pk):
+        position = self.positions.get(pk)
+        if position is None or parents[position] == -1:
+            return None
+        return self.ids[parents[position]]
+
+    def _get_ids(self, offsets, entries, pk):
+        position = self.positions.get(pk)
+        if position is None:
+            return []
+        return [
+            self.ids[entry]
+            for entry in entries[offsets[position]:offsets[position + 1]]
+        ]
+
+    def _get_string(self, offsets, strings, pk):
+        position = self.positions.get(pk)
+        if position is None:
+            return None
+        return str(
+            strings[offsets[position]:offsets[position + 1]], 'utf-8'
+        )
+
+
+class SharedSnapshot(object):
+    """The snapshot that a process has mapped, reopened when it is replaced.
+
+    The snapshot is only returned while its version matches the version of
+    the family graph, so a worker never reads a snapshot that is older than
+    the data it describes.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._stat = None
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._replace(None, None)
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._stat:
+            try:
+                self._replace(GraphSnapshot.open(self.path), key)
+            except SnapshotError:
+                self._replace(None, None)
+                return None
+
+        if self._snapshot.version != get_family_graph_version():
+            return None
+        return self._snapshot
+
+    def _replace(self, snapshot, stat):
+        # Views handed out earlier keep the old map alive until they're
+        # garbage collected, so the old snapshot isn't closed explicitly.
+        self._snapshot = snapshot
+        self._stat = stat
+
+
+_shared_snapshots = {}
+
+
+def get_graph_snapshot():
+    """Return the current snapshot, or None if there is no usable one."""
+    path = settings.GRAPH_SNAPSHOT_PATH
+    if not path:
+        return None
+
+    if path not in _shared_snapshots:
+        _shared_snapshots[path] = SharedSnapshot(path)
+    return _shared_snapshots[path].get()
+
+
+def get_parent_graph():
+    """Return the shared snapshot, or a parent graph from the database."""
+    snapshot = get_graph_snapshot()
+    return snapshot if snapshot is not None else ParentGraph.load()
+
+
+def get_tree_graph(line_ids):
+    """Return a family graph to render the tree along the line.
+
+    Without a snapshot path this is the process-wide graph of everyone.
+    With one, only the people on the tree are loaded, so workers don't keep
+    a copy of the whole family. Their ids are read from the snapshot, or
+    from the database while the snapshot is stale.
+
+    """
+    if not settings.GRAPH_SNAPSHOT_PATH:
+        return get_family_graph()
+
+    snapshot = get_graph_snapshot()
+    if snapshot is not None:
+        pks = snapshot.tree_ids(line_ids)
+    else:
+        pks = _load_tree_ids(line_ids)
+    return FamilyGraph.load(pks)
+
+
+def _load_tree_ids(line_ids):
+    pks = set(line_ids)
+    marriages = models.Marriage.objects.filter(
+        Q(husband_id__in=line_ids) | Q(wife_id__in=line_ids)
+    )
+    for pair in marriages.values_list('husband_id', 'wife_id'):
+        pks.update(pair)
+
+    relatives = models.Ancestor.objects.filter(
+        Q(pk__in=pks) | Q(father_id__in=line_ids) | Q(mother_id__in=line_ids)
+    )
+    for row in relatives.values_list('pk', 'father_id', 'mother_id'):
+        pks.update(pk for pk in row if pk is not None)
+    return pks
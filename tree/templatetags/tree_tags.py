@@ -8,6 +8,7 @@ from django import template
 from django.template.loader import render_to_string
 
 from tree import helpers
+from tree.snapshot import get_tree_graph
 
 
 register = template.Library()
@@ -15,9 +16,17 @@ register = template.Library()
 
 @register.inclusion_tag('templatetags/tree.html', takes_context=True)
 def render_tree(context, ancestor):
+    graph = context.get('family_graph')
+    if graph is None:
+        lineages = context.get('lineages')
+        lineage = lineages.root if lineages else None
+        graph = get_tree_graph(
+            [ancestor.pk] + (list(lineage.generation_ids) if lineage else [])
+        )
+
     marriages = [
         (marriage.ancestor, marriage.spouse, marriage.children)
-        for marriage in helpers.get_marriages(ancestor)
+        for marriage in helpers.get_marriages(ancestor, graph)
     ]
 
     flat_ancestors = context.get('flat_ancestors', [])
@@ -28,12 +37,36 @@ def render_tree(context, ancestor):
     )
 
     context.update({
+        'family_graph': graph,
         'marriages': marriages,
-        'flat_ancestors': flat_ancestors
+        'flat_ancestors': flat_ancestors,
+        'max_generation': context.get('max_generation'),
+        'tree_depth': context.get('tree_depth', -1) + 1
     })
     return context
 
 
+@register.simple_tag(takes_context=True)
+def within_generation(context, child):
+    """Tell whether the children of a child in the tree are shown.
+
+    The generations are counted from the root ancestor of the page. They
+    are taken from the stored generations when both have one, and from the
+    depth in the rendered tree otherwise.
+
+    """
+    max_generation = context.get('max_generation')
+    if max_generation is None:
+        return True
+
+    root_ancestor = context.get('root_ancestor')
+    if None not in (child.root_generation, root_ancestor.root_generation):
+        generation = child.root_generation - root_ancestor.root_generation
+    else:
+        generation = context.get('tree_depth', 0) + 1
+    return generation < max_generation
+
+
 @register.simple_tag(takes_context=True)
 def render_ancestor(context, ancestor, css_class=None):
     root_ancestor = context.get('root_ancestor')
@@ -42,7 +75,8 @@ def render_ancestor(context, ancestor, css_class=None):
         return ''
 
     parents = helpers.get_parents(
-        ancestor, context.get('flat_ancestors', [])
+        ancestor, context.get('flat_ancestors', []),
+        context.get('family_graph')
     )
 
     return render_to_string('templatetags/ancestor.html', {
@@ -72,6 +106,9 @@ def render_bio(ancestor):
     }
 
 
-@register.simple_tag()
-def ancestor_url(ancestor):
+@register.simple_tag(takes_context=True)
+def ancestor_url(context, ancestor):
+    ancestor_urls = context.get('ancestor_urls', {})
+    if ancestor.pk in ancestor_urls:
+        return ancestor_urls[ancestor.pk]
     return helpers.ancestor_url(ancestor)
@@ -6,6 +6,21 @@ import factory
 from tree import models
 
 
+def get_birthyear(ancestor):
+    # Children are born well after their parents
+    birthyears = [
+        parent.birthyear
+        for parent in (
+            getattr(ancestor, 'father', None),
+            getattr(ancestor, 'mother', None)
+        )
+        if parent and parent.birthyear
+    ]
+    if birthyears:
+        return max(birthyears) + random.randrange(20, 41)
+    return random.randrange(1800, 1851)
+
+
 class AncestorFactory(factory.django.DjangoModelFactory):
 
     birthdate = factory.Faker(
@@ -14,7 +29,7 @@ class AncestorFactory(factory.django.DjangoModelFactory):
         date_end=datetime.date(1950, 1, 1)
     )
 
-    birthyear = factory.LazyAttribute(lambda obj: random.randrange(1800, 1951))
+    birthyear = factory.LazyAttribute(get_birthyear)
 
     birthplace = factory.Faker('city')
 
@@ -1,9 +1,13 @@
 from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
+from django.test import override_settings
 
+from lib.cache.dependencies import get_generation
+from tree.tests import factories
 from tree.admin import LineageAdmin
-from tree.models import Lineage
+from tree.models import DuplicateCandidate, Lineage
 from tree.tests.testcases import TreeTestCase
 
 
@@ -20,6 +24,11 @@ request = MockRequest()
 request.user = MockSuperUser()
 
 
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+})
 class TestLineageAdmin(TreeTestCase):
 
     def setUp(self):
@@ -27,22 +36,54 @@ class TestLineageAdmin(TreeTestCase):
         self.site = AdminSite()
 
     def test_clear_caches(self):
-        cache.add('lineages:{}'.format(self.lineage.ancestor_id), 'foo')
-        cache.add(
-            'lineage-objects:ancestor={}'.format(self.lineage.ancestor_id),
-            'foo'
-        )
-        cache.add(
-            make_template_fragment_key('tree', [self.lineage.ancestor_id]), ''
-        )
+        keys = [
+            'lineages:{}:{}'.format(
+                self.lineage.ancestor_id, get_generation('lineages')
+            ),
+            'lineage-objects:ancestor={}:{}'.format(
+                self.lineage.ancestor_id, get_generation('lineage-objects')
+            ),
+            make_template_fragment_key(
+                'tree', [self.lineage.ancestor_id, get_generation('tree')]
+            )
+        ]
+        cache.set_many(dict.fromkeys(keys, 'foo'))
         ma = LineageAdmin(Lineage, self.site)
         ma.clear_caches(request, Lineage.objects.filter(pk=self.lineage.pk))
-        self.assertCacheNotContains(
-            'lineages:{}'.format(self.lineage.ancestor_id)
+        self.assertEqual(cache.get_many(keys), {})
+
+
+class TestAncestorAdmin(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(
+            User.objects.create_superuser('admin', 'admin@example.com', 'pw')
         )
-        self.assertCacheNotContains(
-            'lineage-objects:ancestor={}'.format(self.lineage.ancestor_id)
+
+    def test_components_view(self):
+        ancestor = factories.AncestorFactory(gender='m')
+
+        response = self.client.get('/admin/tree/ancestor/components/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['root_size'], 10)
+        self.assertEqual(response.context['sizes'], [10, 1])
+        self.assertContains(response, str(ancestor))
+
+    def test_changelist_links_components(self):
+        response = self.client.get('/admin/tree/ancestor/')
+        self.assertContains(response, '/admin/tree/ancestor/components/')
+
+
+class TestDuplicateCandidateAdmin(TreeTestCase):
+
+    def test_changelist(self):
+        self.client.force_login(
+            User.objects.create_superuser('admin', 'admin@example.com', 'pw')
         )
-        self.assertCacheNotContains(
-            make_template_fragment_key('tree', [self.lineage.ancestor_id])
+        DuplicateCandidate.objects.create(
+            ancestor=self.top_male, duplicate=self.generation_1[0], score=90
         )
+
+        response = self.client.get('/admin/tree/duplicatecandidate/')
+        self.assertContains(response, str(self.top_male))
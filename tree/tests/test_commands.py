@@ -0,0 +1,278 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+
+from lib.cache.stats import record_hit, record_miss, reset_cache_stats
+from tree import models
+from tree.graph import get_family_graph
+from tree.tests import factories
+from tree.tests.testcases import TreeTestCase
+
+
+class TestRebuildClosure(TreeTestCase):
+
+    def test_rebuild(self):
+        models.AncestorClosure.objects.all().delete()
+
+        call_command('rebuild_closure', stdout=StringIO())
+        self.assertEqual(models.AncestorClosure.objects.count(), 20)
+
+    @mock.patch(
+        'tree.management.commands.rebuild_closure'
+        '.invalidate_dependents_on_commit'
+    )
+    def test_rebuild_invalidates_trees(self, invalidate_dependents):
+        graph = get_family_graph()
+        call_command('rebuild_closure', stdout=StringIO())
+
+        self.assertIsNot(get_family_graph(), graph)
+        invalidate_dependents.assert_called_once_with(models.Ancestor)
+
+    def test_verify(self):
+        out = StringIO()
+        call_command('rebuild_closure', verify=True, stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+    def test_verify_differences(self):
+        models.AncestorClosure.objects.filter(
+            descendant=self.generation_2[0]
+        ).delete()
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_closure', verify=True, stdout=out)
+        self.assertIn(
+            'Missing: {} > {} (2)'.format(
+                self.top_male.pk, self.generation_2[0].pk
+            ),
+            out.getvalue()
+        )
+
+
+class TestRebuildGenerations(TreeTestCase):
+
+    def test_rebuild(self):
+        lineage = factories.LineageFactory(
+            ancestor=self.top_female, descendant=self.generation_extra[1]
+        )
+        models.Generation.objects.all().delete()
+
+        call_command('rebuild_generations', processes=1, stdout=StringIO())
+
+        result = list(
+            models.Generation.objects
+            .order_by('lineage', 'generation')
+            .values_list('lineage', 'ancestor', 'generation')
+        )
+        expected = [
+            (self.lineage.pk, self.generation_1[0].pk, 1),
+            (lineage.pk, self.generation_1[1].pk, 1)
+        ]
+        self.assertEqual(result, expected)
+
+
+class TestDiscoverLineages(TreeTestCase):
+
+    def test_discover(self):
+        models.Lineage.objects.all().delete()
+
+        call_command('discover_lineages', stdout=StringIO())
+
+        lineage = models.Lineage.objects.get()
+        self.assertEqual(lineage.ancestor, self.top_male)
+        self.assertEqual(lineage.generations.count(), 1)
+
+    def test_discover_existing(self):
+        factories.AncestorFactory(
+            gender='m', father=self.generation_extra[0], firstname='Dick'
+        )
+
+        call_command('discover_lineages', stdout=StringIO())
+
+        lineage = models.Lineage.objects.get()
+        self.assertEqual(lineage.descendant, self.generation_2[0])
+
+    def test_discover_update(self):
+        child = factories.AncestorFactory(
+            gender='m', father=self.generation_extra[0], firstname='Dick'
+        )
+
+        call_command('discover_lineages', update=True, stdout=StringIO())
+
+        lineage = models.Lineage.objects.get()
+        self.assertEqual(lineage.descendant, child)
+        result = list(
+            lineage.generations.order_by('generation')
+            .values_list('ancestor', flat=True)
+        )
+        expected = [self.generation_1[1].pk, self.generation_extra[0].pk]
+        self.assertEqual(result, expected)
+
+    def test_discover_dry_run(self):
+        models.Lineage.objects.all().delete()
+
+        out = StringIO()
+        call_command('discover_lineages', dry_run=True, stdout=out)
+
+        self.assertFalse(models.Lineage.objects.exists())
+        self.assertIn('Create: {} > '.format(self.top_male), out.getvalue())
+
+
+class TestReportComponents(TreeTestCase):
+
+    def test_report(self):
+        ancestor = factories.AncestorFactory(gender='m')
+
+        out = StringIO()
+        call_command('report_components', list=True, stdout=out)
+
+        self.assertIn('Root component: 10 people', out.getvalue())
+        self.assertIn('Disconnected: 1 people in 1 components', out.getvalue())
+        self.assertIn('{} ({})'.format(ancestor, ancestor.pk), out.getvalue())
+
+    def test_report_number_of_queries(self):
+        factories.AncestorFactory(gender='m')
+        factories.AncestorFactory(gender='f')
+
+        with self.assertNumQueries(4):
+            call_command('report_components', list=True, stdout=StringIO())
+
+
+class TestCheckIntegrity(TreeTestCase):
+
+    def test_check(self):
+        out = StringIO()
+        call_command('check_integrity', stdout=out)
+        self.assertIn('No problems found', out.getvalue())
+
+    def test_check_problems(self):
+        models.Ancestor.objects.filter(pk=self.top_male.pk).update(
+            father=self.generation_2[0]
+        )
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_integrity', stdout=out)
+        self.assertIn(
+            'Cycle: {} is their own ancestor'.format(self.top_male.pk),
+            out.getvalue()
+        )
+
+
+class TestFindDuplicates(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ancestors = [
+            factories.AncestorFactory(
+                gender='m', firstname='Pieter', lastname='Dijk',
+                birthyear=1849, birthplace='Utrecht'
+            )
+            for _ in range(2)
+        ]
+
+    def test_find(self):
+        call_command('find_duplicates', stdout=StringIO())
+
+        self.assertTrue(models.DuplicateCandidate.objects.filter(
+            ancestor=self.ancestors[0], duplicate=self.ancestors[1],
+            status=models.DuplicateCandidate.STATUS_OPEN
+        ).exists())
+
+    def test_find_keeps_reviewed(self):
+        models.DuplicateCandidate.objects.create(
+            ancestor=self.ancestors[0], duplicate=self.ancestors[1],
+            score=100, status=models.DuplicateCandidate.STATUS_DISTINCT
+        )
+
+        call_command('find_duplicates', stdout=StringIO())
+
+        candidate = models.DuplicateCandidate.objects.get(
+            ancestor=self.ancestors[0], duplicate=self.ancestors[1]
+        )
+        self.assertEqual(
+            candidate.status, models.DuplicateCandidate.STATUS_DISTINCT
+        )
+
+
+class TestRebuildRootGenerations(TreeTestCase):
+
+    def test_rebuild(self):
+        models.Ancestor.objects.update(root_generation=None)
+
+        out = StringIO()
+        call_command('rebuild_root_generations', stdout=out)
+
+        self.assertIn(
+            'Rebuilt the generations of 10 ancestors', out.getvalue()
+        )
+        self.assertEqual(
+            models.Ancestor.objects.filter(root_generation=2).count(), 4
+        )
+
+    @mock.patch(
+        'tree.management.commands.rebuild_root_generations'
+        '.invalidate_dependents_on_commit'
+    )
+    def test_rebuild_invalidates_trees(self, invalidate_dependents):
+        graph = get_family_graph()
+        call_command('rebuild_root_generations', stdout=StringIO())
+
+        self.assertIsNot(get_family_graph(), graph)
+        invalidate_dependents.assert_called_once_with(models.Ancestor)
+
+
+class TestWriteGraphSnapshot(TreeTestCase):
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.snapshot')
+            out = StringIO()
+            call_command('write_graph_snapshot', path=path, stdout=out)
+
+            self.assertIn('Wrote the snapshot', out.getvalue())
+            self.assertTrue(os.path.exists(path))
+
+    def test_write_if_stale(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.snapshot')
+            call_command('write_graph_snapshot', path=path, stdout=StringIO())
+            out = StringIO()
+            call_command(
+                'write_graph_snapshot', path=path, if_stale=True, stdout=out
+            )
+
+            self.assertIn('The snapshot is up to date', out.getvalue())
+
+    def test_write_without_path(self):
+        with self.assertRaises(CommandError):
+            call_command('write_graph_snapshot')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-cache-stats-command'
+    }
+})
+class TestCacheStats(TreeTestCase):
+
+    def test_report(self):
+        reset_cache_stats()
+        record_hit('lineages')
+        record_miss('lineages', 0.5, 1000)
+        out = StringIO()
+        call_command('cache_stats', reset=True, stdout=out)
+
+        self.assertIn('lineages', out.getvalue())
+        self.assertIn('1 hits, 1 misses, 50% hit ratio', out.getvalue())
+        self.assertIn('500.0 ms and 1000 bytes per recompute', out.getvalue())
+
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('Nothing was counted yet', out.getvalue())
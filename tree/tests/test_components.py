@@ -0,0 +1,41 @@
+from tree.components import ComponentReport, UnionFind
+from tree.tests import factories
+from tree.tests.testcases import TreeTestCase
+
+
+class TestUnionFind(TreeTestCase):
+
+    def test_union(self):
+        sets = UnionFind(4)
+        sets.union(0, 1)
+        sets.union(2, 1)
+        self.assertEqual(sets.find(0), sets.find(2))
+        self.assertNotEqual(sets.find(0), sets.find(3))
+
+
+class TestComponentReport(TreeTestCase):
+
+    def test_connected(self):
+        report = ComponentReport.load()
+        self.assertEqual(len(report.root_component), 10)
+        self.assertEqual(report.disconnected, [])
+
+    def test_disconnected(self):
+        husband = factories.AncestorFactory(gender='m')
+        wife = factories.AncestorFactory(gender='f')
+        factories.MarriageFactory(husband=husband, wife=wife)
+        child = factories.AncestorFactory(
+            gender='f', father=None, mother=wife
+        )
+        single = factories.AncestorFactory(gender='m')
+
+        report = ComponentReport.load()
+        self.assertEqual(report.sizes, [10, 3, 1])
+        self.assertEqual(
+            report.disconnected_ids,
+            [husband.pk, wife.pk, child.pk, single.pk]
+        )
+
+    def test_num_queries(self):
+        with self.assertNumQueries(3):
+            ComponentReport.load()
@@ -0,0 +1,80 @@
+from tree.graph import FamilyGraph, ParentGraph, get_family_graph, \
+    invalidate_family_graph
+from tree.tests.testcases import TreeTestCase
+
+
+class TestParentGraph(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph = ParentGraph.load()
+
+    def test_path(self):
+        result = self.graph.path(self.top_male.pk, self.generation_2[0].pk)
+        expected = [self.generation_1[0].pk]
+        self.assertEqual(result, expected)
+
+    def test_path_through_mother(self):
+        result = self.graph.path(
+            self.top_female.pk, self.generation_extra[1].pk
+        )
+        expected = [self.generation_1[1].pk]
+        self.assertEqual(result, expected)
+
+    def test_path_direct_child(self):
+        result = self.graph.path(self.top_male.pk, self.generation_1[0].pk)
+        self.assertEqual(result, [])
+
+    def test_path_not_found(self):
+        result = self.graph.path(self.spouse_2.pk, self.generation_2[0].pk)
+        self.assertEqual(result, [])
+
+
+class TestFamilyGraph(TreeTestCase):
+
+    with_persistent_names = True
+
+    def setUp(self):
+        super().setUp()
+        self.graph = FamilyGraph.load()
+
+    def test_parents(self):
+        child = self.generation_2[0]
+        self.assertEqual(self.graph.father(child), self.generation_1[0])
+        self.assertEqual(self.graph.mother(child), self.spouse_1)
+        self.assertIsNone(self.graph.father(self.top_male))
+
+    def test_children(self):
+        result = self.graph.children(self.top_male, self.top_female)
+        expected = self.generation_1
+        self.assertEqual(result, expected)
+
+        result = self.graph.children(self.spouse_2, self.generation_1[1])
+        expected = self.generation_extra
+        self.assertEqual(result, expected)
+
+    def test_marriages(self):
+        result = [
+            spouse for _, spouse in self.graph.marriages(self.generation_1[1])
+        ]
+        expected = [self.spouse_2]
+        self.assertEqual(result, expected)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.graph.get(self.spouse_2.pk).was_married)
+
+    def test_has_lineage(self):
+        self.assertTrue(self.graph.has_lineage(self.top_male))
+        self.assertFalse(self.graph.has_lineage(self.generation_1[0]))
+
+    def test_get_family_graph(self):
+        graph = get_family_graph()
+        self.assertIs(get_family_graph(), graph)
+
+        invalidate_family_graph()
+        self.assertIsNot(get_family_graph(), graph)
+
+    def test_invalidated_on_save(self):
+        graph = get_family_graph()
+        self.generation_2[1].save()
+        self.assertIsNot(get_family_graph(), graph)
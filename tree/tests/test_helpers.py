@@ -1,4 +1,13 @@
+import pickle
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import override_settings
+
+from lib.cache.dependencies import get_generation
 from tree import helpers, models
+from tree.graph import FamilyGraph
+from tree.tests import factories
 from tree.tests.testcases import TreeTestCase
 
 
@@ -21,9 +30,95 @@ class TestHelpers(TreeTestCase):
         lineage = lineages[self.top_male.pk]
         self.assertIn(self.generation_1[0], lineage)
 
-        self.assertCacheContains('lineages:{}'.format(self.top_male.pk))
-        self.assertCacheContains('lineage-objects:ancestor={}'.format(
-            self.top_male.pk))
+        self.assertCacheContains(self.make_generation_key(
+            'lineages:{}'.format(self.top_male.pk), 'lineages'
+        ))
+        self.assertCacheContains(self.make_generation_key(
+            'lineage-objects:ancestor={}'.format(self.top_male.pk),
+            'lineage-objects'
+        ))
+
+    def test_ancestor_url(self):
+        result = helpers.ancestor_url(self.generation_2[1])
+        expected = '/stamboom/john-glass-1812-1874/'
+        self.assertEqual(result, expected)
+
+        self.assertCacheValueEquals(
+            self.make_generation_key(
+                'ancestor_url:{}'.format(self.generation_2[1].pk),
+                'ancestor_url'
+            ),
+            expected
+        )
+
+    def test_get_ancestor_urls(self):
+        ancestors = [self.top_male, self.generation_2[1], self.spouse_2]
+        result = helpers.get_ancestor_urls(ancestors)
+        self.assertCacheValueEquals(
+            self.make_generation_key(
+                'ancestor_url:{}'.format(self.top_male.pk), 'ancestor_url'
+            ),
+            '/stamboom/john-glass-1812-1874/'
+        )
+        expected = {
+            ancestor.pk: helpers.ancestor_url(ancestor)
+            for ancestor in ancestors
+        }
+        self.assertEqual(result, expected)
+
+    def test_ancestor_url_root_only(self):
+        self.assertIsNone(
+            helpers.ancestor_url(self.generation_2[1], root_only=True)
+        )
+        self.assertEqual(
+            helpers.ancestor_url(self.top_male, root_only=True),
+            '/stamboom/john-glass-1812-1874/'
+        )
+
+    def test_get_lineages_number_of_queries(self):
+        lineages = helpers.get_lineages(self.top_male)
+        with self.assertNumQueries(1):
+            lineage = lineages.root
+        self.assertEqual(lineage.generations, [self.generation_1[0]])
+
+    def test_get_lineages_membership(self):
+        lineage = helpers.get_lineages(self.top_male).root
+        with self.assertNumQueries(0):
+            self.assertIn(self.generation_1[0], lineage)
+            self.assertIn(self.generation_1[0].pk, lineage)
+            self.assertNotIn(self.generation_2[0], lineage)
+
+    def test_get_lineages_cached_payload(self):
+        lineage = helpers.get_lineages(self.top_male).root
+        lineage.generations
+        result = pickle.loads(pickle.dumps(lineage))
+        self.assertEqual(
+            list(result.generation_ids), [self.generation_1[0].pk]
+        )
+        self.assertIsNone(result._ancestors)
+
+    def test_get_lineages_ancestors_number_of_queries(self):
+        lineage = helpers.get_lineages(self.top_male).root
+        with self.assertNumQueries(1):
+            self.assertEqual(lineage.ancestor, self.top_male)
+            self.assertEqual(lineage.descendant, self.generation_2[0])
+            self.assertEqual(lineage.generations, [self.generation_1[0]])
+            self.assertEqual(lineage.ancestor, self.top_male)
+
+    def test_get_pedigree(self):
+        result = [
+            (entry.number, entry.generation, entry.ancestor)
+            for entry in helpers.get_pedigree(self.generation_2[0])
+        ]
+        expected = [
+            (1, 0, self.generation_2[0]),
+            (2, 1, self.generation_1[0]),
+            (3, 1, self.spouse_1),
+            (4, 2, self.top_male),
+            (5, 2, self.top_female)
+        ]
+        self.assertEqual(result, expected)
+        self.assertCacheContains('pedigree:{}'.format(self.generation_2[0].pk))
 
     def test_get_parents(self):
         parents = helpers.get_parents(
@@ -34,6 +129,24 @@ class TestHelpers(TreeTestCase):
         expected = ['father', 'mother']
         self.assertEqual(result, expected)
 
+    def test_get_parents_from_graph(self):
+        graph = FamilyGraph.load()
+        with self.assertNumQueries(0):
+            parents = helpers.get_parents(
+                descendant=self.generation_1[0],
+                visible_ancestors=[self.generation_1[0], self.spouse_1],
+                graph=graph
+            )
+            self.assertIn(self.top_male.slug, parents['father'])
+
+    def test_get_marriages_from_graph(self):
+        graph = FamilyGraph.load()
+        with self.assertNumQueries(0):
+            marriages = helpers.get_marriages(self.generation_1[0], graph)
+        self.assertEqual(len(marriages), 1)
+        self.assertEqual(marriages[0].spouse, self.spouse_1)
+        self.assertEqual(marriages[0].children, self.generation_2)
+
     def test_get_parents_none_found(self):
         result = helpers.get_parents(
             descendant=self.top_male,
@@ -53,3 +166,101 @@ class TestHelpers(TreeTestCase):
             ]
         )
         self.assertIsNone(result)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    },
+    'local': {
+        'BACKEND': 'lib.cache.backends.TwoTierCache',
+        'LOCATION': 'test-cache-dependencies'
+    }
+})
+class TestCacheDependencies(TreeTestCase):
+
+    with_persistent_names = True
+
+    def setUp(self):
+        super().setUp()
+        caches['local'].clear()
+        # The test case never commits, so invalidate right away
+        patcher = mock.patch(
+            'django.db.transaction.on_commit',
+            lambda func, using=None: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def make_generation_key(key, namespace):
+        return '{}:{}'.format(key, get_generation(namespace))
+
+    def test_lineage_saved(self):
+        helpers.get_lineages(self.top_male)
+        key = self.make_generation_key(
+            'lineages:{}'.format(self.top_male.pk), 'lineages'
+        )
+        self.assertIsNotNone(cache.get(key))
+        self.assertIsNotNone(caches['local'].get(key))
+
+        models.Lineage.objects.get(pk=self.lineage.pk).save()
+        new_key = self.make_generation_key(
+            'lineages:{}'.format(self.top_male.pk), 'lineages'
+        )
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(caches['local'].get(new_key))
+
+    def test_lineage_married_in(self):
+        ancestor = factories.AncestorFactory(gender='m')
+        factories.LineageFactory(
+            ancestor=ancestor,
+            descendant=factories.AncestorFactory(father=ancestor)
+        )
+        self.assertNotIn(ancestor.pk, helpers.get_lineages(self.top_male))
+
+        daughter = factories.AncestorFactory(
+            gender='f', father=self.top_male, mother=self.top_female
+        )
+        factories.MarriageFactory(husband=ancestor, wife=daughter)
+        self.assertIn(ancestor.pk, helpers.get_lineages(self.top_male))
+
+    def test_generations_replaced(self):
+        helpers.get_lineages(self.top_male)
+        models.Generation.objects.replace_generations({})
+        self.assertIsNone(caches['local'].get(
+            self.make_generation_key(
+                'lineages:{}'.format(self.top_male.pk), 'lineages'
+            )
+        ))
+
+    def test_marriage_saved(self):
+        helpers.ancestor_url(self.generation_2[1])
+        key = self.make_generation_key(
+            'ancestor_url:{}'.format(self.generation_2[1].pk), 'ancestor_url'
+        )
+        self.assertIsNotNone(cache.get(key))
+
+        factories.MarriageFactory()
+        self.assertIsNone(cache.get(self.make_generation_key(
+            'ancestor_url:{}'.format(self.generation_2[1].pk), 'ancestor_url'
+        )))
+
+    def test_ancestor_url_keys_not_tracked(self):
+        helpers.get_ancestor_urls([self.top_male, self.generation_2[1]])
+        self.assertIsNone(cache.get('dependencies:tree.ancestor'))
+
+    def test_pedigree_ancestor_saved(self):
+        helpers.get_pedigree(self.generation_2[0])
+        helpers.get_pedigree(self.generation_extra[0])
+        key = 'pedigree:{}'.format(self.generation_2[0].pk)
+        other_key = 'pedigree:{}'.format(self.generation_extra[0].pk)
+
+        models.Ancestor.objects.get(pk=self.spouse_1.pk).save()
+        self.assertIsNone(cache.get(key))
+        self.assertIsNotNone(cache.get(other_key))
+
+    def test_tree_bio_saved(self):
+        generation = get_generation('tree')
+        factories.BioFactory(ancestor=self.generation_1[0])
+        self.assertNotEqual(get_generation('tree'), generation)
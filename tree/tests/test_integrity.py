@@ -0,0 +1,84 @@
+from django.core.exceptions import ValidationError
+
+from tree import models
+from tree.integrity import BIRTHYEAR, CYCLE, GENDER, IntegrityChecker
+from tree.tests import factories
+from tree.tests.testcases import TreeTestCase
+
+
+class TestIntegrityChecker(TreeTestCase):
+
+    def test_check(self):
+        self.assertEqual(IntegrityChecker.load().check(), [])
+
+    def test_check_cycles(self):
+        # 1 > 2 > 3 > 1 is a cycle; 4 is a child and 5 a parent of the cycle
+        checker = IntegrityChecker([
+            (1, 3, None, 'm', None),
+            (2, 1, None, 'm', None),
+            (3, 2, 5, 'm', None),
+            (4, 3, None, 'm', None),
+            (5, None, None, 'f', None),
+        ])
+        result = [
+            (problem.kind, problem.ancestor_id)
+            for problem in checker.check()
+        ]
+        expected = [(CYCLE, 1), (CYCLE, 2), (CYCLE, 3)]
+        self.assertEqual(result, expected)
+
+    def test_check_links(self):
+        checker = IntegrityChecker([
+            (1, None, None, 'f', 1900),
+            (2, None, None, 'f', 1910),
+            (3, 1, 2, 'm', 1905),
+        ])
+        result = [
+            (problem.kind, problem.ancestor_id)
+            for problem in checker.check()
+        ]
+        expected = [(GENDER, 3), (BIRTHYEAR, 3)]
+        self.assertEqual(result, expected)
+
+
+class TestValidateParents(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Work on fresh copies of the shared test data
+        self.ancestor = models.Ancestor.objects.get(pk=self.top_male.pk)
+        self.child = models.Ancestor.objects.get(pk=self.generation_1[0].pk)
+
+    def test_valid(self):
+        self.child.full_clean()
+
+    def test_own_ancestor(self):
+        self.ancestor.father = self.generation_2[0]
+        with self.assertRaises(ValidationError) as cm:
+            self.ancestor.full_clean()
+        self.assertIn('father', cm.exception.message_dict)
+
+    def test_wrong_gender(self):
+        ancestor = factories.AncestorFactory(gender='m')
+        ancestor.mother = self.top_male
+        with self.assertRaises(ValidationError) as cm:
+            ancestor.full_clean()
+        self.assertIn('mother', cm.exception.message_dict)
+
+    def test_wrong_gender_of_parent(self):
+        self.ancestor.gender = 'f'
+        with self.assertRaises(ValidationError) as cm:
+            self.ancestor.full_clean()
+        self.assertIn('gender', cm.exception.message_dict)
+
+    def test_born_before_child(self):
+        self.ancestor.birthyear = self.child.birthyear
+        with self.assertRaises(ValidationError) as cm:
+            self.ancestor.full_clean()
+        self.assertIn('birthyear', cm.exception.message_dict)
+
+    def test_born_after_parent(self):
+        self.child.birthyear = self.ancestor.birthyear - 1
+        with self.assertRaises(ValidationError) as cm:
+            self.child.full_clean()
+        self.assertIn('father', cm.exception.message_dict)
@@ -1,7 +1,15 @@
 import operator
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import Count
 
 from tree import models
-from tree.tests.factories import LineageFactory
+from tree.graph import ParentGraph, get_family_graph
+from tree.tests.factories import AncestorFactory, LineageFactory, \
+    MarriageFactory
 from tree.tests.testcases import TreeTestCase
 
 
@@ -52,6 +60,125 @@ class TestAncestorQuerySet(TreeTestCase):
         children[0].refresh_from_db()
         children[1].refresh_from_db()
 
+    def test_descendants_of(self):
+        with self.assertNumQueries(1):
+            result = list(
+                models.Ancestor.objects
+                .descendants_of(self.top_male)
+                .order_by('depth', 'pk')
+                .values_list('pk', 'depth')
+            )
+        expected = sorted([
+            (ancestor.pk, 1) for ancestor in self.generation_1
+        ]) + sorted([
+            (ancestor.pk, 2)
+            for ancestor in self.generation_2 + self.generation_extra
+        ])
+        self.assertEqual(result, expected)
+
+    def test_descendants_of_max_depth(self):
+        result = models.Ancestor.objects.descendants_of(
+            self.top_male, max_depth=1
+        )
+        expected = self.generation_1
+        self.assertCountEqual(result, expected)
+
+    def test_ancestors_of(self):
+        result = {
+            ancestor: ancestor.depth
+            for ancestor in models.Ancestor.objects.ancestors_of(
+                self.generation_extra[0]
+            )
+        }
+        expected = {
+            self.generation_1[1]: 1,
+            self.spouse_2: 1,
+            self.top_male: 2,
+            self.top_female: 2
+        }
+        self.assertEqual(result, expected)
+
+    def test_ancestors_of_pedigree_collapse(self):
+        # Cousins marry, so their child descends from the top twice
+        child = AncestorFactory(
+            gender='m', father=self.generation_2[0],
+            mother=self.generation_extra[1]
+        )
+        result = {
+            ancestor: ancestor.depth
+            for ancestor in models.Ancestor.objects.ancestors_of(child)
+        }
+        self.assertEqual(result[self.top_male], 3)
+        self.assertEqual(result[self.generation_1[1]], 2)
+        self.assertEqual(len(result), 8)
+
+    def test_descendants_of_subquery(self):
+        result = models.Ancestor.objects.filter(
+            pk__in=models.Ancestor.objects
+            .descendants_of(self.top_male)
+            .filter(depth=1)
+            .values('pk')
+        )
+        self.assertCountEqual(result, self.generation_1)
+
+    def test_descendants_of_grouped(self):
+        result = (
+            models.Ancestor.objects
+            .descendants_of(self.top_male)
+            .values('depth')
+            .annotate(count=Count('pk'))
+            .order_by('depth')
+        )
+        self.assertEqual(
+            list(result), [{'depth': 1, 'count': 2}, {'depth': 2, 'count': 4}]
+        )
+
+    def test_relatives_of_max_depth_zero(self):
+        queryset = models.Ancestor.objects
+        self.assertFalse(queryset.descendants_of(self.top_male, max_depth=0))
+        self.assertFalse(
+            queryset.ancestors_of(self.generation_2[0], max_depth=0)
+        )
+
+    def test_ancestors_of_chained(self):
+        result = list(
+            models.Ancestor.objects
+            .ancestors_of(self.generation_2[0])
+            .filter(depth=1)
+            .with_marriages()
+            .order_by_age()
+        )
+        expected = [self.generation_1[0], self.spouse_1]
+        self.assertCountEqual(result, expected)
+        self.assertEqual(result[0].depth, 1)
+
+    def test_pedigree(self):
+        with self.assertNumQueries(2):
+            result = [
+                (ancestor.number, ancestor)
+                for ancestor in models.Ancestor.objects.pedigree(
+                    self.generation_2[0], 2
+                )
+            ]
+
+        expected = [
+            (1, self.generation_2[0]),
+            (2, self.generation_1[0]),
+            (3, self.spouse_1),
+            (4, self.top_male),
+            (5, self.top_female)
+        ]
+        self.assertEqual(result, expected)
+
+    def test_pedigree_depth(self):
+        result = [
+            ancestor.number
+            for ancestor in models.Ancestor.objects.pedigree(
+                self.generation_2[0], 1
+            )
+        ]
+        self.assertEqual(result, [1, 2, 3])
+
 
 class TestChristianName(TreeTestCase):
 
@@ -326,21 +453,30 @@ class TestLineageQuerySet(TreeTestCase):
             ancestor=self.generation_1[1], descendant=self.generation_extra[0]
         )
 
-        # Query count:
-        # Marriages of ancestor (1)
-        # Generation query (1)
-        # Children of father (1)
-        # Marriages of husband (1)
-        # Marriages of wife (1)
-
-        with self.assertNumQueries(5):
-            queryset = models.Lineage.objects.for_ancestor(self.top_male)
-        result = list(queryset.order_by('id'))
+        with self.assertNumQueries(1):
+            result = list(
+                models.Lineage.objects
+                .for_ancestor(self.top_male)
+                .order_by('id')
+            )
         expected = sorted(
             [self.lineage, lineage], key=operator.attrgetter('id')
         )
         self.assertEqual(result, expected)
 
+    def test_through_ancestor(self):
+        lineage = LineageFactory(
+            ancestor=self.top_female, descendant=self.generation_extra[0]
+        )
+
+        result = models.Lineage.objects.through_ancestor(self.generation_1[1])
+        expected = [lineage]
+        self.assertEqual(list(result), expected)
+
+        result = models.Lineage.objects.through_ancestor(self.generation_2[0])
+        expected = [self.lineage]
+        self.assertEqual(list(result), expected)
+
 
 class TestLineage(TreeTestCase):
 
@@ -350,3 +486,302 @@ class TestLineage(TreeTestCase):
         result = str(lineage)
         expected = str(self.top_male) + ' > ' + str(self.generation_2[0])
         self.assertEqual(result, expected)
+
+
+class TestGenerationManager(TreeTestCase):
+
+    def test_build_generations(self):
+        ancestor = self.generation_2[0]
+        line = [ancestor]
+        for _ in range(4):
+            ancestor = AncestorFactory(gender='m', father=ancestor)
+            line.append(ancestor)
+        lineage = LineageFactory(ancestor=self.top_female, descendant=line[-1])
+
+        result = list(
+            lineage.generations.values_list('ancestor', 'generation')
+        )
+        expected = [
+            (ancestor.pk, generation)
+            for generation, ancestor in enumerate(
+                [self.generation_1[0]] + line[:-1], 1
+            )
+        ]
+        self.assertEqual(result, expected)
+
+    def test_update_generations_unchanged(self):
+        result = models.Generation.objects.update_generations(self.lineage)
+        self.assertFalse(result)
+
+    def test_update_generations(self):
+        generation = self.lineage.generations.get()
+        descendant = AncestorFactory(gender='m', father=self.generation_2[0])
+        self.lineage.descendant = descendant
+
+        result = models.Generation.objects.update_generations(self.lineage)
+        self.assertTrue(result)
+
+        result = list(
+            self.lineage.generations
+            .values_list('pk', 'ancestor', 'generation')
+        )
+        expected = [
+            (generation.pk, self.generation_1[0].pk, 1),
+            (result[1][0], self.generation_2[0].pk, 2)
+        ]
+        self.assertEqual(result, expected)
+
+        self.lineage.refresh_from_db()
+
+    def test_refreshed_on_parent_change(self):
+        descendant = AncestorFactory(gender='m', father=self.generation_2[0])
+        lineage = LineageFactory(
+            ancestor=self.top_female, descendant=descendant
+        )
+        self.assertEqual(lineage.generations.count(), 2)
+
+        # Move the line over to the other branch
+        self.generation_2[0].father = self.spouse_2
+        self.generation_2[0].mother = self.generation_1[1]
+        self.generation_2[0].save()
+
+        result = list(
+            lineage.generations.values_list('ancestor', 'generation')
+        )
+        expected = [
+            (self.generation_1[1].pk, 1),
+            (self.generation_2[0].pk, 2)
+        ]
+        self.assertEqual(result, expected)
+
+        self.generation_2[0].refresh_from_db()
+
+    def test_save_unchanged_lineage(self):
+        graph = get_family_graph()
+        self.lineage.save()
+        self.assertIs(get_family_graph(), graph)
+
+        self.lineage.descendant = self.generation_2[1]
+        self.lineage.save()
+        self.assertIsNot(get_family_graph(), graph)
+
+        self.lineage.refresh_from_db()
+
+
+class TestAncestorClosure(TreeTestCase):
+
+    def test_built_on_create(self):
+        queryset = models.AncestorClosure.objects
+        self.assertTrue(
+            queryset.is_descendant(self.generation_2[0], self.top_male)
+        )
+        self.assertFalse(
+            queryset.is_descendant(self.generation_2[0], self.spouse_2)
+        )
+        self.assertEqual(
+            queryset.get_depth(self.top_female, self.generation_2[1]), 2
+        )
+
+    def test_descendants_of(self):
+        result = (
+            models.AncestorClosure.objects
+            .descendants_of(self.generation_1[1])
+            .values_list('descendant', flat=True)
+        )
+        expected = [ancestor.pk for ancestor in self.generation_extra]
+        self.assertCountEqual(result, expected)
+
+    def test_updated_on_parent_change(self):
+        ancestor = self.generation_1[0]
+        ancestor.father = self.spouse_2
+        ancestor.save()
+
+        queryset = models.AncestorClosure.objects
+        self.assertFalse(
+            queryset.is_descendant(self.generation_2[0], self.top_male)
+        )
+        self.assertEqual(
+            queryset.get_depth(self.spouse_2, self.generation_2[0]), 2
+        )
+        self.assertEqual(queryset.compare(), ([], [], []))
+
+        ancestor.refresh_from_db()
+
+    def test_updated_on_pedigree_collapse(self):
+        ancestor = AncestorFactory(
+            father=self.generation_2[0], mother=self.generation_1[1]
+        )
+        queryset = models.AncestorClosure.objects
+        self.assertEqual(queryset.get_depth(self.top_male, ancestor), 2)
+
+        ancestor.mother = None
+        ancestor.save()
+        self.assertEqual(queryset.get_depth(self.top_male, ancestor), 3)
+        self.assertEqual(queryset.compare(), ([], [], []))
+
+    def test_updated_without_loading_everyone(self):
+        ancestor = models.Ancestor.objects.get(pk=self.generation_2[0].pk)
+        ancestor.father = self.spouse_2
+        with mock.patch.object(
+                ParentGraph, 'load', wraps=ParentGraph.load) as load:
+            ancestor.save()
+
+        self.assertTrue(load.called)
+        for args, kwargs in load.call_args_list:
+            self.assertIsNotNone(args[0])
+        self.assertEqual(
+            models.AncestorClosure.objects.compare(), ([], [], [])
+        )
+
+    def test_fill_migration(self):
+        migration = import_module('tree.migrations.0013_fill_ancestorclosure')
+        AncestorFactory(
+            father=self.generation_2[0], mother=self.generation_1[1]
+        )
+        models.AncestorClosure.objects.filter(depth=2).delete()
+
+        migration.fill_closure(apps, connection.schema_editor())
+        self.assertEqual(
+            models.AncestorClosure.objects.compare(), ([], [], [])
+        )
+
+    def test_rebuild(self):
+        models.AncestorClosure.objects.filter(depth=2).delete()
+        self.assertNotEqual(
+            models.AncestorClosure.objects.compare(), ([], [], [])
+        )
+
+        models.AncestorClosure.objects.rebuild()
+        self.assertEqual(
+            models.AncestorClosure.objects.compare(), ([], [], [])
+        )
+
+
+class TestDescendantCounts(TreeTestCase):
+
+    def get_counts(self, ancestor):
+        return tuple(
+            models.Ancestor.objects
+            .filter(pk=ancestor.pk)
+            .values_list('descendant_count', 'descendant_depth')
+            .get()
+        )
+
+    def test_counts(self):
+        self.assertEqual(self.get_counts(self.top_male), (6, 2))
+        self.assertEqual(self.get_counts(self.generation_1[0]), (2, 1))
+        self.assertEqual(self.get_counts(self.generation_2[0]), (0, 0))
+
+    def test_counts_updated_on_parent_change(self):
+        ancestor = models.Ancestor.objects.get(pk=self.generation_extra[0].pk)
+        ancestor.mother = None
+        ancestor.save()
+
+        self.assertEqual(self.get_counts(self.top_male), (5, 2))
+        self.assertEqual(self.get_counts(self.generation_1[1]), (1, 1))
+
+        ancestor.father = self.generation_2[0]
+        ancestor.save()
+
+        self.assertEqual(self.get_counts(self.top_male), (6, 3))
+        self.assertEqual(self.get_counts(self.spouse_2), (1, 1))
+
+    def test_counts_updated_on_delete(self):
+        models.Ancestor.objects.get(pk=self.generation_2[0].pk).delete()
+
+        self.assertEqual(self.get_counts(self.top_male), (5, 2))
+        self.assertEqual(self.get_counts(self.spouse_1), (1, 1))
+
+    def test_counts_not_overwritten_by_save(self):
+        ancestor = models.Ancestor.objects.get(pk=self.top_male.pk)
+        AncestorFactory(gender='m', father=self.generation_2[0], mother=None)
+        ancestor.save()
+
+        self.assertEqual(self.get_counts(self.top_male), (7, 3))
+
+    def test_save_after_delete(self):
+        ancestor = models.Ancestor.objects.get(pk=self.generation_2[1].pk)
+        models.Ancestor.objects.filter(pk=ancestor.pk).delete()
+
+        ancestor.save()
+        self.assertTrue(
+            models.Ancestor.objects.filter(pk=ancestor.pk).exists()
+        )
+
+    def test_update_descendant_counts(self):
+        models.Ancestor.objects.update(descendant_count=0, descendant_depth=0)
+
+        with self.assertNumQueries(1):
+            models.Ancestor.objects.update_descendant_counts()
+
+        self.assertEqual(self.get_counts(self.top_male), (6, 2))
+
+    def test_fill_migration(self):
+        migration = import_module(
+            'tree.migrations.0014_fill_descendant_counts'
+        )
+        models.Ancestor.objects.update(descendant_count=0, descendant_depth=0)
+
+        migration.fill_descendant_counts(apps, connection.schema_editor())
+        self.assertEqual(self.get_counts(self.top_male), (6, 2))
+        self.assertEqual(self.get_counts(self.generation_1[0]), (2, 1))
+
+
+class TestRootGenerations(TreeTestCase):
+
+    def get_generation(self, ancestor):
+        return (
+            models.Ancestor.objects
+            .values_list('root_generation', flat=True)
+            .get(pk=ancestor.pk)
+        )
+
+    def test_generations(self):
+        result = [
+            self.get_generation(ancestor)
+            for ancestor in [
+                self.top_male, self.top_female, self.generation_1[0],
+                self.spouse_1, self.spouse_2, self.generation_2[0],
+                self.generation_extra[1]
+            ]
+        ]
+        expected = [0, 0, 1, 1, 1, 2, 2]
+        self.assertEqual(result, expected)
+
+    def test_fill_migration(self):
+        migration = import_module(
+            'tree.migrations.0015_fill_root_generations'
+        )
+        models.Ancestor.objects.update(root_generation=None)
+
+        migration.fill_root_generations(apps, connection.schema_editor())
+        self.assertEqual(self.get_generation(self.top_female), 0)
+        self.assertEqual(self.get_generation(self.spouse_1), 1)
+        self.assertEqual(self.get_generation(self.generation_2[0]), 2)
+
+    def test_generations_updated_on_parent_change(self):
+        ancestor = models.Ancestor.objects.get(pk=self.generation_extra[0].pk)
+        ancestor.mother = None
+        ancestor.save()
+        self.assertIsNone(self.get_generation(ancestor))
+
+        ancestor.father = self.generation_2[0]
+        ancestor.save()
+        self.assertEqual(self.get_generation(ancestor), 3)
+
+    def test_generations_updated_on_marriage(self):
+        spouse = AncestorFactory(gender='f')
+        MarriageFactory(husband=self.generation_2[0], wife=spouse)
+        self.assertEqual(self.get_generation(spouse), 2)
+
+    def test_generations_updated_on_root_change(self):
+        top_male = models.Ancestor.objects.get(pk=self.top_male.pk)
+        top_male.is_root = False
+        top_male.save()
+        ancestor = models.Ancestor.objects.get(pk=self.generation_1[0].pk)
+        ancestor.is_root = True
+        ancestor.save()
+
+        self.assertIsNone(self.get_generation(self.top_male))
+        self.assertEqual(self.get_generation(self.generation_1[0]), 0)
+        self.assertEqual(self.get_generation(self.generation_2[0]), 1)
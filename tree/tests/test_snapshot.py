@@ -0,0 +1,154 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+
+from tree.graph import FamilyGraph, ParentGraph, get_family_graph
+from tree.snapshot import GraphSnapshot, SharedSnapshot, SnapshotError, \
+    _load_tree_ids, build_snapshot, get_parent_graph, get_tree_graph, \
+    load_snapshot, write_snapshot
+from tree.tests import factories
+from tree.tests.testcases import TreeTestCase
+
+
+class TestGraphSnapshot(TreeTestCase):
+
+    with_persistent_names = True
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot = GraphSnapshot(load_snapshot('version'))
+
+    def test_load_number_of_queries(self):
+        with self.assertNumQueries(2):
+            load_snapshot()
+
+    def test_parents(self):
+        self.assertEqual(len(self.snapshot), 10)
+        self.assertEqual(
+            self.snapshot.father_id(self.generation_1[0].pk), self.top_male.pk
+        )
+        self.assertEqual(
+            self.snapshot.mother_id(self.generation_1[0].pk),
+            self.top_female.pk
+        )
+        self.assertIsNone(self.snapshot.father_id(self.top_male.pk))
+        self.assertIsNone(self.snapshot.father_id(0))
+
+    def test_children_by_age(self):
+        result = self.snapshot.children_ids(self.top_male.pk)
+        expected = [ancestor.pk for ancestor in self.generation_1]
+        self.assertEqual(result, expected)
+
+    def test_spouses(self):
+        self.assertEqual(
+            self.snapshot.spouse_ids(self.generation_1[0].pk),
+            [self.spouse_1.pk]
+        )
+        self.assertEqual(self.snapshot.spouse_ids(self.generation_2[0].pk), [])
+
+    def test_strings(self):
+        self.assertEqual(
+            self.snapshot.slug(self.top_male.pk), 'john-glass-1812-1874'
+        )
+        self.assertEqual(
+            self.snapshot.name(self.top_male.pk), 'John Glass 1812 - 1874'
+        )
+        self.assertIsNone(self.snapshot.name(0))
+
+    def test_tree_ids(self):
+        line_ids = [self.top_male.pk, self.generation_1[0].pk]
+        expected = {
+            ancestor.pk for ancestor in [
+                self.top_male, self.top_female, self.spouse_1
+            ] + self.generation_1 + self.generation_2
+        }
+        self.assertEqual(self.snapshot.tree_ids(line_ids), expected)
+        self.assertEqual(_load_tree_ids(line_ids), expected)
+
+    def test_parent_graph(self):
+        graph = ParentGraph.load()
+        self.assertEqual(
+            self.snapshot.path(self.top_male.pk, self.generation_2[0].pk),
+            graph.path(self.top_male.pk, self.generation_2[0].pk)
+        )
+        self.assertEqual(self.snapshot.version, 'version')
+
+    def test_empty(self):
+        snapshot = GraphSnapshot(build_snapshot([], []))
+        self.assertEqual(len(snapshot), 0)
+        self.assertIsNone(snapshot.version)
+        self.assertEqual(snapshot.children_ids(1), [])
+
+    def test_invalid(self):
+        data = load_snapshot()
+        with self.assertRaises(SnapshotError):
+            GraphSnapshot(b'PNG' + data[3:])
+        with self.assertRaises(SnapshotError):
+            GraphSnapshot(data[:-1])
+
+
+class TestSharedSnapshot(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'graph.snapshot')
+
+    def test_write(self):
+        write_snapshot(self.path)
+        snapshot = GraphSnapshot.open(self.path)
+        self.assertEqual(len(snapshot), 10)
+        snapshot.close()
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [
+            'graph.snapshot'
+        ])
+
+    def test_reopen_when_replaced(self):
+        shared = SharedSnapshot(self.path)
+        self.assertIsNone(shared.get())
+
+        write_snapshot(self.path)
+        first = shared.get()
+        self.assertEqual(len(first), 10)
+        self.assertIs(shared.get(), first)
+
+        factories.AncestorFactory()
+        write_snapshot(self.path)
+        self.assertEqual(len(shared.get()), 11)
+
+    def test_stale_version(self):
+        write_snapshot(self.path, version='old')
+        shared = SharedSnapshot(self.path)
+        with mock.patch(
+                'tree.snapshot.get_family_graph_version',
+                return_value='new'):
+            self.assertIsNone(shared.get())
+
+    def test_get_parent_graph(self):
+        self.assertIs(type(get_parent_graph()), ParentGraph)
+
+        write_snapshot(self.path)
+        with override_settings(GRAPH_SNAPSHOT_PATH=self.path):
+            self.assertIsInstance(get_parent_graph(), GraphSnapshot)
+
+    def test_get_tree_graph(self):
+        line_ids = [self.top_male.pk, self.generation_1[0].pk]
+        self.assertIs(get_tree_graph(line_ids), get_family_graph())
+
+        write_snapshot(self.path)
+        with override_settings(GRAPH_SNAPSHOT_PATH=self.path):
+            graph = get_tree_graph(line_ids)
+        self.assertIsInstance(graph, FamilyGraph)
+        self.assertEqual(len(graph.ancestors), 7)
+
+    def test_get_tree_graph_stale(self):
+        write_snapshot(self.path, version='old')
+        with override_settings(GRAPH_SNAPSHOT_PATH=self.path), \
+                mock.patch(
+                    'tree.snapshot.get_family_graph_version',
+                    return_value='new'):
+            graph = get_tree_graph([self.top_male.pk])
+        self.assertEqual(len(graph.ancestors), 4)
@@ -33,12 +33,18 @@ class TestTreeTags(TreeTestCase):
 
         marriage = PyQuery(marriages[0])
         result = ' '.join(marriage.text().split('\n'))
-        expected = 'John Glass (1812 - 1874) x Jane Snyder (1824 - 1890)'
+        expected = (
+            'John Glass (1812 - 1874) 6 nakomelingen in 2 generaties x '
+            'Jane Snyder (1824 - 1890) 6 nakomelingen in 2 generaties'
+        )
         self.assertEqual(result, expected)
 
         marriage = PyQuery(marriages[1])
         result = ' '.join(marriage.text().split('\n'))
-        expected = 'Martin Glass (1836 - 1901) x Sylvia Reed (1851 - 1920)'
+        expected = (
+            'Martin Glass (1836 - 1901) 2 nakomelingen in 1 generatie x '
+            'Sylvia Reed (1851 - 1920) 2 nakomelingen in 1 generatie'
+        )
         self.assertEqual(result, expected)
 
         children = doc.find('ul li')
@@ -59,9 +65,69 @@ class TestTreeTags(TreeTestCase):
 
         child = PyQuery(children[3])
         result = child.text()
-        expected = 'Priscilla Glass (1840 - 1910)'
+        expected = (
+            'Priscilla Glass (1840 - 1910)\n2 nakomelingen in 1 generatie'
+        )
         self.assertEqual(result, expected)
 
+    def test_render_tree_max_generation(self):
+        output = self.render(
+            '{% render_tree ancestor %}',
+            ancestor=self.top_male,
+            root_ancestor=self.top_male,
+            lineages=self.lineages,
+            max_generation=1
+        )
+        doc = PyQuery(output)
+        self.assertEqual(len(doc.find('.marriage')), 1)
+        self.assertEqual(len(doc.find('ul li')), 2)
+
+    def _render_sub_tree(self, max_generation):
+        spouse = factories.AncestorFactory(gender='f', slug='spouse-2')
+        factories.MarriageFactory(husband=self.generation_2[0], wife=spouse)
+        generation_3 = factories.AncestorFactory(
+            gender='m', father=self.generation_2[0], mother=spouse,
+            slug='generation-3'
+        )
+        spouse = factories.AncestorFactory(gender='f', slug='spouse-3')
+        factories.MarriageFactory(husband=generation_3, wife=spouse)
+        generation_4 = factories.AncestorFactory(
+            gender='m', father=generation_3, mother=spouse,
+            slug='generation-4'
+        )
+        factories.LineageFactory(
+            ancestor=self.generation_1[0], descendant=generation_4
+        )
+        root_ancestor = models.Ancestor.objects.get(pk=self.generation_1[0].pk)
+        output = self.render(
+            '{% render_tree ancestor %}',
+            ancestor=root_ancestor,
+            root_ancestor=root_ancestor,
+            lineages=helpers.get_lineages(root_ancestor),
+            max_generation=max_generation
+        )
+        return PyQuery(output)
+
+    def test_render_sub_tree_max_generation(self):
+        doc = self._render_sub_tree(2)
+        self.assertEqual(len(doc.find('.marriage')), 2)
+
+    def test_render_sub_tree_max_generation_without_generations(self):
+        models.Ancestor.objects.update(root_generation=None)
+        doc = self._render_sub_tree(2)
+        self.assertEqual(len(doc.find('.marriage')), 2)
+
+    def test_render_tree_number_of_queries(self):
+        self.lineages.objects
+
+        with self.assertNumQueries(4):
+            self.render(
+                '{% render_tree ancestor %}',
+                ancestor=self.top_male,
+                root_ancestor=self.top_male,
+                lineages=self.lineages
+            )
+
     def test_render_ancestor(self):
         output = self.render(
             '{% render_ancestor ancestor %}',
@@ -90,12 +156,9 @@ class TestTreeTags(TreeTestCase):
             lineages=self.lineages
         )
         doc = PyQuery(output)
+        element = PyQuery(doc.find('.male'))
 
-        result = doc.attr('class')
-        expected = 'male'
-        self.assertEqual(result, expected)
-
-        result = doc.text()
+        result = element.text()
         expected = 'Martin Glass (1836 - 1901)'
         self.assertEqual(result, expected)
 
@@ -163,3 +226,18 @@ class TestTreeTags(TreeTestCase):
         doc = PyQuery(output)
         lst = PyQuery(doc.find('dd'))
         self.assertEqual(len(lst), 6)
+
+    def test_ancestor_url(self):
+        output = self.render(
+            '{% ancestor_url ancestor %}', ancestor=self.generation_2[0]
+        )
+        self.assertEqual(output, '/stamboom/john-glass-1812-1874/')
+
+    def test_ancestor_url_prefetched(self):
+        with self.assertNumQueries(0):
+            output = self.render(
+                '{% ancestor_url ancestor %}',
+                ancestor=self.generation_2[0],
+                ancestor_urls={self.generation_2[0].pk: '/prefetched/'}
+            )
+        self.assertEqual(output, '/prefetched/')
@@ -1,3 +1,10 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from tree.snapshot import write_snapshot
 from tree.tests import factories
 from tree.tests.testcases import TreeViewTest
 
@@ -16,6 +23,22 @@ class TestTreeView(TreeViewTest):
         response = self.app.get('/stamboom/')
         self.assertEqual(response.status_code, 200)
 
+    def test_get_max_generation(self):
+        response = self.app.get('/stamboom/?generatie=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.pyquery('.marriage')), 1)
+
+    def test_get_with_snapshot_path(self):
+        expected = self.app.get('/stamboom/').text
+        cache.clear()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.snapshot')
+            with override_settings(GRAPH_SNAPSHOT_PATH=path):
+                self.assertEqual(self.app.get('/stamboom/').text, expected)
+
+                write_snapshot(path)
+                self.assertEqual(self.app.get('/stamboom/').text, expected)
+
     def test_get_root_ancestor(self):
         response = self.app.get('/stamboom/john-glass-1812-1874/')
         self.assertEqual(response.status_code, 301)
@@ -81,6 +104,22 @@ class TestTreeView(TreeViewTest):
             '<a href="/path/to/link/2" target="_blank">Link text 2</a>'
         )
 
+    def test_get_pedigree(self):
+        response = self.app.get('/stamboom/{}/kwartierstaat'.format(
+            self.generation_2[0].slug
+        ))
+        self.assertEqual(response.status_code, 200)
+        response.mustcontain(
+            'Generatie 3',
+            '4. <a href="/stamboom/john-glass-1812-1874/persoonlijke-gegevens"'
+        )
+
+    def test_get_pedigree_not_found(self):
+        response = self.app.get(
+            '/stamboom/unknown/kwartierstaat', expect_errors=True
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_version(self):
         response = self.app.get('/stamboom/about')
         self.assertEqual(response.status_code, 200)
@@ -3,6 +3,9 @@ from django.core.cache import cache
 from django.test import TestCase
 
 from lib.testing.mixins import AssertsMixin
+from services.lineage.roots import invalidate_root_index
+from tree.graph import invalidate_family_graph
+from tree import models
 from tree.tests import factories
 
 
@@ -74,8 +77,23 @@ class TreeTestCase(AssertsMixin, TestCase):
         if self.with_persistent_names:
             self._setup_names()
         cache.clear()
+        invalidate_family_graph()
+        invalidate_root_index()
 
     def _setup_names(self):
+        # Set all birthyears first, so nobody is validated against the random
+        # birthyear of a parent or child.
+        for ancestor, birthyear in [
+                (self.top_male, 1812), (self.top_female, 1824),
+                (self.generation_1[0], 1836), (self.generation_1[1], 1840),
+                (self.spouse_1, 1851), (self.spouse_2, 1860),
+                (self.generation_2[0], 1871), (self.generation_2[1], 1873),
+                (self.generation_extra[0], 1888),
+                (self.generation_extra[1], 1890)]:
+            models.Ancestor.objects.filter(pk=ancestor.pk).update(
+                birthyear=birthyear
+            )
+
         self.top_male.refresh_from_db()
         self.top_male.lastname = 'Glass'
         self.top_male.birthyear = 1812
@@ -156,6 +174,13 @@ class TreeTestCase(AssertsMixin, TestCase):
         self.generation_extra[1].full_clean()
         self.generation_extra[1].save()
 
+    @staticmethod
+    def make_generation_key(key, namespace):
+        """Add the generation that the namespace was last cached in."""
+        return '{}:{}'.format(
+            key, cache.get_entry('generation:{}'.format(namespace))
+        )
+
     @staticmethod
     def assertCacheContains(key):
         try:
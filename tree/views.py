@@ -6,8 +6,10 @@ from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from lib.cache.dependencies import get_generation
 from tree import models
-from tree.helpers import get_lineages, get_marriages
+from tree.helpers import get_ancestor_urls, get_lineages, get_marriages, \
+    get_pedigree
 from version import VERSION
 
 
@@ -31,25 +33,57 @@ def tree(request, ancestor=None):
     if ancestor and ancestor_obj.is_root:
         return redirect(reverse('tree'), permanent=True)
 
+    try:
+        max_generation = int(request.GET['generatie'])
+    except (KeyError, ValueError):
+        max_generation = None
+
     return render(
         request,
         'tree.html',
         {
             'root_ancestor': ancestor_obj,
-            'lineages': lineages
+            'lineages': lineages,
+            'max_generation': max_generation,
+            'tree_generation': (
+                get_generation('tree') if max_generation is None else None
+            )
         }
     )
 
 
 def bio(request, ancestor):
     ancestor_obj = get_object_or_404(models.Ancestor, slug=ancestor)
+    marriages = get_marriages(ancestor_obj)
+    relatives = [ancestor_obj]
+    for marriage in marriages:
+        relatives.append(marriage.spouse)
+        relatives.extend(marriage.children)
+
     return render(
         request,
         'bio.html',
         {
             'ancestor': ancestor_obj,
             'bio': ancestor_obj.get_bio(),
-            'marriages': get_marriages(ancestor_obj)
+            'marriages': marriages,
+            'ancestor_urls': get_ancestor_urls(relatives)
+        }
+    )
+
+
+def pedigree(request, ancestor):
+    ancestor_obj = get_object_or_404(models.Ancestor, slug=ancestor)
+    generations = {}
+    for entry in get_pedigree(ancestor_obj):
+        generations.setdefault(entry.generation, []).append(entry)
+
+    return render(
+        request,
+        'pedigree.html',
+        {
+            'ancestor': ancestor_obj,
+            'generations': list(generations.values())
         }
     )
 
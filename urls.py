@@ -18,7 +18,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
 
-from tree.views import bio, tree, version
+from tree.views import bio, pedigree, tree, version
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +27,8 @@ urlpatterns = [
     re_path(r'^stamboom/(?P<ancestor>[^/]+)/$', tree, name='ancestor_tree'),
     re_path(r'^stamboom/(?P<ancestor>[^/]+)/persoonlijke-gegevens$', bio,
             name='ancestor_bio'),
+    re_path(r'^stamboom/(?P<ancestor>[^/]+)/kwartierstaat$', pedigree,
+            name='ancestor_pedigree'),
     re_path(r'^api/v1/', include('api.urls')),
 
 ]